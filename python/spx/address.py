@@ -1,9 +1,11 @@
-from enum import Enum
+from enum import IntEnum
+
+import numpy as np
 
 from spx.constant import *  # Import all constants from spx.constant
 
 
-class AddrType(Enum):
+class AddrType(IntEnum):
     WOTS_HASH = 0
     WOTS_PK = 1
     TREE = 2
@@ -11,12 +13,23 @@ class AddrType(Enum):
     FORS_ROOTS = 4
     WOTS_PRF = 5
     FORS_PRF = 6
+    # Not part of SPHINCS+: nodes of the Merkle tree built by spx.batch.
+    BATCH_TREE = 7
 
 
 class Address:
+    __slots__ = ("_addr", "_view")
+
     def __init__(self):
-        self._addr = bytearray(32)  # Ensure _addr is a bytearray
-        self._type = None
+        self._addr = bytearray(SPX_ADDR_BYTES)
+        # Fixed-size buffer, so one view of its hashed prefix stays valid.
+        self._view = memoryview(self._addr)[:SPX_SHA256_ADDR_BYTES]
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Address":
+        addr = cls()
+        addr._addr[: len(data)] = data
+        return addr
 
     def set_layer_addr(self, layer: int) -> None:
         self._addr[SPX_OFFSET_LAYER] = layer
@@ -31,14 +44,14 @@ class Address:
         self._addr[: SPX_OFFSET_TREE + 8] = other._addr[: SPX_OFFSET_TREE + 8]
 
     def set_keypair_addr(self, keypair: int) -> None:
-        if SPX_FULL_HEIGHT // SPX_D > 8:
-            self._addr[SPX_OFFSET_KP_ADDR2] = keypair >> 8
-        self._addr[SPX_OFFSET_KP_ADDR1] = keypair
+        # The high byte is 0 for trees of height <= 8, so writing it always
+        # gives the same address for every parameter set.
+        self._addr[SPX_OFFSET_KP_ADDR2] = keypair >> 8
+        self._addr[SPX_OFFSET_KP_ADDR1] = keypair & 0xFF
 
     def copy_keypair_addr(self, other: "Address") -> None:
         self._addr[: SPX_OFFSET_TREE + 8] = other._addr[: SPX_OFFSET_TREE + 8]
-        if SPX_FULL_HEIGHT // SPX_D > 8:
-            self._addr[SPX_OFFSET_KP_ADDR2] = other._addr[SPX_OFFSET_KP_ADDR2]
+        self._addr[SPX_OFFSET_KP_ADDR2] = other._addr[SPX_OFFSET_KP_ADDR2]
         self._addr[SPX_OFFSET_KP_ADDR1] = other._addr[SPX_OFFSET_KP_ADDR1]
 
     def set_chain_addr(self, chain: int) -> None:
@@ -57,3 +70,73 @@ class Address:
 
     def to_bytes(self) -> bytes:
         return bytes(self._addr)
+
+    def view(self) -> memoryview:
+        """The SPX_SHA256_ADDR_BYTES compressed address, without copying.
+
+        The view follows later set_* calls; copy it to keep a snapshot.
+        """
+        return self._view
+
+
+def set_address_fields(
+    addrs: np.ndarray,
+    layer=None,
+    tree=None,
+    type=None,
+    keypair=None,
+    chain=None,
+    hash=None,
+    tree_height=None,
+    tree_index=None,
+) -> None:
+    """Set fields of a (count, >= 22) uint8 address array in place.
+
+    Every field is left alone when None, else a scalar for all rows or a
+    sequence (e.g. a range) with one value per row.
+    """
+    count = addrs.shape[0]
+
+    def column(value, dtype):
+        return np.broadcast_to(np.asarray(value, dtype=dtype), (count,))
+
+    def set_bytes(offset, width, value, dtype):
+        addrs[:, offset : offset + width] = (
+            column(value, dtype)
+            .astype(np.dtype(dtype).newbyteorder(">"))
+            .view(np.uint8)
+            .reshape(count, width)
+        )
+
+    if layer is not None:
+        addrs[:, SPX_OFFSET_LAYER] = column(layer, np.uint8)
+    if tree is not None:
+        set_bytes(SPX_OFFSET_TREE, 8, tree, np.uint64)
+    if type is not None:
+        addrs[:, SPX_OFFSET_TYPE] = column(type, np.uint8)
+    if keypair is not None:
+        keypair = column(keypair, np.uint32)
+        # Always written, as in Address.set_keypair_addr.
+        addrs[:, SPX_OFFSET_KP_ADDR2] = keypair >> 8
+        addrs[:, SPX_OFFSET_KP_ADDR1] = keypair & 0xFF
+    if chain is not None:
+        addrs[:, SPX_OFFSET_CHAIN_ADDR] = column(chain, np.uint8)
+    if hash is not None:
+        addrs[:, SPX_OFFSET_HASH_ADDR] = column(hash, np.uint8)
+    if tree_height is not None:
+        addrs[:, SPX_OFFSET_TREE_HGT] = column(tree_height, np.uint8)
+    if tree_index is not None:
+        set_bytes(SPX_OFFSET_TREE_INDEX, 4, tree_index, np.uint32)
+
+
+def address_batch(count: int, template=None, **fields) -> np.ndarray:
+    """(count, SPX_SHA256_ADDR_BYTES) uint8 array of compressed addresses.
+
+    Rows start as template (an Address, or zeros) and then get fields set as
+    in set_address_fields, e.g. address_batch(16, addr, chain=range(16)).
+    """
+    addrs = np.zeros((count, SPX_SHA256_ADDR_BYTES), dtype=np.uint8)
+    if template is not None:
+        addrs[:] = np.frombuffer(template.view(), dtype=np.uint8)
+    set_address_fields(addrs, **fields)
+    return addrs
@@ -0,0 +1,434 @@
+"""Benchmarks of the Python SPHINCS+ path.
+
+Times keypair, sign and verify end to end, and thash, treehash, gen_chain,
+fors_sign and wots_sign on their own, per parameter set and worker count.
+Each run does count operations spread over workers processes. It is the
+counterpart of one CUDA launch over many operations: a worker process takes
+the place of a block of one thread.
+
+The results are written in the schemas of the CUDA measurements in data/.
+One function,blocks,threads,time(ms),per_op(ms) file per parameter set
+(e.g. 128F-Python.csv) can be read by utils/adaptive_thread_calculator.py
+and utils/plot_thread_efficiency.py. One file in the Configuration,KG
+Latency (ms),.. schema of data/performance.csv holds one row per set and
+worker count. Latency percentiles and ops/sec are printed:
+
+    python -m spx.bench --params 128f 192f --workers 1 2 4 --count 32
+
+With --calibrate, the pool sizes of keypair, sign and verify are swept on
+this host instead, and the worker counts fitted by spx.tuning are saved:
+
+    python -m spx.bench --calibrate --params 128f --workers 1 2 4 8
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+
+import numpy as np
+
+from spx.address import Address, AddrType
+from spx.fors import fors_sign
+from spx.params import SPX_DEFAULT_PARAMS, get_params
+from spx.sign import (
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+    wots_gen_leaf,
+)
+from spx.tuning import SPX_TUNING_FILE, tuning_file, tuning_row, write_tuning
+from spx.utils import get_hash_backend, seed_state, thash, treehash, use_hash_backend
+from spx.verify import verify_many
+from spx.wots import gen_chain, wots_sign
+
+SPX_BENCH_FUNCTIONS = (
+    "keypair",
+    "sign",
+    "verify",
+    "thash",
+    "treehash",
+    "gen_chain",
+    "fors_sign",
+    "wots_sign",
+)
+SPX_CALIBRATE_OPERATIONS = ("keypair", "sign", "verify")
+SPX_BENCH_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+SPX_FUNCTION_FIELDS = ("function", "blocks", "threads", "time(ms)", "per_op(ms)")
+SPX_PERFORMANCE_FIELDS = (
+    "Configuration",
+    "KG Latency (ms)",
+    "Sign Latency (ms)",
+    "Verify Latency (ms)",
+    "KG Throughput (tasks/sec)",
+    "Sign Throughput (tasks/sec)",
+    "Verify Throughput (tasks/sec)",
+)
+
+
+@dataclass
+class BenchResult:
+    """count runs of function over workers processes.
+
+    wall is the time from the first worker starting its runs to the last one
+    finishing them, in seconds; latencies are the seconds of every run.
+    """
+
+    function: str
+    params: object
+    workers: int
+    count: int
+    wall: float
+    latencies: np.ndarray
+
+    @property
+    def label(self) -> str:
+        # Function names of the data/ files, e.g. "128F-sign".
+        return f"{self.params.name.upper()}-{self.function}"
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.count / self.wall if self.wall else float("inf")
+
+    def percentile(self, q) -> float:
+        """Latency percentile q, in milliseconds."""
+        return float(np.percentile(self.latencies, q)) * 1e3
+
+
+def bench_case(function: str, params=SPX_DEFAULT_PARAMS):
+    """Set up function on a fresh key; returns a callable running it once."""
+    n = params.n
+    seed = os.urandom(params.seed_bytes)
+    sk_seed, pub_seed = seed[:n], seed[2 * n :]
+    seed_state(pub_seed, params)
+    addr = Address()
+    addr.set_layer_addr(params.d - 1)
+
+    if function in ("keypair", "sign", "verify"):
+        pk = bytearray(params.pk_bytes)
+        sk = bytearray(params.sk_bytes)
+        crypto_sign_seed_keypair(pk, sk, seed, params=params)
+        m = os.urandom(32)
+        sig = bytearray(params.bytes)
+        if function == "keypair":
+            return partial(crypto_sign_seed_keypair, pk, sk, seed, params=params)
+        if function == "sign":
+            return partial(
+                crypto_sign_signature, sig, [0], m, len(m), sk, workers=1, params=params
+            )
+        crypto_sign_signature(sig, [0], m, len(m), sk, workers=1, params=params)
+        return partial(crypto_sign_verify, sig, len(sig), m, len(m), pk, params)
+
+    if function == "thash":
+        return partial(thash, bytearray(n), os.urandom(2 * n), 2, pub_seed, addr)
+    if function == "treehash":
+        addr.set_type(AddrType.TREE)
+        return partial(
+            treehash,
+            bytearray(n),
+            bytearray(params.tree_height * n),
+            sk_seed,
+            pub_seed,
+            0,
+            0,
+            params.tree_height,
+            partial(wots_gen_leaf, params=params),
+            addr,
+            params,
+        )
+    if function == "gen_chain":
+        addr.set_type(AddrType.WOTS_HASH)
+        return partial(
+            gen_chain, os.urandom(n), 0, params.wots_w - 1, pub_seed, addr, params
+        )
+    if function == "fors_sign":
+        return partial(
+            fors_sign,
+            bytearray(params.fors_bytes),
+            bytearray(n),
+            os.urandom(params.fors_msg_bytes),
+            sk_seed,
+            pub_seed,
+            addr,
+            params=params,
+        )
+    if function == "wots_sign":
+        addr.set_type(AddrType.WOTS_HASH)
+        return partial(
+            wots_sign,
+            bytearray(params.wots_bytes),
+            os.urandom(n),
+            sk_seed,
+            pub_seed,
+            addr,
+            params=params,
+        )
+    raise ValueError(f"Unknown benchmark function '{function}'")
+
+
+def bench_task(function: str, params, count: int, backend: str):
+    """Run function count times; runs in pool workers.
+
+    Returns:
+        tuple: (start, end, latencies) in seconds, start and end on the
+        perf_counter clock shared by the processes of the machine
+    """
+    with use_hash_backend(backend):
+        run = bench_case(function, params)
+        latencies = np.empty(count)
+        start = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            run()
+            latencies[i] = time.perf_counter() - t0
+        end = time.perf_counter()
+    return start, end, latencies
+
+
+def run_benchmark(
+    function: str, params=SPX_DEFAULT_PARAMS, count: int = 16, workers: int = 1
+) -> BenchResult:
+    """Time count runs of function, spread as evenly as possible over workers."""
+    params = get_params(params)
+    backend = get_hash_backend().name
+    shares = [count // workers + (i < count % workers) for i in range(workers)]
+    shares = [share for share in shares if share]
+    if workers == 1:
+        results = [bench_task(function, params, count, backend)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(
+                    bench_task,
+                    [function] * len(shares),
+                    [params] * len(shares),
+                    shares,
+                    [backend] * len(shares),
+                )
+            )
+    starts, ends, latencies = zip(*results)
+    return BenchResult(
+        function,
+        params,
+        workers,
+        count,
+        max(ends) - min(starts),
+        np.concatenate(latencies),
+    )
+
+
+def run_benchmarks(
+    params_list=(SPX_DEFAULT_PARAMS,),
+    workers_list=(1,),
+    functions=SPX_BENCH_FUNCTIONS,
+    count: int = 16,
+    report=print,
+) -> list:
+    """run_benchmark for every parameter set, worker count and function."""
+    results = []
+    for params in params_list:
+        for workers in workers_list:
+            for function in functions:
+                result = run_benchmark(function, params, count, workers)
+                results.append(result)
+                if report is not None:
+                    report(format_result(result))
+    return results
+
+
+def format_result(result: BenchResult) -> str:
+    return (
+        f"{result.label:<20} workers={result.workers:<3} "
+        f"p50={result.percentile(50):10.3f}ms "
+        f"p90={result.percentile(90):10.3f}ms "
+        f"p99={result.percentile(99):10.3f}ms "
+        f"{result.ops_per_sec:12.2f} ops/s"
+    )
+
+
+def write_function_csv(results, path: str) -> None:
+    """Write results in the function,blocks,threads,time(ms),per_op(ms) schema.
+
+    Each worker process is one block of one thread; time(ms) is the wall
+    time of the whole run and per_op(ms) that time per operation.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SPX_FUNCTION_FIELDS)
+        for result in results:
+            time_ms = result.wall * 1e3
+            writer.writerow(
+                (
+                    result.label,
+                    result.workers,
+                    1,
+                    f"{time_ms:.2f}",
+                    f"{time_ms / result.count:.4f}",
+                )
+            )
+
+
+def write_performance_csv(results, path: str) -> None:
+    """Write the keypair, sign and verify results in data/performance.csv's schema.
+
+    One row per parameter set and worker count, e.g. "128F-Python-w4", with
+    median latencies and throughputs.
+    """
+    rows = {}
+    for result in results:
+        if result.function in ("keypair", "sign", "verify"):
+            key = (result.params.name.upper(), result.workers)
+            rows.setdefault(key, {})[result.function] = result
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SPX_PERFORMANCE_FIELDS)
+        for (name, workers), ops in rows.items():
+            if len(ops) < 3:
+                continue
+            writer.writerow(
+                [f"{name}-Python-w{workers}"]
+                + [
+                    f"{ops[op].percentile(50):.2f}"
+                    for op in ("keypair", "sign", "verify")
+                ]
+                + [f"{ops[op].ops_per_sec:.2f}" for op in ("keypair", "sign", "verify")]
+            )
+
+
+def write_results(results, out_dir: str = SPX_BENCH_DATA_DIR) -> list:
+    """Write <SET>-Python.csv per parameter set and python-performance.csv."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    by_params = {}
+    for result in results:
+        by_params.setdefault(result.params.name.upper(), []).append(result)
+    for name, group in by_params.items():
+        paths.append(os.path.join(out_dir, f"{name}-Python.csv"))
+        write_function_csv(group, paths[-1])
+    paths.append(os.path.join(out_dir, "python-performance.csv"))
+    write_performance_csv(results, paths[-1])
+    return paths
+
+
+def calibration_time(
+    operation: str, params=SPX_DEFAULT_PARAMS, count: int = 8, workers: int = 1
+) -> float:
+    """Milliseconds for count operations through the path taking workers.
+
+    sign: count crypto_sign_signature calls with workers; verify: one
+    verify_many over count signatures with workers; keypair, which has no
+    such path, count keypairs over a pool of workers processes.
+    """
+    if operation == "keypair":
+        return run_benchmark("keypair", params, count, workers).wall * 1e3
+
+    seed = os.urandom(params.seed_bytes)
+    pk = bytearray(params.pk_bytes)
+    sk = bytearray(params.sk_bytes)
+    crypto_sign_seed_keypair(pk, sk, seed, params=params)
+    m = os.urandom(32)
+    sig = bytearray(params.bytes)
+    if operation == "sign":
+        # Start the shared pool first: its warm latency is what is tuned.
+        crypto_sign_signature(sig, [0], m, len(m), sk, workers=workers, params=params)
+        start = time.perf_counter()
+        for _ in range(count):
+            crypto_sign_signature(
+                sig, [0], m, len(m), sk, workers=workers, params=params
+            )
+        return (time.perf_counter() - start) * 1e3
+    if operation == "verify":
+        crypto_sign_signature(sig, [0], m, len(m), sk, workers=1, params=params)
+        items = [(m, bytes(sig), bytes(pk))] * count
+        verify_many(items[:2], params, workers)
+        start = time.perf_counter()
+        verify_many(items, params, workers)
+        return (time.perf_counter() - start) * 1e3
+    raise ValueError(f"Unknown calibration operation '{operation}'")
+
+
+def default_worker_sweep(cpus=None) -> list:
+    """1, 2, 4, .. up to twice the CPU count, and the CPU count itself.
+
+    Sweeping past the CPU count is what shows the per-worker overhead.
+    """
+    cpus = cpus or os.cpu_count() or 1
+    sweep = {1, 2, 4, cpus}
+    t = 8
+    while t <= 2 * cpus:
+        sweep.add(t)
+        t *= 2
+    return sorted(sweep)
+
+
+def calibrate(
+    params_list=(SPX_DEFAULT_PARAMS,),
+    workers_list=None,
+    operations=SPX_CALIBRATE_OPERATIONS,
+    count: int = 8,
+    path: str = SPX_TUNING_FILE,
+    report=print,
+) -> list:
+    """Sweep workers_list for every operation, fit and save the tuning rows."""
+    workers_list = sorted(workers_list or default_worker_sweep())
+    rows = []
+    for params in params_list:
+        for operation in operations:
+            times = [
+                calibration_time(operation, params, count, workers)
+                for workers in workers_list
+            ]
+            rows.append(
+                tuning_row(f"{params.name.upper()}-{operation}", workers_list, times)
+            )
+            if report is not None:
+                row = rows[-1]
+                report(
+                    f"{row['operation']:<20} best={row['best_measured_threads']} "
+                    f"t_optimal={row['t_optimal']:.2f}"
+                )
+    if path is not None:
+        write_tuning(rows, path)
+    return rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--params", nargs="+", default=[SPX_DEFAULT_PARAMS.name])
+    parser.add_argument("--workers", nargs="+", type=int)
+    parser.add_argument(
+        "--functions",
+        nargs="+",
+        choices=SPX_BENCH_FUNCTIONS,
+        default=list(SPX_BENCH_FUNCTIONS),
+    )
+    parser.add_argument("--count", type=int, default=16, help="runs per function")
+    parser.add_argument("--out-dir", default=SPX_BENCH_DATA_DIR)
+    parser.add_argument(
+        "--calibrate", action="store_true", help="fit and save worker counts"
+    )
+    parser.add_argument("--tuning-file", default=tuning_file())
+    args = parser.parse_args(argv)
+    params_list = [get_params(name) for name in args.params]
+
+    if args.calibrate:
+        calibrate(params_list, args.workers, count=args.count, path=args.tuning_file)
+        print(f"wrote {os.path.normpath(args.tuning_file)}")
+        return
+
+    results = run_benchmarks(
+        params_list,
+        args.workers or [1],
+        args.functions,
+        args.count,
+    )
+    for path in write_results(results, args.out_dir):
+        print(f"wrote {os.path.normpath(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Per-key LRU caches of hypertree subtrees and WOTS chain checkpoints.
+
+The top hypertree layers repeat across most signatures of one key: layer
+SPX_D - 1 is the same subtree every time and the layers below it repeat
+often. SubtreeCache keeps the level arrays of treehash_levels (all nodes,
+root last) per (layer, tree), so signing reads root and auth path from it.
+Subtree nodes are public, they are what auth paths are made of.
+
+ChainCache keeps WOTS chains of often used keypairs at checkpoint
+positions, so wots_sign and wots_gen_pk resume from the nearest one.
+
+SignatureCache keeps whole signatures by key and message digest, so signing
+a payload again returns the stored signature without any hashing.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from spx.constant import SPX_OFFSET_KP_ADDR1
+from spx.params import SPX_DEFAULT_PARAMS
+
+# Default limits of the cache created per key by subtree_cache_for.
+SPX_SUBTREE_CACHE_BYTES = 1 << 20
+SPX_SUBTREE_CACHE_ENTRIES = None
+# Number of keys whose caches are kept, least recently used dropped first.
+SPX_SUBTREE_CACHE_KEYS = 16
+# Defaults of ChainCache.
+SPX_CHAIN_CACHE_BYTES = 1 << 20
+SPX_CHAIN_CHECKPOINT_INTERVAL = 4
+# Default limit of SignatureCache, about 980 128f signatures.
+SPX_SIGNATURE_CACHE_BYTES = 16 << 20
+
+
+class LRUCache:
+    """Least recently used map with limits on total size and entry count.
+
+    Args:
+        max_bytes (int): limit on the bytes kept, None for no limit
+        max_entries (int): limit on the entries kept, None for no limit
+    """
+
+    def __init__(self, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def lookup(self, key):
+        """The value stored under key, or None; counts a hit or miss."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def store(self, key, value, size: int) -> None:
+        """Store value of size bytes under key, evicting as needed."""
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self.entries:
+            del self.entries[key]
+            self.nbytes -= self.sizes.pop(key)
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.nbytes += size
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries until within the limits."""
+        while self.entries and (
+            (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            or (self.max_entries is not None and len(self.entries) > self.max_entries)
+        ):
+            key, _ = self.entries.popitem(last=False)
+            self.nbytes -= self.sizes.pop(key)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.sizes.clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+        }
+
+
+class SubtreeCache(LRUCache):
+    """Bounded LRU map of (layer, tree) to treehash_levels level arrays.
+
+    Args:
+        max_bytes (int): limit on the node bytes kept, None for no limit
+        max_entries (int): limit on the subtrees kept, None for no limit
+    """
+
+    def __init__(self, max_bytes=SPX_SUBTREE_CACHE_BYTES, max_entries=None):
+        super().__init__(max_bytes, max_entries)
+
+    def get(self, layer: int, tree: int):
+        """The levels of subtree (layer, tree), or None; counts a hit or miss."""
+        return self.lookup((layer, tree))
+
+    def put(self, layer: int, tree: int, levels: list) -> None:
+        """Store the levels of subtree (layer, tree), evicting as needed."""
+        self.store((layer, tree), levels, sum(len(level) for level in levels))
+
+    def subtrees(self) -> list:
+        """((layer, tree), levels) of every subtree held."""
+        return list(self.entries.items())
+
+
+class PinnedSubtreeCache(SubtreeCache):
+    """SubtreeCache in front of a fixed map of subtrees that is never evicted.
+
+    The pinned subtrees, e.g. those stored in a key file, are looked up
+    first; subtrees computed while signing go to the LRU part, which the
+    limits apply to.
+
+    Args:
+        pinned (dict): (layer, tree) -> levels, kept as given
+        max_bytes (int): limit on the node bytes of the LRU part
+        max_entries (int): limit on the subtrees of the LRU part
+    """
+
+    def __init__(self, pinned, max_bytes=SPX_SUBTREE_CACHE_BYTES, max_entries=None):
+        super().__init__(max_bytes, max_entries)
+        self.pinned = pinned
+
+    def get(self, layer: int, tree: int):
+        levels = self.pinned.get((layer, tree))
+        if levels is None:
+            return super().get(layer, tree)
+        self.hits += 1
+        return levels
+
+    def put(self, layer: int, tree: int, levels: list) -> None:
+        if (layer, tree) not in self.pinned:
+            super().put(layer, tree, levels)
+
+    def subtrees(self) -> list:
+        return list(self.pinned.items()) + super().subtrees()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["pinned"] = len(self.pinned)
+        return stats
+
+
+class ChainCache(LRUCache):
+    """WOTS chain values at checkpoint positions, per keypair address.
+
+    Entries are (wots_len, len(positions(params)), n) arrays holding every
+    chain of one keypair at hash positions 0, interval, 2 * interval, ..
+    and wots_w - 1, filled by spx.wots.wots_chain_checkpoints. The
+    key of an entry includes the parameter set and a digest of sk_seed and
+    pub_seed, so one cache can be shared by keys without mixing them up.
+
+    Values below the signed positions are secret: keep the cache in the
+    signer's memory only.
+
+    Args:
+        max_bytes (int): hard limit on the chain bytes kept
+        interval (int): distance between checkpoint positions
+    """
+
+    def __init__(
+        self, max_bytes=SPX_CHAIN_CACHE_BYTES, interval=SPX_CHAIN_CHECKPOINT_INTERVAL
+    ):
+        if interval < 1:
+            raise ValueError("checkpoint interval must be at least 1")
+        super().__init__(max_bytes)
+        self.interval = interval
+        self.hash_calls_saved = 0
+        self.fill_hash_calls = 0
+
+    def positions(self, params=SPX_DEFAULT_PARAMS) -> np.ndarray:
+        """The checkpoint positions of the chains of params."""
+        w = params.wots_w
+        return np.array(sorted(set(range(0, w, self.interval)) | {w - 1}))
+
+    def entry_key(
+        self, sk_seed: bytes, pub_seed: bytes, addr, params=SPX_DEFAULT_PARAMS
+    ) -> tuple:
+        n = params.n
+        key_id = hashlib.sha256(bytes(sk_seed[:n]) + bytes(pub_seed[:n]))
+        return (
+            params.name,
+            key_id.digest(),
+            bytes(addr.view()[: SPX_OFFSET_KP_ADDR1 + 1]),
+        )
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["hash_calls_saved"] = self.hash_calls_saved
+        stats["fill_hash_calls"] = self.fill_hash_calls
+        return stats
+
+
+class SignatureCache(LRUCache):
+    """Signatures by (parameter set, public key, SHA-256 of the message).
+
+    With deterministic signing a hit is the signature signing would produce;
+    with randomized signing it is an earlier, equally valid one.
+
+    Args:
+        max_bytes (int): limit on the signature bytes kept, None for no limit
+        max_entries (int): limit on the signatures kept, None for no limit
+    """
+
+    def __init__(self, max_bytes=SPX_SIGNATURE_CACHE_BYTES, max_entries=None):
+        super().__init__(max_bytes, max_entries)
+
+    def get(self, pk: bytes, digest: bytes, params=SPX_DEFAULT_PARAMS):
+        """The signature stored for the message digest, or None."""
+        return self.lookup((params.name, bytes(pk), digest))
+
+    def put(self, pk: bytes, digest: bytes, sig: bytes, params=SPX_DEFAULT_PARAMS):
+        self.store((params.name, bytes(pk), digest), bytes(sig), len(sig))
+
+
+subtree_caches = OrderedDict()
+subtree_cache_limits = {
+    "max_bytes": SPX_SUBTREE_CACHE_BYTES,
+    "max_entries": SPX_SUBTREE_CACHE_ENTRIES,
+}
+
+
+def set_subtree_cache_limits(max_bytes=SPX_SUBTREE_CACHE_BYTES, max_entries=None):
+    """Set the limits of the per-key caches; max_bytes=0 turns caching off.
+
+    Caches that already exist are resized and evicted to the new limits.
+    """
+    subtree_cache_limits["max_bytes"] = max_bytes
+    subtree_cache_limits["max_entries"] = max_entries
+    for cache in subtree_caches.values():
+        cache.max_bytes = max_bytes
+        cache.max_entries = max_entries
+        cache.evict()
+
+
+def subtree_cache_for(pk: bytes, params=SPX_DEFAULT_PARAMS):
+    """The SubtreeCache of the key pk of params, None when turned off.
+
+    Subtrees depend on the parameter set too, so the same pk bytes under
+    two parameter sets get two caches.
+    """
+    if subtree_cache_limits["max_bytes"] == 0:
+        return None
+    key_id = (params.name, bytes(pk))
+    cache = subtree_caches.get(key_id)
+    if cache is None:
+        cache = SubtreeCache(**subtree_cache_limits)
+        subtree_caches[key_id] = cache
+        while len(subtree_caches) > SPX_SUBTREE_CACHE_KEYS:
+            subtree_caches.popitem(last=False)
+    else:
+        subtree_caches.move_to_end(key_id)
+    return cache
+
+
+def clear_subtree_caches() -> None:
+    subtree_caches.clear()
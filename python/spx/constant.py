@@ -88,9 +88,21 @@ SPX_SK_BYTES = 2 * SPX_N + SPX_PK_BYTES
 SPX_OPTRAND_BYTES = 32
 
 # SHA256 specific constants
+SPX_SHA256_BLOCK_BYTES = 64
 SPX_SHA256_OUTPUT_BYTES = 32
 SPX_SHA256_ADDR_BYTES = 22
 
+# SHA512 specific constants
+SPX_SHA512_BLOCK_BYTES = 128
+SPX_SHA512_OUTPUT_BYTES = 64
+
+# SHAKE256 hashes the full SPX_ADDR_BYTES address (src/shake_offsets.h). Its
+# fields are the SHA256 ones, moved: layer and tree, then type up to the tree
+# index as one block.
+SPX_SHAKE_OFFSET_LAYER = 3
+SPX_SHAKE_OFFSET_TREE = 8
+SPX_SHAKE_OFFSET_TYPE = 19
+
 
 CRYPTO_SECRETKEYBYTES = SPX_SK_BYTES
 CRYPTO_PUBLICKEYBYTES = SPX_PK_BYTES
@@ -1,30 +1,34 @@
 from spx.utils import *
 from spx.constant import *
-from spx.address import Address, AddrType
+from spx.address import Address, AddrType, address_batch
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.pool import pool_workers, shared_pool
 
-import hashlib
+from functools import partial
 
+import numpy as np
 
-def prf_addr(out, key, addr: Address):
-    buf = bytearray(SPX_N + SPX_SHA256_ADDR_BYTES)
+# Most leaves fors_sign derives in one batch; trees are signed in groups of
+# up to this many leaves, all 33 trees of 128f in one.
+SPX_FORS_BATCH_LEAVES = 1 << 16
 
-    buf[:SPX_N] = key
-    buf[SPX_N:] = addr.to_bytes()
 
-    # Use hashlib.sha256() to compute the hash
-    sha256_hash = hashlib.sha256(buf).digest()
-    out[:] = sha256_hash[:SPX_N]
+def prf_addr(out, key, addr: Address, params=SPX_DEFAULT_PARAMS, pub_seed=None):
+    # SHA256 or SHAKE256 of key || addr, as params says
+    out[:] = prf_addrs(key, [addr], params, pub_seed)
 
 
-def fors_gen_sk(sk, sk_seed, fors_leaf_addr):
-    prf_addr(sk, sk_seed, fors_leaf_addr)
+def fors_gen_sk(sk, sk_seed, fors_leaf_addr, params=SPX_DEFAULT_PARAMS, pub_seed=None):
+    prf_addr(sk, sk_seed, fors_leaf_addr, params, pub_seed)
 
 
 def fors_sk_to_leaf(leaf, sk, pub_seed, fors_leaf_addr):
     thash(leaf, sk, 1, pub_seed, fors_leaf_addr)
 
 
-def fors_gen_leaf(leaf, sk_seed, pub_seed, addr_idx, fors_tree_addr):
+def fors_gen_leaf(
+    leaf, sk_seed, pub_seed, addr_idx, fors_tree_addr, params=SPX_DEFAULT_PARAMS
+):
     fors_leaf_addr = Address()
 
     # Only copy the parts that must be kept in fors_leaf_addr.
@@ -32,109 +36,374 @@ def fors_gen_leaf(leaf, sk_seed, pub_seed, addr_idx, fors_tree_addr):
     fors_leaf_addr.set_type(3)
     fors_leaf_addr.set_tree_index(addr_idx)
 
-    fors_gen_sk(leaf, sk_seed, fors_leaf_addr)
+    fors_gen_sk(leaf, sk_seed, fors_leaf_addr, params, pub_seed)
     fors_sk_to_leaf(leaf, leaf, pub_seed, fors_leaf_addr)
     return leaf
 
 
-def message_to_indices(indices, m):
-    offset = 0
-
-    for i in range(SPX_FORS_TREES):
-        indices[i] = 0
-        for j in range(SPX_FORS_HEIGHT):
-            indices[i] ^= ((m[offset >> 3] >> (offset & 0x7)) & 0x1) << j
-            offset += 1
+def fors_gen_leaves(
+    leaves,
+    sk_seed,
+    pub_seed,
+    idx_offset,
+    count,
+    fors_tree_addr,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """Batched fors_gen_leaf for the leaves idx_offset .. idx_offset + count - 1.
+
+    The secret values are derived first, then hashed to leaves by one
+    thash_many. Returns the secret values, count * n bytes.
+    """
+    fors_leaf_addr = Address()
 
+    # Only copy the parts that must be kept in fors_leaf_addr.
+    fors_leaf_addr.copy_keypair_addr(fors_tree_addr)
+    fors_leaf_addr.set_type(AddrType.FORS_TREE)
+    fors_leaf_addrs = address_batch(
+        count, fors_leaf_addr, tree_index=range(idx_offset, idx_offset + count)
+    )
 
-def fors_sign(sig, pk, m, sk_seed, pub_seed, fors_addr):
-    indices = bytearray(SPX_FORS_TREES)
-    roots = bytearray(SPX_FORS_TREES * SPX_N)
-    fors_tree_addr = Address()
-    fors_pk_addr = Address()
+    # prf_addr of every row, as fors_gen_sk.
+    sks = prf_addrs(sk_seed, fors_leaf_addrs, params, pub_seed)
 
-    fors_tree_addr.copy_keypair_addr(fors_addr)
-    fors_pk_addr.copy_keypair_addr(fors_addr)
+    thash_many(leaves, sks, 1, pub_seed, fors_leaf_addrs)
+    return sks
 
-    fors_tree_addr.set_type(3)
-    fors_pk_addr.set_type(4)
-    message_to_indices(indices, m)
 
-    for i in range(SPX_FORS_TREES):
-        idx_offset = i * (1 << SPX_FORS_HEIGHT)
-        fors_tree_addr.set_tree_height(0)
-        fors_tree_addr.set_tree_index(indices[i] + idx_offset)
+def message_to_indices(indices, m, params=SPX_DEFAULT_PARAMS):
+    offset = 0
 
-        temp = bytearray(SPX_N)
+    for i in range(params.fors_trees):
+        indices[i] = 0
+        for j in range(params.fors_height):
+            indices[i] ^= ((m[offset >> 3] >> (offset & 0x7)) & 0x1) << j
+            offset += 1
 
-        # Include the secret key part that produces the selected leaf node.
-        fors_gen_sk(temp, sk_seed, fors_tree_addr)
-        sig[(i * SPX_FORS_HEIGHT) * SPX_N : (i * SPX_FORS_HEIGHT + 1) * SPX_N] = temp
 
-        # Compute the authentication path for this leaf node.
-        auth_path = bytearray(SPX_N * (SPX_FORS_HEIGHT - 1))
-        treehash(
-            temp,
-            auth_path,
+def fors_sign_tree(
+    sig,
+    root,
+    sk_seed,
+    pub_seed,
+    tree,
+    index,
+    fors_tree_addr,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """Sign index with FORS tree number tree.
+
+    Writes the selected secret value and its auth path ((fors_height + 1)
+    * n bytes) into sig and the tree root into root. Both may be memoryview
+    slices of larger buffers, which are then filled in place.
+    """
+    n, fors_height = params.n, params.fors_height
+    sig = memoryview(sig)
+    idx_offset = tree * (1 << fors_height)
+    fors_tree_addr.set_tree_height(0)
+    fors_tree_addr.set_tree_index(index + idx_offset)
+
+    # Include the secret key part that produces the selected leaf node.
+    fors_gen_sk(sig[:n], sk_seed, fors_tree_addr, params, pub_seed)
+
+    # Compute the authentication path for this leaf node.
+    treehash(
+        root,
+        sig[n : (fors_height + 1) * n],
+        sk_seed,
+        pub_seed,
+        index,
+        idx_offset,
+        fors_height,
+        partial(fors_gen_leaf, params=params),
+        fors_tree_addr,
+        params,
+    )
+
+
+def fors_sign_trees(
+    sig,
+    roots,
+    sk_seed,
+    pub_seed,
+    first,
+    indices,
+    fors_tree_addr,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """fors_sign_tree for the trees first .. first + len(indices) - 1 at once.
+
+    Leaf j of tree t is leaf t * 2^fors_height + j of one row of leaves, and
+    node addresses run on across trees the same way on every level. So one
+    fors_gen_leaves call derives all secret values and leaves, one
+    thash_many per level reduces every tree, and the last level holds the
+    roots in tree order. sig receives (fors_height + 1) * n bytes per tree,
+    roots n bytes per tree.
+    """
+    n, fors_height = params.n, params.fors_height
+    trees = len(indices)
+    count = trees << fors_height
+    idx_offset = first << fors_height
+    # Global leaf index of the signed leaf of every tree.
+    path = idx_offset + (np.arange(trees) << fors_height) + np.asarray(indices)
+    out = np.frombuffer(memoryview(sig), dtype=np.uint8).reshape(
+        trees, fors_height + 1, n
+    )
+
+    leaves = bytearray(count * n)
+    sks = fors_gen_leaves(
+        leaves, sk_seed, pub_seed, idx_offset, count, fors_tree_addr, params
+    )
+    out[:, 0] = np.frombuffer(sks, dtype=np.uint8).reshape(count, n)[path - idx_offset]
+
+    level = leaves
+    for height in range(fors_height):
+        nodes = np.frombuffer(level, dtype=np.uint8).reshape(-1, n)
+        out[:, height + 1] = nodes[((path >> height) ^ 0x1) - (idx_offset >> height)]
+
+        count >>= 1
+        first_node = idx_offset >> (height + 1)
+        addrs = address_batch(
+            count,
+            fors_tree_addr,
+            tree_height=height + 1,
+            tree_index=range(first_node, first_node + count),
+        )
+        parents = bytearray(count * n)
+        thash_many(parents, memoryview(level), 2, pub_seed, addrs)
+        level = parents
+    roots[: trees * n] = level
+
+
+def fors_pk_from_sig_tree(
+    root, sig, pub_seed, tree, index, fors_tree_addr, params=SPX_DEFAULT_PARAMS
+):
+    """Root of FORS tree number tree, from its part of the signature."""
+    n, fors_height = params.n, params.fors_height
+    idx_offset = tree * (1 << fors_height)
+    fors_tree_addr.set_tree_height(0)
+    fors_tree_addr.set_tree_index(index + idx_offset)
+
+    # Derive the leaf from the included secret key part.
+    leaf = bytearray(n)
+    fors_sk_to_leaf(leaf, sig[:n], pub_seed, fors_tree_addr)
+
+    # Derive the corresponding root node of this tree.
+    compute_root(
+        root,
+        leaf,
+        index,
+        idx_offset,
+        sig[n : (fors_height + 1) * n],
+        fors_height,
+        pub_seed,
+        fors_tree_addr,
+        params,
+    )
+
+
+def fors_tree_task(
+    sk_seed, pub_seed, fors_addr, tree, index, sig, backend, params=SPX_DEFAULT_PARAMS
+):
+    """Pool worker for FORS trees: signs when sk_seed is given, else verifies.
+
+    Signing takes the first tree and the indices of a group of trees, signs
+    them at once with fors_sign_trees and returns their signature parts
+    followed by their roots. Verifying takes one tree and index and returns
+    its root.
+    """
+    with use_hash_backend(backend):
+        seed_state(pub_seed, params)
+        fors_tree_addr = Address()
+        fors_tree_addr.copy_keypair_addr(Address.from_bytes(fors_addr))
+        fors_tree_addr.set_type(AddrType.FORS_TREE)
+
+        if sk_seed is None:
+            root = bytearray(params.n)
+            fors_pk_from_sig_tree(
+                root, sig, pub_seed, tree, index, fors_tree_addr, params
+            )
+            return bytes(root)
+
+        sig_bytes = len(index) * (params.fors_height + 1) * params.n
+        result = bytearray(sig_bytes + len(index) * params.n)
+        view = memoryview(result)
+        fors_sign_trees(
+            view[:sig_bytes],
+            view[sig_bytes:],
             sk_seed,
             pub_seed,
-            indices[i],
-            idx_offset,
-            SPX_FORS_HEIGHT,
-            fors_gen_leaf,
+            tree,
+            index,
             fors_tree_addr,
+            params,
         )
-        roots[i * SPX_N : i * SPX_N + SPX_N] = temp
-        sig[(i * SPX_FORS_HEIGHT + 1) * SPX_N : ((i + 1) * SPX_FORS_HEIGHT) * SPX_N] = (
-            auth_path
+        return result
+
+
+def fors_tree_groups(trees: int, workers: int, params=SPX_DEFAULT_PARAMS) -> list:
+    """(first, last + 1) of the groups of trees signed together.
+
+    One group per worker, each of at most SPX_FORS_BATCH_LEAVES leaves.
+    """
+    group = -(-trees // max(workers, 1))
+    group = max(1, min(group, SPX_FORS_BATCH_LEAVES >> params.fors_height))
+    return [(i, min(i + group, trees)) for i in range(0, trees, group)]
+
+
+def fors_map_trees(
+    sk_seed,
+    pub_seed,
+    fors_addr,
+    indices,
+    sig,
+    workers,
+    executor,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """Run fors_tree_task on executor, or the shared pool of workers.
+
+    Signing runs one task per fors_tree_groups group, verifying one per
+    tree; the results are in tree order.
+    """
+    tree_bytes = (params.fors_height + 1) * params.n
+    backend = get_hash_backend().name
+    if executor is None:
+        executor = shared_pool(workers)
+    if sk_seed is not None:
+        groups = fors_tree_groups(
+            params.fors_trees, pool_workers(executor, workers), params
         )
+        trees = [first for first, _ in groups]
+        tree_indices = [list(indices[first:last]) for first, last in groups]
+        sigs = [None] * len(groups)
+    else:
+        trees = range(params.fors_trees)
+        tree_indices = indices
+        sigs = [bytes(sig[i * tree_bytes : (i + 1) * tree_bytes]) for i in trees]
+    count = len(sigs)
+    return list(
+        executor.map(
+            fors_tree_task,
+            [sk_seed] * count,
+            [pub_seed] * count,
+            [fors_addr.to_bytes()] * count,
+            trees,
+            tree_indices,
+            sigs,
+            [backend] * count,
+            [params] * count,
+        )
+    )
+
+
+def fors_sign(
+    sig,
+    pk,
+    m,
+    sk_seed,
+    pub_seed,
+    fors_addr,
+    workers=None,
+    executor=None,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """FORS-sign the message digest m, writing fors_bytes into sig.
+
+    With workers > 1, or a thread/process executor given, groups of trees
+    are signed concurrently, one per worker (with an executor, workers is
+    its size; shared pools know their own), and merged in tree order,
+    matching the sequential output.
+    """
+    n, fors_trees = params.n, params.fors_trees
+    indices = [0] * fors_trees
+    roots = bytearray(fors_trees * n)
+    fors_tree_addr = Address()
+    fors_pk_addr = Address()
 
-    # Hash horizontally across all tree roots to derive the public key.
-    thash(pk, roots, SPX_FORS_TREES, pub_seed, fors_pk_addr)
+    fors_tree_addr.copy_keypair_addr(fors_addr)
+    fors_pk_addr.copy_keypair_addr(fors_addr)
 
+    fors_tree_addr.set_type(AddrType.FORS_TREE)
+    fors_pk_addr.set_type(AddrType.FORS_ROOTS)
+    message_to_indices(indices, m, params)
+
+    tree_bytes = (params.fors_height + 1) * n
+    # Groups of trees write their part of sig and their roots in place.
+    sig_view = memoryview(sig)
+    roots_view = memoryview(roots)
+    if executor is not None or (workers is not None and workers > 1):
+        results = fors_map_trees(
+            sk_seed, pub_seed, fors_addr, indices, None, workers, executor, params
+        )
+        first = 0
+        for result in results:
+            result = memoryview(result)
+            last = first + len(result) // (tree_bytes + n)
+            sig_bytes = (last - first) * tree_bytes
+            sig_view[first * tree_bytes : last * tree_bytes] = result[:sig_bytes]
+            roots_view[first * n : last * n] = result[sig_bytes:]
+            first = last
+    else:
+        for i, j in fors_tree_groups(fors_trees, 1, params):
+            fors_sign_trees(
+                sig_view[i * tree_bytes : j * tree_bytes],
+                roots_view[i * n : j * n],
+                sk_seed,
+                pub_seed,
+                i,
+                indices[i:j],
+                fors_tree_addr,
+                params,
+            )
 
-def fors_pk_from_sig(pk, sig, m, pub_seed, fors_addr):
-    indices = bytearray(SPX_FORS_TREES)
-    roots = bytearray(SPX_FORS_TREES * SPX_N)
-    leaf = bytearray(SPX_N)
+    # Hash horizontally across all tree roots to derive the public key.
+    thash(pk, roots, fors_trees, pub_seed, fors_pk_addr)
+
+
+def fors_pk_from_sig(
+    pk,
+    sig,
+    m,
+    pub_seed,
+    fors_addr,
+    workers=None,
+    executor=None,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """FORS public key from a FORS signature of m; trees may run concurrently."""
+    n, fors_trees = params.n, params.fors_trees
+    indices = [0] * fors_trees
+    roots = bytearray(fors_trees * n)
     fors_tree_addr = Address()
     fors_pk_addr = Address()
 
     fors_tree_addr.copy_keypair_addr(fors_addr)
     fors_pk_addr.copy_keypair_addr(fors_addr)
 
-    fors_tree_addr.set_type(3)
-    fors_pk_addr.set_type(4)
-    message_to_indices(indices, m)
+    fors_tree_addr.set_type(AddrType.FORS_TREE)
+    fors_pk_addr.set_type(AddrType.FORS_ROOTS)
+    message_to_indices(indices, m, params)
 
-    for i in range(SPX_FORS_TREES):
-        idx_offset = i * (1 << SPX_FORS_HEIGHT)
-        fors_tree_addr.set_tree_height(0)
-        fors_tree_addr.set_tree_index(indices[i] + idx_offset)
-
-        # Derive the leaf from the included secret key part.
-        fors_sk_to_leaf(
-            leaf,
-            sig[(i * SPX_FORS_HEIGHT) * SPX_N : (i * SPX_FORS_HEIGHT + 1) * SPX_N],
-            pub_seed,
-            fors_tree_addr,
+    tree_bytes = (params.fors_height + 1) * n
+    if executor is not None or (workers is not None and workers > 1):
+        results = fors_map_trees(
+            None, pub_seed, fors_addr, indices, sig, workers, executor, params
         )
-
-        auth_path = bytearray(SPX_N * (SPX_FORS_HEIGHT - 1))
-        auth_path = sig[(i + 1) * SPX_D : (i + SPX_FORS_HEIGHT) * SPX_D]
-        index = indices[i] + idx_offset
-        root = bytearray(SPX_N)
-
-        for j in range(SPX_FORS_HEIGHT - 1):
-            fors_tree_addr.set_tree_height(j + 1)
-            index >>= 1
-            fors_tree_addr.set_tree_index(index)
-            buff = bytearray(SPX_N * 2)
-            buff[:SPX_N] = auth_path[j * SPX_N : (j + 1) * SPX_N]
-            buff[SPX_N:] = leaf
-            thash(root, buff, 2, pub_seed, fors_tree_addr)
-
-        roots[i * SPX_N : i * SPX_N + SPX_N] = root
+        roots[:] = b"".join(results)
+    else:
+        root = bytearray(n)
+        for i in range(fors_trees):
+            fors_pk_from_sig_tree(
+                root,
+                sig[i * tree_bytes : (i + 1) * tree_bytes],
+                pub_seed,
+                i,
+                indices[i],
+                fors_tree_addr,
+                params,
+            )
+            roots[i * n : (i + 1) * n] = root
 
     # Hash horizontally across all tree roots to derive the public key.
-    thash(pk, roots, SPX_FORS_TREES, pub_seed, fors_pk_addr)
+    thash(pk, roots, fors_trees, pub_seed, fors_pk_addr)
@@ -0,0 +1,190 @@
+"""Memory-mappable key files holding a key and its precomputed signing state.
+
+A new signer would otherwise seed the hash midstate, rebuild the top-layer
+tree (2^h WOTS public keys, as in keygen) and refill its subtree cache
+before its first signature. A key file holds all of it, and KeyFile maps it
+with mmap: the top tree and subtree nodes are memoryviews into the mapping,
+so opening it reads and hashes nothing but the header.
+
+Layout, all integers little-endian:
+
+    header   SPX_KEY_FILE_MAGIC || version (1 byte) || parameter set name
+             (16 bytes, NUL padded) || n (1 byte) || tree height (1 byte) ||
+             flags (1 byte) || subtree count (4 bytes)
+    sk       params.sk_bytes, the public key is its last pk_bytes
+    midstate seeded_midstates(pub_seed): 32 bytes, 96 for "sha512" sets,
+             none for SHAKE256
+    top tree if SPX_KEY_FILE_TOP_TREE is set, the TopTree heap,
+             2^(h + 1) * n bytes
+    subtrees per subtree: layer (1 byte) || tree (8 bytes) || the levels of
+             treehash_levels, leaves first, (2^(h + 1) - 1) * n bytes
+
+The secret key is in the file: keep it as private as the key itself.
+"""
+
+import mmap
+import struct
+
+from spx.cache import SPX_SUBTREE_CACHE_BYTES, PinnedSubtreeCache
+from spx.params import PARAM_SETS, SPX_DEFAULT_PARAMS, get_params
+from spx.sign import crypto_sign_signature
+from spx.toptree import TopTree
+from spx.utils import seed_state, seeded_midstates
+
+SPX_KEY_FILE_MAGIC = b"SPXK"
+SPX_KEY_FILE_VERSION = 1
+SPX_KEY_FILE_HEADER = struct.Struct("<4sB16sBBBI")
+SPX_KEY_FILE_SUBTREE = struct.Struct("<BQ")
+# Flags of the header.
+SPX_KEY_FILE_TOP_TREE = 0x1
+
+
+def midstate_bytes(params) -> int:
+    return {"sha256": 32, "sha512": 96, "shake256": 0}[params.hash_name]
+
+
+def write_key_file(
+    path: str, sk, top_tree=None, subtree_cache=None, params=SPX_DEFAULT_PARAMS
+) -> None:
+    """Write sk, its midstates, top_tree and the subtrees of subtree_cache.
+
+    top_tree is the TopTree returned by crypto_sign_seed_keypair with
+    keep_top_tree; subtree_cache a SubtreeCache filled by signing with sk.
+    """
+    n = params.n
+    pk = bytes(sk[params.sk_bytes - params.pk_bytes : params.sk_bytes])
+    if top_tree is not None and top_tree.pk != pk:
+        raise ValueError("top tree does not belong to this key")
+    subtrees = [] if subtree_cache is None else subtree_cache.subtrees()
+    flags = SPX_KEY_FILE_TOP_TREE if top_tree is not None else 0
+    with open(path, "wb") as f:
+        f.write(
+            SPX_KEY_FILE_HEADER.pack(
+                SPX_KEY_FILE_MAGIC,
+                SPX_KEY_FILE_VERSION,
+                params.name.encode(),
+                n,
+                params.tree_height,
+                flags,
+                len(subtrees),
+            )
+        )
+        f.write(bytes(sk[: params.sk_bytes]))
+        f.write(seeded_midstates(pk[:n], params))
+        if top_tree is not None:
+            f.write(top_tree.heap)
+        for (layer, tree), levels in subtrees:
+            f.write(SPX_KEY_FILE_SUBTREE.pack(layer, tree))
+            for level in levels:
+                f.write(level)
+
+
+class KeyFile:
+    """A key file mapped read-only; see the module docstring for the layout.
+
+    Args:
+        path (str): file written by write_key_file
+        subtree_cache_bytes (int): limit on the subtrees computed while
+            signing, kept next to the stored ones; None for no limit
+    """
+
+    def __init__(self, path: str, subtree_cache_bytes=SPX_SUBTREE_CACHE_BYTES):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.parse(self.mmap, subtree_cache_bytes)
+        except BaseException:
+            self.close()
+            raise
+
+    def parse(self, data, subtree_cache_bytes) -> None:
+        # Everything is checked before the first view into data is taken,
+        # so a file that fails to parse can still be unmapped.
+        if len(data) < SPX_KEY_FILE_HEADER.size:
+            raise ValueError("not a key file")
+        magic, version, name, n, tree_height, flags, count = (
+            SPX_KEY_FILE_HEADER.unpack_from(data)
+        )
+        if magic != SPX_KEY_FILE_MAGIC:
+            raise ValueError("not a key file")
+        if version != SPX_KEY_FILE_VERSION:
+            raise ValueError(f"unsupported key file version {version}")
+        name = name.rstrip(b"\0").decode()
+        if name not in PARAM_SETS:
+            raise ValueError(f"Unknown parameter set '{name}'")
+        params = get_params(name)
+        if (n, tree_height) != (params.n, params.tree_height):
+            raise ValueError(f"key file header does not match parameter set {name}")
+
+        heap_bytes = (2 << tree_height) * n
+        subtree_bytes = SPX_KEY_FILE_SUBTREE.size + heap_bytes - n
+        offset = SPX_KEY_FILE_HEADER.size
+        size = offset + params.sk_bytes + midstate_bytes(params) + count * subtree_bytes
+        if flags & SPX_KEY_FILE_TOP_TREE:
+            size += heap_bytes
+        if len(data) != size:
+            raise ValueError(f"key file is {len(data)} bytes, expected {size}")
+
+        sk = data[offset : offset + params.sk_bytes]
+        pk = sk[params.sk_bytes - params.pk_bytes :]
+        offset += params.sk_bytes
+        midstates = data[offset : offset + midstate_bytes(params)]
+        offset += midstate_bytes(params)
+        # The root sits at heap index 1.
+        if (
+            flags & SPX_KEY_FILE_TOP_TREE
+            and data[offset + n : offset + 2 * n] != pk[n:]
+        ):
+            raise ValueError("top tree root does not match the public key")
+
+        self.params = params
+        # The key is small and read on every signature: copy it out.
+        self.sk = sk
+        self.pk = pk
+        self.midstates = midstates
+        view = memoryview(data).toreadonly()
+
+        self.top_tree = None
+        if flags & SPX_KEY_FILE_TOP_TREE:
+            self.top_tree = TopTree(pk, view[offset : offset + heap_bytes], tree_height)
+            offset += heap_bytes
+
+        # Stored subtrees are views into the mapping and never evicted; the
+        # ones computed while signing go to the bounded LRU part.
+        pinned = {}
+        for _ in range(count):
+            layer, tree = SPX_KEY_FILE_SUBTREE.unpack_from(data, offset)
+            offset += SPX_KEY_FILE_SUBTREE.size
+            levels = []
+            for height in range(tree_height + 1):
+                level_bytes = (n << tree_height) >> height
+                levels.append(view[offset : offset + level_bytes])
+                offset += level_bytes
+            pinned[(layer, tree)] = levels
+        self.subtree_cache = PinnedSubtreeCache(pinned, subtree_cache_bytes)
+
+    def seed(self) -> None:
+        """seed_state for this key, from the stored midstates."""
+        midstates = self.midstates or None
+        seed_state(self.pk[: self.params.n], self.params, midstates)
+
+    def sign(self, sig, siglen, m, mlen, **sign_kwargs) -> int:
+        """crypto_sign_signature with this key's top tree and subtree cache."""
+        self.seed()
+        sign_kwargs.setdefault("top_tree", self.top_tree)
+        sign_kwargs.setdefault("subtree_cache", self.subtree_cache)
+        return crypto_sign_signature(
+            sig, siglen, m, mlen, self.sk, params=self.params, **sign_kwargs
+        )
+
+    def close(self) -> None:
+        """Unmap the file; views taken from top_tree or the cache must be gone."""
+        self.top_tree = None
+        self.subtree_cache = None
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
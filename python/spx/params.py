@@ -0,0 +1,246 @@
+"""Runtime SPHINCS+ parameter sets.
+
+spx.constant fixes one parameter set at import time. A ParamSet holds the
+same values for any of the sets in src/params.h, plus tables derived from
+them once: signature component offsets, per-layer address templates,
+base-w and checksum digit tables and SHA-256 padding tails for thash.
+A set also names its hash family, so the tweakable hash is chosen per key:
+SHA-256, SHAKE256, or SHA-512 for H, T_l and H_msg of the 192 and 256 bit
+sets (F and PRF stay SHA-256). ParamSet objects are immutable, so one
+process can sign and verify with several sets side by side; the functions
+of wots, fors, utils and sign take a params argument that defaults to
+SPX_DEFAULT_PARAMS, the set of spx.constant.
+"""
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import numpy as np
+
+from spx.constant import (
+    SPX_OFFSET_LAYER,
+    SPX_SHA256_ADDR_BYTES,
+    SPX_SHA256_BLOCK_BYTES,
+    SPX_SHA512_BLOCK_BYTES,
+)
+
+SPX_HASH_NAMES = ("sha256", "shake256", "sha512")
+
+
+def readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True, eq=False)
+class ParamSet:
+    """One SPHINCS+ parameter set and its derived sizes and tables.
+
+    Args:
+        name (str): short name, e.g. "128f"
+        n (int): hash output length in bytes
+        full_height (int): height of the hypertree
+        d (int): number of subtree layers
+        fors_height (int): height of each FORS tree
+        fors_trees (int): number of FORS trees
+        wots_w (int): Winternitz parameter, 16 or 256
+        hash_name (str): hash family, "sha256", "shake256" or "sha512".
+            "sha512" is the SHA-2 instantiation of round 3.1 for the 192
+            and 256 bit sets: SHA-512 for H, T_l, H_msg and PRF_msg,
+            SHA-256 for F and PRF
+    """
+
+    name: str
+    n: int
+    full_height: int
+    d: int
+    fors_height: int
+    fors_trees: int
+    wots_w: int = 16
+    hash_name: str = "sha256"
+
+    wots_logw: int = field(init=False)
+    wots_len1: int = field(init=False)
+    wots_len2: int = field(init=False)
+    wots_len: int = field(init=False)
+    wots_bytes: int = field(init=False)
+    tree_height: int = field(init=False)
+    fors_msg_bytes: int = field(init=False)
+    fors_bytes: int = field(init=False)
+    bytes: int = field(init=False)
+    pk_bytes: int = field(init=False)
+    sk_bytes: int = field(init=False)
+    seed_bytes: int = field(init=False)
+    tree_bits: int = field(init=False)
+    tree_bytes: int = field(init=False)
+    leaf_bits: int = field(init=False)
+    leaf_bytes: int = field(init=False)
+    dgst_bytes: int = field(init=False)
+
+    # Derived tables.
+    fors_offset: int = field(init=False)
+    wots_offsets: tuple = field(init=False)
+    auth_offsets: tuple = field(init=False)
+    layer_addr_templates: np.ndarray = field(init=False, repr=False)
+    base_w_table: np.ndarray = field(init=False, repr=False)
+    csum_table: np.ndarray = field(init=False, repr=False)
+    thash_paddings: MappingProxyType = field(init=False, repr=False)
+
+    def __post_init__(self):
+        def derive(name, value):
+            object.__setattr__(self, name, value)
+
+        if self.wots_w == 256:
+            logw = 8
+        elif self.wots_w == 16:
+            logw = 4
+        else:
+            raise ValueError("SPX_WOTS_W assumed 16 or 256")
+        if self.hash_name not in SPX_HASH_NAMES:
+            raise ValueError(f"Unknown hash family '{self.hash_name}'")
+        if self.full_height % self.d:
+            raise ValueError("SPX_D should always divide SPX_FULL_HEIGHT")
+
+        len1 = 8 * self.n // logw
+        # floor(log(len_1 * (w - 1)) / log(w)) + 1, as precomputed in constant.py
+        len2 = 1
+        while self.wots_w**len2 <= len1 * (self.wots_w - 1):
+            len2 += 1
+        tree_height = self.full_height // self.d
+
+        derive("wots_logw", logw)
+        derive("wots_len1", len1)
+        derive("wots_len2", len2)
+        derive("wots_len", len1 + len2)
+        derive("wots_bytes", (len1 + len2) * self.n)
+        derive("tree_height", tree_height)
+        derive("fors_msg_bytes", (self.fors_height * self.fors_trees + 7) // 8)
+        derive("fors_bytes", (self.fors_height + 1) * self.fors_trees * self.n)
+        derive(
+            "bytes",
+            self.n
+            + self.fors_bytes
+            + self.d * self.wots_bytes
+            + self.full_height * self.n,
+        )
+        derive("pk_bytes", 2 * self.n)
+        derive("sk_bytes", 2 * self.n + self.pk_bytes)
+        derive("seed_bytes", 3 * self.n)
+        derive("tree_bits", tree_height * (self.d - 1))
+        derive("tree_bytes", (self.tree_bits + 7) // 8)
+        derive("leaf_bits", tree_height)
+        derive("leaf_bytes", (tree_height + 7) // 8)
+        derive("dgst_bytes", self.fors_msg_bytes + self.tree_bytes + self.leaf_bytes)
+        if self.tree_bits > 64:
+            raise ValueError(
+                "For given height and depth, 64 bits cannot represent all subtrees"
+            )
+
+        # Signature layout: R || FORS || (WOTS || auth path) per layer.
+        layer_bytes = self.wots_bytes + tree_height * self.n
+        wots_offsets = tuple(
+            self.n + self.fors_bytes + i * layer_bytes for i in range(self.d)
+        )
+        derive("fors_offset", self.n)
+        derive("wots_offsets", wots_offsets)
+        derive("auth_offsets", tuple(o + self.wots_bytes for o in wots_offsets))
+
+        templates = np.zeros((self.d, SPX_SHA256_ADDR_BYTES), dtype=np.uint8)
+        templates[:, SPX_OFFSET_LAYER] = np.arange(self.d)
+        derive("layer_addr_templates", readonly(templates))
+
+        # Base-w digits of every byte, most significant first.
+        digits = 8 // logw
+        shifts = np.arange(digits - 1, -1, -1) * logw
+        table = (np.arange(256)[:, None] >> shifts) & (self.wots_w - 1)
+        derive("base_w_table", readonly(table.astype(np.uint8)))
+
+        # Base-w digits of every checksum, shifted as in wots_checksum.
+        csum_bits = len2 * logw
+        csum_bytes = (csum_bits + 7) // 8
+        csums = np.arange(len1 * (self.wots_w - 1) + 1) << ((8 - csum_bits % 8) % 8)
+        shifts = 8 * csum_bytes - logw * np.arange(1, len2 + 1)
+        table = (csums[:, None] >> shifts) & (self.wots_w - 1)
+        derive("csum_table", readonly(table.astype(np.uint8)))
+
+        # SHA-2 padding tail of a thash over the seeded block, per arity.
+        paddings = {}
+        for inblocks in sorted({1, 2, self.wots_len, self.fors_trees}):
+            inlen = SPX_SHA256_ADDR_BYTES + inblocks * self.n
+            if self.thash_sha512(inblocks):
+                block, length_bytes = SPX_SHA512_BLOCK_BYTES, 16
+            else:
+                block, length_bytes = SPX_SHA256_BLOCK_BYTES, 8
+            total = block + inlen
+            pad_len = -(inlen + 1 + length_bytes) % block
+            paddings[inblocks] = (
+                b"\x80" + bytes(pad_len) + (total * 8).to_bytes(length_bytes, "big")
+            )
+        derive("thash_paddings", MappingProxyType(paddings))
+
+    def __reduce__(self):
+        # Pickle by name, so pool workers share their registered instances.
+        if PARAM_SETS.get(self.name) is self:
+            return get_params, (self.name,)
+        return ParamSet, (
+            self.name,
+            self.n,
+            self.full_height,
+            self.d,
+            self.fors_height,
+            self.fors_trees,
+            self.wots_w,
+            self.hash_name,
+        )
+
+    def thash_sha512(self, inblocks: int) -> bool:
+        """Whether a thash over inblocks blocks (T_l or H, not F) is SHA-512."""
+        return self.hash_name == "sha512" and inblocks > 1
+
+    def chain_lengths(self, msg) -> np.ndarray:
+        """WOTS chain lengths of an n-byte message: base-w digits and checksum."""
+        digits = self.base_w_table[np.frombuffer(bytes(msg[: self.n]), dtype=np.uint8)]
+        lengths = digits.reshape(-1)[: self.wots_len1]
+        csum = self.wots_len1 * (self.wots_w - 1) - int(lengths.sum())
+        return np.concatenate([lengths, self.csum_table[csum]])
+
+
+# (name, n, full_height, d, fors_height, fors_trees) of src/params.h.
+SPX_PARAM_SHAPES = (
+    ("128s", 16, 63, 7, 12, 14),
+    ("128f", 16, 66, 22, 6, 33),
+    ("192s", 24, 63, 7, 14, 17),
+    ("192f", 24, 66, 22, 8, 33),
+    ("256s", 32, 64, 8, 14, 22),
+    ("256f", 32, 68, 17, 9, 35),
+)
+
+# SHA-256 sets are named by their shape, e.g. "128f"; the other families get
+# a prefix, e.g. "shake256-128f". SHA-512 only has the 192 and 256 bit sets.
+PARAM_SETS = MappingProxyType(
+    {
+        params.name: params
+        for name, *shape in SPX_PARAM_SHAPES
+        for params in (
+            ParamSet(name, *shape),
+            ParamSet(f"shake256-{name}", *shape, hash_name="shake256"),
+        )
+        + (
+            (ParamSet(f"sha512-{name}", *shape, hash_name="sha512"),)
+            if shape[0] > 16
+            else ()
+        )
+    }
+)
+
+SPX_DEFAULT_PARAMS = PARAM_SETS["128f"]
+
+
+def get_params(params) -> ParamSet:
+    """The ParamSet for a ParamSet or a name such as "128s" or "192F"."""
+    if isinstance(params, ParamSet):
+        return params
+    try:
+        return PARAM_SETS[str(params).lower()]
+    except KeyError:
+        raise ValueError(f"Unknown parameter set '{params}'") from None
@@ -0,0 +1,43 @@
+"""Warm process pools shared by the parallel signing and verification paths.
+
+Starting a pool costs a process spawn, the spx imports and a seed_state per
+worker, far more than one signature's worth of subtrees. So the workers=
+paths of crypto_sign_signature, fors_sign and verify_many do not start their
+own: they take the pool of that size from shared_pool, which starts it on
+first use and keeps it for the life of the process.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+# Process pool per worker count, started by shared_pool.
+shared_pools = {}
+# Worker count of every pool started by shared_pool.
+pool_sizes = {}
+
+
+def shared_pool(workers: int) -> ProcessPoolExecutor:
+    """The process pool of workers processes, started on first use."""
+    pool = shared_pools.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        shared_pools[workers] = pool
+        pool_sizes[pool] = workers
+    return pool
+
+
+def pool_workers(executor, workers=None) -> int:
+    """workers if given, else the size of a shared_pool; 1 if neither is known.
+
+    Callers with an executor of their own pass its size as workers.
+    """
+    if workers is not None:
+        return workers
+    return pool_sizes.get(executor, 1)
+
+
+def shutdown_pools() -> None:
+    """Stop every shared pool; the next shared_pool call starts a new one."""
+    for pool in shared_pools.values():
+        pool.shutdown()
+    shared_pools.clear()
+    pool_sizes.clear()
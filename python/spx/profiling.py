@@ -0,0 +1,171 @@
+"""Opt-in counters and phase timers for the signing hot path.
+
+Inside ``with profiling() as profile:``, thash calls are counted by arity,
+together with the hash compressions they take. Signing also records the
+time of its phases: PRF_msg, H_msg, FORS, and the treehash and WOTS
+signature of every hypertree layer. Outside the block every hook is one
+check of active_profile against None.
+
+Compressions are counted per thash call, from the padded length of the
+seeded input: the number of SHA-256 (or SHA-512) blocks that
+crypto_hashblocks_sha256 would compress for that call, and Keccak
+permutations for SHAKE256. seed_state adds its seed block. The counts are
+the same whichever backend runs. Work done in pool worker processes is not
+counted.
+
+With allocations=True, tracemalloc runs inside the block and every phase
+also records its peak of newly allocated bytes, the measure of how much
+signing allocates beyond its output buffers. CPython keeps no count of
+allocations, so the peak stands in for one. Phases must not nest then.
+
+    with profiling() as profile:
+        crypto_sign_signature(sig, siglen, m, mlen, sk)
+    profile.as_dict()["thash_calls"][1]
+"""
+
+import csv
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+from spx.constant import (
+    SPX_SHA256_ADDR_BYTES,
+    SPX_SHA256_BLOCK_BYTES,
+    SPX_SHA512_BLOCK_BYTES,
+)
+
+# Bytes absorbed per Keccak-f[1600] permutation by SHAKE256.
+SPX_SHAKE256_RATE = 136
+SPX_PROFILE_FIELDS = ("metric", "key", "value")
+
+# The Profile collecting data, or None when profiling is off.
+active_profile = None
+
+
+@lru_cache(maxsize=None)
+def thash_compressions(params, inblocks: int) -> tuple:
+    """(hash name, compressions) of one thash over inblocks blocks.
+
+    The pub_seed block is in the seeded midstate and not counted.
+    """
+    if params.hash_name == "shake256":
+        inlen = params.n + 32 + inblocks * params.n
+        return "shake256", inlen // SPX_SHAKE256_RATE + 1
+    inlen = SPX_SHA256_ADDR_BYTES + inblocks * params.n
+    if params.thash_sha512(inblocks):
+        return (
+            "sha512",
+            (inlen + 17 + SPX_SHA512_BLOCK_BYTES - 1) // SPX_SHA512_BLOCK_BYTES,
+        )
+    return "sha256", (inlen + 9 + SPX_SHA256_BLOCK_BYTES - 1) // SPX_SHA256_BLOCK_BYTES
+
+
+class Profile:
+    """Counters and phase timers collected by profiling().
+
+    Args:
+        allocations (bool): also record each phase's peak allocated bytes
+    """
+
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.phase_peak_bytes = Counter()
+        self.thash_calls = Counter()
+        self.compressions = Counter()
+        self.counters = Counter()
+        self.phase_calls = Counter()
+        self.phase_seconds = Counter()
+
+    def count_thash(self, params, inblocks: int, calls: int = 1) -> None:
+        self.thash_calls[inblocks] += calls
+        hash_name, compressions = thash_compressions(params, inblocks)
+        self.compressions[hash_name] += calls * compressions
+
+    def count_seed(self, params) -> None:
+        """The compression of the pub_seed block by seed_state."""
+        if params.hash_name != "shake256":
+            self.compressions["sha256"] += 1
+        if params.hash_name == "sha512":
+            self.compressions["sha512"] += 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add value to a named counter, e.g. cache hits."""
+        self.counters[name] += value
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.allocations:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] += time.perf_counter() - start
+            self.phase_calls[name] += 1
+            if self.allocations:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.phase_peak_bytes[name] = max(self.phase_peak_bytes[name], peak)
+
+    def as_dict(self) -> dict:
+        return {
+            "thash_calls": dict(sorted(self.thash_calls.items())),
+            "compressions": dict(self.compressions),
+            "counters": dict(self.counters),
+            "phases": {
+                name: {
+                    "calls": calls,
+                    "seconds": self.phase_seconds[name],
+                    "peak_bytes": self.phase_peak_bytes.get(name),
+                }
+                for name, calls in self.phase_calls.items()
+            },
+        }
+
+    def rows(self) -> list:
+        """(metric, key, value) rows of everything collected."""
+        rows = [("thash_calls", k, v) for k, v in sorted(self.thash_calls.items())]
+        rows += [("compressions", k, v) for k, v in self.compressions.items()]
+        rows += [("counter", k, v) for k, v in self.counters.items()]
+        for name, calls in self.phase_calls.items():
+            rows.append(("phase_calls", name, calls))
+            rows.append(("phase_seconds", name, self.phase_seconds[name]))
+            if name in self.phase_peak_bytes:
+                rows.append(("phase_peak_bytes", name, self.phase_peak_bytes[name]))
+        return rows
+
+    def to_csv(self, path: str) -> None:
+        """Write rows() to path as metric,key,value CSV."""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(SPX_PROFILE_FIELDS)
+            writer.writerows(self.rows())
+
+
+@contextmanager
+def profiling(profile=None, allocations=False):
+    """Collect into profile (a new Profile by default) inside the block."""
+    global active_profile
+    previous = active_profile
+    active_profile = Profile(allocations) if profile is None else profile
+    tracing = active_profile.allocations and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        yield active_profile
+    finally:
+        if tracing:
+            tracemalloc.stop()
+        active_profile = previous
+
+
+NO_PHASE = nullcontext()
+
+
+def phase(name: str):
+    """Time the block as phase name when profiling; nothing otherwise."""
+    if active_profile is None:
+        return NO_PHASE
+    return active_profile.phase(name)
@@ -0,0 +1,553 @@
+"""Local asyncio signing and verification service with micro-batching.
+
+The server listens on a Unix domain socket or localhost TCP. Requests are
+queued, grouped into micro-batches of up to max_batch requests or whatever
+arrived within max_delay seconds of the first one, and run on a warm
+process pool. Each pool worker opens the service's key files (spx.keyfile)
+once, so it signs with the keys' top trees, subtree caches and midstates
+from its first request on; the subtrees it computes itself are kept in an
+LRU of subtree_cache_bytes per key. Responses are written as their batch
+finishes, so they may come back out of order; the request id matches them
+up. A request that fails in its batch is answered with an error, the rest
+of the batch is not affected.
+
+Backpressure: the queue holds at most max_queue requests. When it is full,
+a connection's next request is not read until there is room, and a client
+that does not read its responses is not read from either. drain() stops
+accepting, answers every queued request and then closes.
+
+Frames, all integers big-endian:
+
+    request   length (4 bytes, of the rest) || request id (4) || op (1) || body
+    response  length (4 bytes, of the rest) || request id (4) || status (1)
+              || body
+
+    SPX_OP_SIGN        key id length (1) || key id || message
+                       -> signature
+    SPX_OP_VERIFY      parameter set name length (1) || name || pk || sig
+                       || message -> 1 byte, 1 if valid
+    SPX_OP_PUBLIC_KEY  key id -> name length (1) || name || pk
+    SPX_OP_STATS       empty -> JSON of SigningService.stats()
+
+A response with SPX_STATUS_ERROR has a UTF-8 message as its body.
+
+    python -m spx.service serve --key main=main.spx --unix /tmp/spx.sock
+    python -m spx.service load --unix /tmp/spx.sock --key main --count 256
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from spx.bench import BenchResult, format_result
+from spx.cache import SPX_SUBTREE_CACHE_BYTES
+from spx.keyfile import KeyFile
+from spx.params import PARAM_SETS, get_params
+from spx.tuning import tuned_workers
+from spx.verify import verify_many
+
+SPX_OP_SIGN = 1
+SPX_OP_VERIFY = 2
+SPX_OP_PUBLIC_KEY = 3
+SPX_OP_STATS = 4
+SPX_STATUS_OK = 0
+SPX_STATUS_ERROR = 1
+SPX_SERVICE_FRAME = struct.Struct(">IIB")
+# Longest frame accepted, in bytes after the length field.
+SPX_SERVICE_MAX_FRAME = 1 << 24
+
+# KeyFile per key id, opened by init_worker in each pool worker.
+worker_keys = {}
+
+
+class ServiceError(Exception):
+    """A request answered with SPX_STATUS_ERROR."""
+
+
+def encode_frame(request_id: int, code: int, body: bytes) -> bytes:
+    return SPX_SERVICE_FRAME.pack(len(body) + 5, request_id, code) + body
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """(request id, op or status, body) of the next frame; None at EOF."""
+    try:
+        header = await reader.readexactly(SPX_SERVICE_FRAME.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ServiceError("connection closed inside a frame") from None
+        return None
+    length, request_id, code = SPX_SERVICE_FRAME.unpack(header)
+    if not 5 <= length <= SPX_SERVICE_MAX_FRAME:
+        raise ServiceError(f"frame of {length} bytes")
+    return request_id, code, await reader.readexactly(length - 5)
+
+
+def init_worker(key_files: dict, subtree_cache_bytes=SPX_SUBTREE_CACHE_BYTES) -> None:
+    # Signals to the process group are for the server, which drains the pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    for key_id, path in key_files.items():
+        worker_keys[key_id] = KeyFile(path, subtree_cache_bytes)
+
+
+def run_batch(requests: list) -> tuple:
+    """(status, body) of every request of a batch; runs in pool workers.
+
+    requests are ("sign", key id, message) or ("verify", parameter set
+    name, message, sig, pk). Verifications run in lockstep per parameter
+    set, signatures one after the other. A request that fails gets
+    SPX_STATUS_ERROR and the error; the others are answered as usual.
+    Returns the results, the worker's pid and the subtree cache stats of
+    its keys.
+    """
+    results = [None] * len(requests)
+    verify_groups = {}
+    for i, request in enumerate(requests):
+        if request[0] == "verify":
+            verify_groups.setdefault(request[1], []).append(i)
+            continue
+        try:
+            key_file = worker_keys[request[1]]
+            sig = bytearray(key_file.params.bytes)
+            message = request[2]
+            key_file.sign(sig, [0], message, len(message), workers=1)
+            results[i] = (SPX_STATUS_OK, bytes(sig))
+        except Exception as e:
+            results[i] = (SPX_STATUS_ERROR, f"sign failed: {e!r}".encode())
+    for name, indices in verify_groups.items():
+        items = [requests[i][2:] for i in indices]
+        try:
+            valid = verify_many(items, get_params(name), workers=1)
+            group = [(SPX_STATUS_OK, bytes([ok])) for ok in valid]
+        except Exception as e:
+            group = [(SPX_STATUS_ERROR, f"verify failed: {e!r}".encode())] * len(items)
+        for i, result in zip(indices, group):
+            results[i] = result
+    cache_stats = {
+        key_id: key_file.subtree_cache.stats()
+        for key_id, key_file in worker_keys.items()
+    }
+    return results, os.getpid(), cache_stats
+
+
+class SigningService:
+    """Micro-batching sign/verify server over a warm process pool.
+
+    Args:
+        key_files (dict): key id -> path of a file from write_key_file
+        workers (int): pool size, by default the tuned sign worker count;
+            also the number of batches run at once
+        max_batch (int): most requests in one batch
+        max_delay (float): seconds a batch waits for more requests
+        max_queue (int): most requests queued before reading pauses
+        subtree_cache_bytes (int): limit of each worker's cache of
+            subtrees computed per key, next to those in the key file
+    """
+
+    def __init__(
+        self,
+        key_files,
+        workers=None,
+        max_batch=32,
+        max_delay=0.005,
+        max_queue=1024,
+        subtree_cache_bytes=SPX_SUBTREE_CACHE_BYTES,
+    ):
+        self.key_files = dict(key_files)
+        self.workers = workers or tuned_workers("sign")
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.subtree_cache_bytes = subtree_cache_bytes
+        # pid -> key id -> subtree cache stats, as of the worker's last batch.
+        self.worker_caches = {}
+        self.keys = {}
+        self.server = None
+        self.executor = None
+        self.connections = set()
+        # Connection handler and batch tasks, awaited by drain.
+        self.handlers = set()
+        self.batches = set()
+        self.draining = False
+        self.metrics = {
+            "requests": 0,
+            "errors": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "max_queue_depth": 0,
+            "in_flight_batches": 0,
+        }
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """Open the keys, start the pool and listen on path, or host:port."""
+        for key_id, key_path in self.key_files.items():
+            key_file = KeyFile(key_path)
+            self.keys[key_id] = (key_file.params, key_file.pk)
+            key_file.close()
+        self.queue = asyncio.Queue(self.max_queue)
+        self.arrived = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.executor = ProcessPoolExecutor(
+            self.workers,
+            initializer=init_worker,
+            initargs=(self.key_files, self.subtree_cache_bytes),
+        )
+        self.batcher = asyncio.create_task(self.batch_loop())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self
+
+    @property
+    def address(self):
+        """The socket path, or the (host, port) listened on."""
+        return self.server.sockets[0].getsockname()
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["connections"] = len(self.connections)
+        stats["mean_batch"] = (
+            stats["batched_requests"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        # Subtree caches of all workers and keys, summed.
+        for name in ("entries", "bytes", "evictions", "pinned"):
+            stats[f"subtree_cache_{name}"] = sum(
+                cache[name]
+                for caches in self.worker_caches.values()
+                for cache in caches.values()
+            )
+        return stats
+
+    def parse(self, op: int, body: bytes):
+        """The run_batch request of a sign or verify body; raises ServiceError."""
+        if op == SPX_OP_SIGN:
+            key_id, message = split_name(body)
+            if key_id not in self.keys:
+                raise ServiceError(f"unknown key '{key_id}'")
+            return ("sign", key_id, message)
+        if op == SPX_OP_VERIFY:
+            name, rest = split_name(body)
+            if name not in PARAM_SETS:
+                raise ServiceError(f"Unknown parameter set '{name}'")
+            params = get_params(name)
+            if len(rest) < params.pk_bytes + params.bytes:
+                raise ServiceError("verify request too short")
+            pk = rest[: params.pk_bytes]
+            sig = rest[params.pk_bytes : params.pk_bytes + params.bytes]
+            return ("verify", name, rest[params.pk_bytes + params.bytes :], sig, pk)
+        raise ServiceError(f"unknown op {op}")
+
+    def answer(self, op: int, body: bytes) -> bytes:
+        """The body of an op answered without the pool."""
+        if op == SPX_OP_STATS:
+            return json.dumps(self.stats()).encode()
+        key_id = body.decode()
+        if key_id not in self.keys:
+            raise ServiceError(f"unknown key '{key_id}'")
+        params, pk = self.keys[key_id]
+        return bytes([len(params.name)]) + params.name.encode() + pk
+
+    async def handle(self, reader, writer) -> None:
+        self.connections.add(writer)
+        self.handlers.add(asyncio.current_task())
+
+        def respond(request_id, future):
+            if writer.is_closing():
+                return
+            if future.exception() is not None:
+                body = str(future.exception()).encode()
+                writer.write(encode_frame(request_id, SPX_STATUS_ERROR, body))
+            else:
+                writer.write(encode_frame(request_id, *future.result()))
+
+        try:
+            while True:
+                try:
+                    frame = await read_frame(reader)
+                except (ServiceError, ConnectionError):
+                    break
+                if frame is None:
+                    break
+                request_id, op, body = frame
+                self.metrics["requests"] += 1
+                future = asyncio.get_running_loop().create_future()
+                future.add_done_callback(lambda f, i=request_id: respond(i, f))
+                try:
+                    if self.draining:
+                        raise ServiceError("service is draining")
+                    if op in (SPX_OP_PUBLIC_KEY, SPX_OP_STATS):
+                        future.set_result((SPX_STATUS_OK, self.answer(op, body)))
+                    else:
+                        await self.submit(self.parse(op, body), future)
+                except (ServiceError, UnicodeDecodeError) as e:
+                    self.metrics["errors"] += 1
+                    future.set_exception(ServiceError(str(e)))
+                # Stop reading from clients that do not read their responses.
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def submit(self, request, future) -> None:
+        await self.queue.put((request, future))
+        self.metrics["max_queue_depth"] = max(
+            self.metrics["max_queue_depth"], self.queue.qsize()
+        )
+        self.arrived.set()
+
+    async def batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                self.arrived.clear()
+                try:
+                    await asyncio.wait_for(self.arrived.wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+            await self.slots.acquire()
+            task = asyncio.create_task(self.run(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def run(self, batch) -> None:
+        self.metrics["batches"] += 1
+        self.metrics["batched_requests"] += len(batch)
+        self.metrics["in_flight_batches"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            results, pid, cache_stats = await loop.run_in_executor(
+                self.executor, run_batch, [request for request, _ in batch]
+            )
+            self.worker_caches[pid] = cache_stats
+            for (_, future), (status, body) in zip(batch, results):
+                if status == SPX_STATUS_ERROR:
+                    self.metrics["errors"] += 1
+                    future.set_exception(ServiceError(body.decode()))
+                else:
+                    future.set_result((status, body))
+        except Exception as e:
+            self.metrics["errors"] += len(batch)
+            for _, future in batch:
+                future.set_exception(ServiceError(f"batch failed: {e!r}"))
+        finally:
+            self.metrics["in_flight_batches"] -= 1
+            self.slots.release()
+            for _ in batch:
+                self.queue.task_done()
+
+    async def drain(self) -> None:
+        """Stop accepting, answer every queued request, then shut down.
+
+        The pool is shut down only after the batcher, the batches and the
+        connection handlers have all finished.
+        """
+        self.draining = True
+        self.server.close()
+        await self.queue.join()
+        for writer in list(self.connections):
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+        self.batcher.cancel()
+        await asyncio.gather(
+            self.batcher, *self.batches, *self.handlers, return_exceptions=True
+        )
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.drain()
+
+
+def split_name(body: bytes) -> tuple:
+    """(name, rest) of a body starting with a length-prefixed name."""
+    if not body or len(body) < 1 + body[0]:
+        raise ServiceError("truncated name")
+    return body[1 : 1 + body[0]].decode(), body[1 + body[0] :]
+
+
+def with_name(name: str, rest: bytes = b"") -> bytes:
+    return bytes([len(name)]) + name.encode() + rest
+
+
+class ServiceClient:
+    """Pipelining client of a SigningService; requests may overlap freely."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_id = 0
+        self.receiver = asyncio.create_task(self.receive())
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def receive(self) -> None:
+        error = ServiceError("connection closed")
+        try:
+            while (frame := await read_frame(self.reader)) is not None:
+                request_id, status, body = frame
+                future = self.pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if status == SPX_STATUS_OK:
+                    future.set_result(body)
+                else:
+                    future.set_exception(ServiceError(body.decode()))
+        except (ServiceError, ConnectionError) as e:
+            error = ServiceError(str(e))
+        for future in self.pending.values():
+            future.set_exception(error)
+        self.pending.clear()
+
+    async def request(self, op: int, body: bytes = b"") -> bytes:
+        if self.receiver.done():
+            raise ServiceError("connection closed")
+        request_id = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(encode_frame(request_id, op, body))
+        await self.writer.drain()
+        return await future
+
+    async def sign(self, key_id: str, message: bytes) -> bytes:
+        return await self.request(SPX_OP_SIGN, with_name(key_id, message))
+
+    async def verify(self, message: bytes, sig: bytes, pk: bytes, params) -> bool:
+        body = with_name(params.name, bytes(pk) + bytes(sig) + message)
+        return (await self.request(SPX_OP_VERIFY, body)) == b"\x01"
+
+    async def public_key(self, key_id: str) -> tuple:
+        """(params, pk) of the service's key key_id."""
+        name, pk = split_name(await self.request(SPX_OP_PUBLIC_KEY, key_id.encode()))
+        return get_params(name), pk
+
+    async def stats(self) -> dict:
+        return json.loads(await self.request(SPX_OP_STATS))
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self.receiver
+
+
+async def generate_load(
+    client, key_id: str, count: int, concurrency=16, message_bytes=32, verify=False
+) -> BenchResult:
+    """Send count sign (or, with verify, verify) requests, concurrency at once.
+
+    Returns a BenchResult of the service round trips, "service-sign" or
+    "service-verify", with concurrency as its worker count.
+    """
+    params, pk = await client.public_key(key_id)
+    sig = await client.sign(key_id, bytes(message_bytes)) if verify else None
+    latencies = np.zeros(count)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        message = i.to_bytes(8, "big").rjust(message_bytes, b"\0")
+        async with semaphore:
+            start = time.perf_counter()
+            if verify:
+                await client.verify(message, sig, pk, params)
+            else:
+                await client.sign(key_id, message)
+            latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    wall = time.perf_counter() - start
+    function = "service-verify" if verify else "service-sign"
+    return BenchResult(function, params, concurrency, count, wall, latencies)
+
+
+async def serve(args) -> None:
+    key_files = dict(key.split("=", 1) for key in args.key)
+    service = SigningService(
+        key_files,
+        args.workers,
+        args.max_batch,
+        args.max_delay,
+        args.max_queue,
+        args.subtree_cache_bytes,
+    )
+    await service.start(args.unix, args.host, args.port)
+    print(f"listening on {service.address}", flush=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+    await service.drain()
+    print(json.dumps(service.stats()))
+
+
+async def load(args) -> None:
+    client = await ServiceClient.connect(args.unix, args.host, args.port)
+    try:
+        for key_id in args.key:
+            result = await generate_load(
+                client, key_id, args.count, args.concurrency, verify=args.verify
+            )
+            print(format_result(result))
+        print(json.dumps(await client.stats()))
+    finally:
+        await client.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--key", nargs="+", required=True, help="id=path")
+    serve_parser.add_argument("--workers", type=int)
+    serve_parser.add_argument("--max-batch", type=int, default=32)
+    serve_parser.add_argument("--max-delay", type=float, default=0.005)
+    serve_parser.add_argument("--max-queue", type=int, default=1024)
+    serve_parser.add_argument(
+        "--subtree-cache-bytes", type=int, default=SPX_SUBTREE_CACHE_BYTES
+    )
+    load_parser = commands.add_parser("load")
+    load_parser.add_argument("--key", nargs="+", required=True, help="key ids")
+    load_parser.add_argument("--count", type=int, default=64)
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--verify", action="store_true")
+    for command in (serve_parser, load_parser):
+        command.add_argument("--unix", help="Unix domain socket path")
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=7878)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args) if args.command == "serve" else load(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Multi-lane SHA-256 compression using NumPy uint32 lanes.
+
+Every lane holds an independent SHA-256 state, so one call of
+``crypto_hashblocks_sha256x`` compresses one block for each of many
+messages at once. This mirrors the x4/x8 hashing used by the reference
+implementation, with the lane count only bounded by memory.
+"""
+
+import numpy as np
+
+from spx.constant import SPX_SHA256_BLOCK_BYTES
+
+K_256 = np.array(
+    [
+        0x428A2F98,
+        0x71374491,
+        0xB5C0FBCF,
+        0xE9B5DBA5,
+        0x3956C25B,
+        0x59F111F1,
+        0x923F82A4,
+        0xAB1C5ED5,
+        0xD807AA98,
+        0x12835B01,
+        0x243185BE,
+        0x550C7DC3,
+        0x72BE5D74,
+        0x80DEB1FE,
+        0x9BDC06A7,
+        0xC19BF174,
+        0xE49B69C1,
+        0xEFBE4786,
+        0x0FC19DC6,
+        0x240CA1CC,
+        0x2DE92C6F,
+        0x4A7484AA,
+        0x5CB0A9DC,
+        0x76F988DA,
+        0x983E5152,
+        0xA831C66D,
+        0xB00327C8,
+        0xBF597FC7,
+        0xC6E00BF3,
+        0xD5A79147,
+        0x06CA6351,
+        0x14292967,
+        0x27B70A85,
+        0x2E1B2138,
+        0x4D2C6DFC,
+        0x53380D13,
+        0x650A7354,
+        0x766A0ABB,
+        0x81C2C92E,
+        0x92722C85,
+        0xA2BFE8A1,
+        0xA81A664B,
+        0xC24B8B70,
+        0xC76C51A3,
+        0xD192E819,
+        0xD6990624,
+        0xF40E3585,
+        0x106AA070,
+        0x19A4C116,
+        0x1E376C08,
+        0x2748774C,
+        0x34B0BCB5,
+        0x391C0CB3,
+        0x4ED8AA4A,
+        0x5B9CCA4F,
+        0x682E6FF3,
+        0x748F82EE,
+        0x78A5636F,
+        0x84C87814,
+        0x8CC70208,
+        0x90BEFFFA,
+        0xA4506CEB,
+        0xBEF9A3F7,
+        0xC67178F2,
+    ],
+    dtype=np.uint32,
+)
+
+
+def rotr(x: np.ndarray, n: int) -> np.ndarray:
+    return (x >> np.uint32(n)) | (x << np.uint32(32 - n))
+
+
+def crypto_hashblocks_sha256x(states: np.ndarray, blocks: np.ndarray) -> None:
+    """Compress one 64-byte block per lane, updating states in place.
+
+    Args:
+        states (np.ndarray): (lanes, 8) uint32 chaining values
+        blocks (np.ndarray): (lanes, 16) uint32 message words, already
+            converted from big-endian
+    """
+    W = [blocks[:, i] for i in range(16)]
+    for i in range(16, 64):
+        w15 = W[i - 15]
+        w2 = W[i - 2]
+        s0 = rotr(w15, 7) ^ rotr(w15, 18) ^ (w15 >> np.uint32(3))
+        s1 = rotr(w2, 17) ^ rotr(w2, 19) ^ (w2 >> np.uint32(10))
+        W.append(W[i - 16] + s0 + W[i - 7] + s1)
+
+    a, b, c, d, e, f, g, h = (states[:, i].copy() for i in range(8))
+
+    for i in range(64):
+        T1 = (
+            h
+            + (rotr(e, 6) ^ rotr(e, 11) ^ rotr(e, 25))
+            + ((e & f) ^ (~e & g))
+            + K_256[i]
+            + W[i]
+        )
+        T2 = (rotr(a, 2) ^ rotr(a, 13) ^ rotr(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))
+        h = g
+        g = f
+        f = e
+        e = d + T1
+        d = c
+        c = b
+        b = a
+        a = T1 + T2
+
+    states += np.stack([a, b, c, d, e, f, g, h], axis=1)
+
+
+def sha256x_inc_finalize(
+    state: np.ndarray, bytes_count: int, in_data: np.ndarray, padding=None
+) -> np.ndarray:
+    """Pad and compress equal-length messages, one per lane.
+
+    Args:
+        state (np.ndarray): (8,) or (lanes, 8) uint32 midstate to start from
+        bytes_count (int): bytes already absorbed into the midstate
+        in_data (np.ndarray): (lanes, inlen) uint8 message tails
+        padding (bytes): precomputed padding tail for this bytes_count and
+            inlen, e.g. from ParamSet.thash_paddings; computed when None
+
+    Returns:
+        np.ndarray: (lanes, 32) uint8 digests
+    """
+    lanes, inlen = in_data.shape
+    if padding is None:
+        total = bytes_count + inlen
+        pad_len = -(inlen + 9) % SPX_SHA256_BLOCK_BYTES
+        padding = b"\x80" + bytes(pad_len) + (total * 8).to_bytes(8, "big")
+    nblocks = (inlen + len(padding)) // SPX_SHA256_BLOCK_BYTES
+
+    padded = np.empty((lanes, nblocks * SPX_SHA256_BLOCK_BYTES), dtype=np.uint8)
+    padded[:, :inlen] = in_data
+    padded[:, inlen:] = np.frombuffer(padding, dtype=np.uint8)
+
+    words = padded.view(">u4").astype(np.uint32)
+    states = np.empty((lanes, 8), dtype=np.uint32)
+    states[:] = state
+
+    for i in range(nblocks):
+        crypto_hashblocks_sha256x(states, words[:, 16 * i : 16 * (i + 1)])
+
+    return states.astype(">u4").view(np.uint8)
@@ -0,0 +1,208 @@
+"""Multi-lane SHA-512 compression using NumPy uint64 lanes.
+
+The SHA-512 counterpart of spx.sha256x, for the parameter sets that use
+SHA-512 for H and T_l. Every lane holds an independent SHA-512 state.
+"""
+
+import numpy as np
+
+from spx.constant import SPX_SHA512_BLOCK_BYTES
+
+IV_512 = np.array(
+    [
+        0x6A09E667F3BCC908,
+        0xBB67AE8584CAA73B,
+        0x3C6EF372FE94F82B,
+        0xA54FF53A5F1D36F1,
+        0x510E527FADE682D1,
+        0x9B05688C2B3E6C1F,
+        0x1F83D9ABFB41BD6B,
+        0x5BE0CD19137E2179,
+    ],
+    dtype=np.uint64,
+)
+
+K_512 = np.array(
+    [
+        0x428A2F98D728AE22,
+        0x7137449123EF65CD,
+        0xB5C0FBCFEC4D3B2F,
+        0xE9B5DBA58189DBBC,
+        0x3956C25BF348B538,
+        0x59F111F1B605D019,
+        0x923F82A4AF194F9B,
+        0xAB1C5ED5DA6D8118,
+        0xD807AA98A3030242,
+        0x12835B0145706FBE,
+        0x243185BE4EE4B28C,
+        0x550C7DC3D5FFB4E2,
+        0x72BE5D74F27B896F,
+        0x80DEB1FE3B1696B1,
+        0x9BDC06A725C71235,
+        0xC19BF174CF692694,
+        0xE49B69C19EF14AD2,
+        0xEFBE4786384F25E3,
+        0x0FC19DC68B8CD5B5,
+        0x240CA1CC77AC9C65,
+        0x2DE92C6F592B0275,
+        0x4A7484AA6EA6E483,
+        0x5CB0A9DCBD41FBD4,
+        0x76F988DA831153B5,
+        0x983E5152EE66DFAB,
+        0xA831C66D2DB43210,
+        0xB00327C898FB213F,
+        0xBF597FC7BEEF0EE4,
+        0xC6E00BF33DA88FC2,
+        0xD5A79147930AA725,
+        0x06CA6351E003826F,
+        0x142929670A0E6E70,
+        0x27B70A8546D22FFC,
+        0x2E1B21385C26C926,
+        0x4D2C6DFC5AC42AED,
+        0x53380D139D95B3DF,
+        0x650A73548BAF63DE,
+        0x766A0ABB3C77B2A8,
+        0x81C2C92E47EDAEE6,
+        0x92722C851482353B,
+        0xA2BFE8A14CF10364,
+        0xA81A664BBC423001,
+        0xC24B8B70D0F89791,
+        0xC76C51A30654BE30,
+        0xD192E819D6EF5218,
+        0xD69906245565A910,
+        0xF40E35855771202A,
+        0x106AA07032BBD1B8,
+        0x19A4C116B8D2D0C8,
+        0x1E376C085141AB53,
+        0x2748774CDF8EEB99,
+        0x34B0BCB5E19B48A8,
+        0x391C0CB3C5C95A63,
+        0x4ED8AA4AE3418ACB,
+        0x5B9CCA4F7763E373,
+        0x682E6FF3D6B2B8A3,
+        0x748F82EE5DEFB2FC,
+        0x78A5636F43172F60,
+        0x84C87814A1F0AB72,
+        0x8CC702081A6439EC,
+        0x90BEFFFA23631E28,
+        0xA4506CEBDE82BDE9,
+        0xBEF9A3F7B2C67915,
+        0xC67178F2E372532B,
+        0xCA273ECEEA26619C,
+        0xD186B8C721C0C207,
+        0xEADA7DD6CDE0EB1E,
+        0xF57D4F7FEE6ED178,
+        0x06F067AA72176FBA,
+        0x0A637DC5A2C898A6,
+        0x113F9804BEF90DAE,
+        0x1B710B35131C471B,
+        0x28DB77F523047D84,
+        0x32CAAB7B40C72493,
+        0x3C9EBE0A15C9BEBC,
+        0x431D67C49C100D4C,
+        0x4CC5D4BECB3E42B6,
+        0x597F299CFC657E2A,
+        0x5FCB6FAB3AD6FAEC,
+        0x6C44198C4A475817,
+    ],
+    dtype=np.uint64,
+)
+
+
+def rotr(x: np.ndarray, n: int) -> np.ndarray:
+    return (x >> np.uint64(n)) | (x << np.uint64(64 - n))
+
+
+def crypto_hashblocks_sha512x(states: np.ndarray, blocks: np.ndarray) -> None:
+    """Compress one 128-byte block per lane, updating states in place.
+
+    Args:
+        states (np.ndarray): (lanes, 8) uint64 chaining values
+        blocks (np.ndarray): (lanes, 16) uint64 message words, already
+            converted from big-endian
+    """
+    W = [blocks[:, i] for i in range(16)]
+    for i in range(16, 80):
+        w15 = W[i - 15]
+        w2 = W[i - 2]
+        s0 = rotr(w15, 1) ^ rotr(w15, 8) ^ (w15 >> np.uint64(7))
+        s1 = rotr(w2, 19) ^ rotr(w2, 61) ^ (w2 >> np.uint64(6))
+        W.append(W[i - 16] + s0 + W[i - 7] + s1)
+
+    a, b, c, d, e, f, g, h = (states[:, i].copy() for i in range(8))
+
+    for i in range(80):
+        T1 = (
+            h
+            + (rotr(e, 14) ^ rotr(e, 18) ^ rotr(e, 41))
+            + ((e & f) ^ (~e & g))
+            + K_512[i]
+            + W[i]
+        )
+        T2 = (rotr(a, 28) ^ rotr(a, 34) ^ rotr(a, 39)) + ((a & b) ^ (a & c) ^ (b & c))
+        h = g
+        g = f
+        f = e
+        e = d + T1
+        d = c
+        c = b
+        b = a
+        a = T1 + T2
+
+    states += np.stack([a, b, c, d, e, f, g, h], axis=1)
+
+
+def sha512x_seeded_states(seeds: np.ndarray) -> np.ndarray:
+    """The (lanes, 8) midstates after the block pub_seed || zeros, per row.
+
+    Args:
+        seeds (np.ndarray): (lanes, n) uint8 pub_seeds
+    """
+    lanes, n = seeds.shape
+    blocks = np.zeros((lanes, SPX_SHA512_BLOCK_BYTES), dtype=np.uint8)
+    blocks[:, :n] = seeds
+    states = np.empty((lanes, 8), dtype=np.uint64)
+    states[:] = IV_512
+    crypto_hashblocks_sha512x(states, blocks.view(">u8").astype(np.uint64))
+    return states
+
+
+def sha512x_padding(bytes_count: int, inlen: int) -> bytes:
+    """The padding tail of an inlen byte input after bytes_count bytes."""
+    total = bytes_count + inlen
+    pad_len = -(inlen + 17) % SPX_SHA512_BLOCK_BYTES
+    return b"\x80" + bytes(pad_len) + (total * 8).to_bytes(16, "big")
+
+
+def sha512x_inc_finalize(
+    state: np.ndarray, bytes_count: int, in_data: np.ndarray, padding=None
+) -> np.ndarray:
+    """Pad and compress equal-length messages, one per lane.
+
+    Args:
+        state (np.ndarray): (8,) or (lanes, 8) uint64 midstate to start from
+        bytes_count (int): bytes already absorbed into the midstate
+        in_data (np.ndarray): (lanes, inlen) uint8 message tails
+        padding (bytes): precomputed padding tail for this bytes_count and
+            inlen, e.g. from ParamSet.thash_paddings; computed when None
+
+    Returns:
+        np.ndarray: (lanes, 64) uint8 digests
+    """
+    lanes, inlen = in_data.shape
+    if padding is None:
+        padding = sha512x_padding(bytes_count, inlen)
+    nblocks = (inlen + len(padding)) // SPX_SHA512_BLOCK_BYTES
+
+    padded = np.empty((lanes, nblocks * SPX_SHA512_BLOCK_BYTES), dtype=np.uint8)
+    padded[:, :inlen] = in_data
+    padded[:, inlen:] = np.frombuffer(padding, dtype=np.uint8)
+
+    words = padded.view(">u8").astype(np.uint64)
+    states = np.empty((lanes, 8), dtype=np.uint64)
+    states[:] = state
+
+    for i in range(nblocks):
+        crypto_hashblocks_sha512x(states, words[:, 16 * i : 16 * (i + 1)])
+
+    return states.astype(">u8").view(np.uint8)
@@ -1,13 +1,22 @@
 import hashlib
 import os
+from functools import partial
 from spx.utils import *
 from spx.constant import *
-from spx.address import Address, AddrType
-from spx.wots import wots_gen_pk, wots_sign
-
-
-def wots_gen_leaf(leaf, sk_seed, pub_seed, addr_idx, tree_addr: Address):
-    pk = bytearray(SPX_WOTS_BYTES)
+from spx import profiling
+from spx.profiling import phase
+from spx.address import Address, AddrType, address_batch
+from spx.cache import subtree_cache_for
+from spx.fors import fors_pk_from_sig, fors_sign
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.pool import shared_pool
+from spx.toptree import TopTree
+from spx.wots import wots_gen_pk, wots_gen_pks, wots_pk_from_sig, wots_sign
+
+
+def wots_gen_leaf(
+    leaf, sk_seed, pub_seed, addr_idx, tree_addr: Address, params=SPX_DEFAULT_PARAMS
+):
     wots_addr = Address()
     wots_pk_addr = Address()
 
@@ -17,225 +26,532 @@ def wots_gen_leaf(leaf, sk_seed, pub_seed, addr_idx, tree_addr: Address):
     wots_addr.copy_subtree_addr(tree_addr)
     wots_addr.set_keypair_addr(addr_idx)
 
-    wots_gen_pk(pk, sk_seed, pub_seed, wots_addr)
+    pk = wots_gen_pk(sk_seed, pub_seed, wots_addr, params=params)
 
     wots_pk_addr.copy_keypair_addr(wots_addr)
 
-    thash(leaf, pk, SPX_WOTS_LEN, pub_seed, wots_pk_addr)
+    thash(leaf, pk, params.wots_len, pub_seed, wots_pk_addr)
+
 
+def wots_gen_leaves(
+    leaves,
+    sk_seed,
+    pub_seed,
+    idx_offset,
+    count,
+    tree_addr: Address,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """Batched wots_gen_leaf for the leaves idx_offset .. idx_offset + count - 1.
+
+    The chains of all leaves run in lockstep through wots_gen_pks and the
+    WOTS public keys are compressed by one thash_many.
+    """
+    wots_addr = Address()
+    wots_pk_addr = Address()
+
+    wots_addr.set_type(AddrType.WOTS_HASH)
+    wots_pk_addr.set_type(AddrType.WOTS_PK)
+
+    wots_addr.copy_subtree_addr(tree_addr)
+    wots_pk_addr.copy_subtree_addr(tree_addr)
 
-def crypto_sign_seed_keypair(pk, sk, seed):
-    auth_path = bytearray(SPX_TREE_HEIGHT * SPX_N)
+    keypairs = range(idx_offset, idx_offset + count)
+    pks = wots_gen_pks(sk_seed, pub_seed, wots_addr, keypairs, params)
+
+    wots_pk_addrs = address_batch(count, wots_pk_addr, keypair=keypairs)
+    thash_many(leaves, pks, params.wots_len, pub_seed, wots_pk_addrs)
+
+
+def crypto_sign_seed_keypair(
+    pk, sk, seed, keep_top_tree=False, params=SPX_DEFAULT_PARAMS
+):
+    """Derive a key pair from seed into pk and sk.
+
+    With keep_top_tree, every node of the top-layer tree is kept and returned
+    as a TopTree, which crypto_sign_signature reads the top auth path from.
+    params selects the parameter set; seed is params.seed_bytes long.
+    """
+    n = params.n
+    auth_path = bytearray(params.tree_height * n)
     top_tree_addr = Address()
 
-    top_tree_addr.set_layer_addr(SPX_D - 1)
+    top_tree_addr.set_layer_addr(params.d - 1)
     top_tree_addr.set_type(AddrType.TREE)
 
-    sk[:] = seed[:CRYPTO_SEEDBYTES]
+    sk[:] = seed[: params.seed_bytes]
 
-    pk[:] = sk[2 * SPX_N : 2 * SPX_N + SPX_N]
+    pk[:] = sk[2 * n : 2 * n + n]
 
-    initialize_hash_function(pk, sk)
-    out = sk[3 * SPX_N : 3 * SPX_N + SPX_N]
-    treehash(
+    initialize_hash_function(pk, sk, params)
+    out = sk[3 * n : 3 * n + n]
+    levels = treehash_levels(
         out,
         auth_path,
         sk,
-        sk[2 * SPX_N : 2 * SPX_N + SPX_N],
+        sk[2 * n : 2 * n + n],
         0,
         0,
-        SPX_TREE_HEIGHT,
-        wots_gen_leaf,
+        params.tree_height,
+        partial(wots_gen_leaves, params=params),
         top_tree_addr,
+        params,
     )
-    sk[3 * SPX_N : 3 * SPX_N + SPX_N] = out
+    sk[3 * n : 3 * n + n] = out
 
-    pk[SPX_N : SPX_N + SPX_N] = sk[3 * SPX_N : 3 * SPX_N + SPX_N]
+    pk[n : n + n] = sk[3 * n : 3 * n + n]
 
+    if keep_top_tree:
+        return TopTree.from_levels(pk, levels)
 
-def crypto_sign_keypair(pk, sk):
-    seed = os.urandom(CRYPTO_SEEDBYTES)
-    return crypto_sign_seed_keypair(pk, sk, seed)
 
+def crypto_sign_keypair(pk, sk, keep_top_tree=False, params=SPX_DEFAULT_PARAMS):
+    seed = os.urandom(params.seed_bytes)
+    return crypto_sign_seed_keypair(pk, sk, seed, keep_top_tree, params)
 
-def gen_message_random(R, sk_prf, optrand, m, mlen):
-    import hmac
-    import hashlib
 
-    # This implements HMAC-SHA256 using hmac and hashlib
-    key = bytes(sk_prf)
-    msg = bytes(optrand + m)
-    hmac_sha256 = hmac.new(key, msg, hashlib.sha256).digest()
-    R[:] = hmac_sha256[:SPX_N]
+def message_chunks(m, mlen):
+    """The chunks of m: a streamed MessageSource, or m[:mlen] without copying."""
+    if hasattr(m, "chunks"):
+        return m.chunks()
+    return (memoryview(m).cast("B")[:mlen],)
 
 
-# Assuming sha256_inc_init, sha256_inc_blocks, and sha256_inc_finalize are custom functions
-def sha256_inc_init(state):
-    state[:] = hashlib.sha256().digest()
+def message_digest(m, mlen) -> bytes:
+    """SHA256 of m, the message key of a SignatureCache."""
+    state = hashlib.sha256()
+    for chunk in message_chunks(m, mlen):
+        state.update(chunk)
+    return state.digest()
 
 
-def sha256_inc_blocks(state, data, num_blocks):
-    sha256 = hashlib.sha256()
-    sha256.update(data[: num_blocks * 64])
-    state[:] = sha256.digest()
+def gen_message_random(R, sk_prf, optrand, m, mlen, params=SPX_DEFAULT_PARAMS):
+    import hmac
+    import hashlib
 
+    if params.hash_name == "shake256":
+        # R = SHAKE256(sk_prf || optrand || M)
+        state = hashlib.shake_256(bytes(sk_prf[: params.n]))
+        state.update(bytes(optrand[: params.n]))
+        for chunk in message_chunks(m, mlen):
+            state.update(chunk)
+        R[:] = state.digest(params.n)
+        return
+
+    # This implements HMAC-SHA256 (HMAC-SHA512 for "sha512" sets) using hmac
+    # and hashlib
+    key = bytes(sk_prf)
+    digestmod = hashlib.sha512 if params.hash_name == "sha512" else hashlib.sha256
+    state = hmac.new(key, bytes(optrand), digestmod)
+    for chunk in message_chunks(m, mlen):
+        state.update(chunk)
+    R[:] = state.digest()[: params.n]
 
-def sha256_inc_finalize(output, state, data, data_len):
-    sha256 = hashlib.sha256(state)
-    sha256.update(data[:data_len])
-    output[:] = sha256.digest()
 
+def mgf1(out, outlen, in_data, inlen, hash_fn=hashlib.sha256):
+    """MGF1 with SHA256: SHA256(in || 0) || SHA256(in || 1) || .., outlen bytes.
 
-def mgf1(out, outlen, in_data, inlen):
+    hash_fn replaces SHA256, e.g. hashlib.sha512.
+    """
     inbuf = bytearray(inlen + 4)
-    outbuf = bytearray(SPX_SHA256_OUTPUT_BYTES)
-    inbuf[:inlen] = in_data
+    inbuf[:inlen] = in_data[:inlen]
+    output_bytes = hash_fn().digest_size
 
     i = 0
-    while (i + 1) * SPX_SHA256_OUTPUT_BYTES <= outlen:
+    while i * output_bytes < outlen:
         inbuf[inlen:] = i.to_bytes(4, byteorder="big")
-        hashlib.sha256(out, inbuf)
-        out[outlen:] = out[:SPX_SHA256_OUTPUT_BYTES]
-        out = out[SPX_SHA256_OUTPUT_BYTES:]
+        block = hash_fn(inbuf).digest()
+        end = min(outlen, (i + 1) * output_bytes)
+        out[i * output_bytes : end] = block[: end - i * output_bytes]
         i += 1
 
-    if outlen > i * SPX_SHA256_OUTPUT_BYTES:
-        inbuf[inlen:] = i.to_bytes(4, byteorder="big")
-        hashlib.sha256(outbuf, inbuf)
-        out[outlen:] = outbuf[: outlen - i * SPX_SHA256_OUTPUT_BYTES]
-
-
-def hash_message(digest, tree, leaf_idx, R, pk, m, mlen):
-    SPX_TREE_BITS = SPX_TREE_HEIGHT * (SPX_D - 1)
-    SPX_TREE_BYTES = (SPX_TREE_BITS + 7) // 8
-    SPX_LEAF_BITS = SPX_TREE_HEIGHT
-    SPX_LEAF_BYTES = (SPX_LEAF_BITS + 7) // 8
-    SPX_DGST_BYTES = SPX_FORS_MSG_BYTES + SPX_TREE_BYTES + SPX_LEAF_BYTES
-    SPX_SHA256_BLOCK_BYTES = 64
-    SPX_SHA256_OUTPUT_BYTES = 32
-
-    seed = bytearray(SPX_SHA256_OUTPUT_BYTES)
-
-    # Round to nearest multiple of SPX_SHA256_BLOCK_BYTES
-    if (SPX_SHA256_BLOCK_BYTES & (SPX_SHA256_BLOCK_BYTES - 1)) != 0:
-        raise ValueError("Assumes that SPX_SHA256_BLOCK_BYTES is a power of 2")
-    SPX_INBLOCKS = (
-        (SPX_N + SPX_PK_BYTES + SPX_SHA256_BLOCK_BYTES - 1) & -SPX_SHA256_BLOCK_BYTES
-    ) // SPX_SHA256_BLOCK_BYTES
-    inbuf = bytearray(SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES)
-
-    buf = bytearray(SPX_DGST_BYTES)
-    bufp = buf
-    state = bytearray(40)
-
-    sha256_inc_init(state)
-
-    inbuf[:SPX_N] = R
-    inbuf[SPX_N : SPX_N + SPX_PK_BYTES] = pk
-
-    # If R + pk + message cannot fill up an entire block
-    if SPX_N + SPX_PK_BYTES + mlen < SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES:
-        inbuf[SPX_N + SPX_PK_BYTES : SPX_N + SPX_PK_BYTES + mlen] = m
-        sha256_inc_finalize(seed, state, inbuf, SPX_N + SPX_PK_BYTES + mlen)
-    # Otherwise first fill a block, so that finalize only uses the message
+
+def hash_message(digest, tree, leaf_idx, R, pk, m, mlen, params=SPX_DEFAULT_PARAMS):
+    # seed = SHA256(R || PK || M), or SHA512 for "sha512" sets; SHAKE256 sets
+    # hash straight to the digest. "sha512" sets follow round 3.1 and expand
+    # R || PK.seed || seed with MGF1-SHA512, the others expand seed alone.
+    hash_fn = {"shake256": hashlib.shake_256, "sha512": hashlib.sha512}.get(
+        params.hash_name, hashlib.sha256
+    )
+    state = hash_fn()
+    state.update(bytes(R[: params.n]))
+    state.update(bytes(pk[: params.pk_bytes]))
+    for chunk in message_chunks(m, mlen):
+        state.update(chunk)
+
+    # The digest layout (and its 64 bit tree check) comes from params.
+    if params.hash_name == "shake256":
+        buf = state.digest(params.dgst_bytes)
     else:
-        inbuf[
-            SPX_N
-            + SPX_PK_BYTES : SPX_N
-            + SPX_PK_BYTES
-            + SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES
-            - SPX_N
-            - SPX_PK_BYTES
-        ] = m[: SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES - SPX_N - SPX_PK_BYTES]
-        sha256_inc_blocks(state, inbuf, SPX_INBLOCKS)
-
-        m = m[SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES - SPX_N - SPX_PK_BYTES :]
-        mlen -= SPX_INBLOCKS * SPX_SHA256_BLOCK_BYTES - SPX_N - SPX_PK_BYTES
-        sha256_inc_finalize(seed, state, m, mlen)
-
-    # By doing this in two steps, we prevent hashing the message twice;
-    # otherwise each iteration in MGF1 would hash the message again.
-    mgf1(bufp, SPX_DGST_BYTES, seed, SPX_SHA256_OUTPUT_BYTES)
-
-    digest[:] = bufp[:SPX_FORS_MSG_BYTES]
-    bufp = bufp[SPX_FORS_MSG_BYTES:]
-
-    if SPX_TREE_BITS > 64:
-        raise ValueError(
-            "For given height and depth, 64 bits cannot represent all subtrees"
-        )
+        # By doing this in two steps, we prevent hashing the message twice;
+        # otherwise each iteration in MGF1 would hash the message again.
+        buf = bytearray(params.dgst_bytes)
+        seed = state.digest()
+        if params.hash_name == "sha512":
+            seed = bytes(R[: params.n]) + bytes(pk[: params.n]) + seed
+        mgf1(buf, params.dgst_bytes, seed, len(seed), hash_fn)
+
+    digest[: params.fors_msg_bytes] = buf[: params.fors_msg_bytes]
+    offset = params.fors_msg_bytes
 
-    # Replace bytes_to_ull with int.from_bytes
-    tree[0] = int.from_bytes(bufp[:SPX_TREE_BYTES], byteorder="little", signed=False)
-    tree[0] &= (~(0)) >> (64 - SPX_TREE_BITS)
-    bufp = bufp[SPX_TREE_BYTES:]
+    tree[0] = int.from_bytes(buf[offset : offset + params.tree_bytes], byteorder="big")
+    tree[0] &= (1 << params.tree_bits) - 1
+    offset += params.tree_bytes
 
     leaf_idx[0] = int.from_bytes(
-        bufp[:SPX_LEAF_BYTES], byteorder="little", signed=False
+        buf[offset : offset + params.leaf_bytes], byteorder="big"
     )
-    leaf_idx[0] &= (~(0)) >> (32 - SPX_LEAF_BITS)
+    leaf_idx[0] &= (1 << params.leaf_bits) - 1
+
+
+def initialize_hash_function(pub_seed, sk, params=SPX_DEFAULT_PARAMS):
+    seed_state(pub_seed, params)
+
+
+def hypertree_layers(tree, idx_leaf, params=SPX_DEFAULT_PARAMS):
+    """The (layer, tree, idx_leaf) of every hypertree layer, bottom layer first."""
+    layers = []
+    for i in range(params.d):
+        layers.append((i, tree, idx_leaf))
+        idx_leaf = tree & ((1 << params.tree_height) - 1)
+        tree >>= params.tree_height
+    return layers
+
 
+def hypertree_layer_levels(
+    sk_seed, pub_seed, layer, tree, backend, params=SPX_DEFAULT_PARAMS
+):
+    """All nodes of one hypertree subtree, by treehash_levels; runs in pool workers.
 
-def initialize_hash_function(pub_seed, sk):
-    seed_state(pub_seed)
+    Only depends on (layer, tree), so all layers can run at once and the
+    result can be kept in a SubtreeCache.
+    """
+    with use_hash_backend(backend):
+        initialize_hash_function(pub_seed, sk_seed, params)
 
+        tree_addr = Address()
+        tree_addr.set_type(AddrType.TREE)
+        tree_addr.set_layer_addr(layer)
+        tree_addr.set_tree_addr(tree)
+
+        return treehash_levels(
+            bytearray(params.n),
+            bytearray(params.tree_height * params.n),
+            sk_seed,
+            pub_seed,
+            0,
+            0,
+            params.tree_height,
+            partial(wots_gen_leaves, params=params),
+            tree_addr,
+            params,
+        )
 
-def crypto_sign_signature(sig, siglen, m, mlen, sk):
-    sk_seed = sk
-    sk_prf = sk[SPX_N : SPX_N + SPX_N]
-    pk = sk[2 * SPX_N : 2 * SPX_N + SPX_N]
-    pub_seed = pk
 
-    optrand = bytearray(SPX_N)
-    mhash = bytearray(SPX_FORS_MSG_BYTES)
-    root = bytearray(SPX_N)
+def crypto_sign_signature(
+    sig,
+    siglen,
+    m,
+    mlen,
+    sk,
+    workers=None,
+    executor=None,
+    subtree_cache=None,
+    top_tree=None,
+    chain_cache=None,
+    deterministic=False,
+    signature_cache=None,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """Sign m, writing params.bytes into sig.
+
+    m may also be a spx.stream.MessageSource, which is read twice (for R and
+    for the digest) and never held in memory; mlen is then ignored.
+
+    With workers > 1, or an executor given, the FORS trees and the treehash
+    of every hypertree layer run on a process pool and the WOTS signatures
+    are chained after; the signature is byte-identical to the sequential one.
+    workers > 1 without an executor uses the warm spx.pool.shared_pool; for
+    the calibrated count pass executor=spx.tuning.tuned_pool("sign", params).
+
+    Hypertree subtrees are looked up in, and added to, subtree_cache; by
+    default the key's cache from spx.cache.subtree_cache_for. A TopTree from
+    keygen serves the top layer without any hashing. A ChainCache makes the
+    hypertree WOTS signatures resume from stored chain checkpoints.
+
+    With deterministic, optrand is pub_seed instead of random, as the spec
+    allows, so signing the same message again gives the same signature. A
+    SignatureCache returns the signature stored for the key and message
+    digest, and stores new ones.
+
+    params is the parameter set of sk; the signature components are placed
+    at the offsets precomputed in it.
+    """
+    if signature_cache is not None:
+        n = params.n
+        pk = sk[2 * n : 2 * n + params.pk_bytes]
+        digest = message_digest(m, mlen)
+        cached = signature_cache.get(pk, digest, params)
+        if cached is None:
+            crypto_sign_signature(
+                sig,
+                siglen,
+                m,
+                mlen,
+                sk,
+                workers=workers,
+                executor=executor,
+                subtree_cache=subtree_cache,
+                top_tree=top_tree,
+                chain_cache=chain_cache,
+                deterministic=deterministic,
+                params=params,
+            )
+            signature_cache.put(pk, digest, sig[: params.bytes], params)
+            return 0
+        sig[: params.bytes] = cached
+        siglen[0] = params.bytes
+        return 0
+
+    if executor is None and workers is not None and workers > 1:
+        executor = shared_pool(workers)
+
+    n = params.n
+    sk_seed = sk[:n]
+    sk_prf = sk[n : n + n]
+    pk = sk[2 * n : 2 * n + params.pk_bytes]
+    pub_seed = pk[:n]
+
+    # Every part of the signature is written in place through sig_view.
+    sig_view = memoryview(sig)
+    optrand = bytearray(n)
+    mhash = bytearray(params.fors_msg_bytes)
+    root = bytearray(n)
+    R = sig_view[:n]
     wots_addr = Address()
     tree_addr = Address()
 
-    initialize_hash_function(pub_seed, sk_seed)
+    initialize_hash_function(pub_seed, sk_seed, params)
 
     wots_addr.set_type(AddrType.WOTS_HASH)
     tree_addr.set_type(AddrType.TREE)
 
-    optrand[:] = os.urandom(SPX_N)
-    gen_message_random(sig, sk_prf, optrand, m, mlen)
+    optrand[:] = pub_seed if deterministic else os.urandom(n)
+    with phase("PRF_msg"):
+        gen_message_random(R, sk_prf, optrand, m, mlen, params)
 
     tree = [0]
     idx_leaf = [0]
-    hash_message(mhash, tree, idx_leaf, sig, pk, m, mlen)
-    sig = sig[SPX_N:]
+    with phase("H_msg"):
+        hash_message(mhash, tree, idx_leaf, R, pk, m, mlen, params)
 
     wots_addr.set_tree_addr(tree[0])
     wots_addr.set_keypair_addr(idx_leaf[0])
 
-    # fors_sign(sig, root, mhash, sk_seed, pub_seed, wots_addr)
-    sig = sig[SPX_FORS_BYTES:]
+    offset = params.fors_offset
+    with phase("FORS"):
+        fors_sign(
+            sig_view[offset : offset + params.fors_bytes],
+            root,
+            mhash,
+            sk_seed,
+            pub_seed,
+            wots_addr,
+            workers=workers,
+            executor=executor,
+            params=params,
+        )
+
+    if subtree_cache is None:
+        subtree_cache = subtree_cache_for(pk, params)
+    if top_tree is not None and top_tree.pk != bytes(pk):
+        raise ValueError("top tree does not belong to this key")
+
+    layers = hypertree_layers(tree[0], idx_leaf[0], params)
+    subtrees = [None] * params.d
+    if top_tree is not None:
+        subtrees[params.d - 1] = top_tree.levels()
+    if subtree_cache is not None:
+        for i, layer_tree, _ in layers:
+            if subtrees[i] is None:
+                subtrees[i] = subtree_cache.get(i, layer_tree)
+
+    backend = get_hash_backend().name
+    missing = [i for i in range(params.d) if subtrees[i] is None]
+    if profiling.active_profile is not None:
+        profiling.active_profile.count("subtree_hits", params.d - len(missing))
+        profiling.active_profile.count("subtree_misses", len(missing))
+    args = [(sk_seed, pub_seed, i, layers[i][1], backend, params) for i in missing]
+    if executor is not None and missing:
+        computed = executor.map(hypertree_layer_levels, *zip(*args))
+    else:
+        computed = (hypertree_layer_levels(*arg) for arg in args)
+    computed = iter(computed)
+    for i in missing:
+        # With an executor this is the wait for the layer's pool result.
+        with phase(f"layer{i}-treehash"):
+            levels = next(computed)
+        subtrees[i] = levels
+        if subtree_cache is not None:
+            subtree_cache.put(i, layers[i][1], levels)
+
+    auth_bytes = params.tree_height * n
+    for i, layer_tree, layer_idx_leaf in layers:
+        tree_addr.set_layer_addr(i)
+        tree_addr.set_tree_addr(layer_tree)
+        wots_addr.copy_subtree_addr(tree_addr)
+        wots_addr.set_keypair_addr(layer_idx_leaf)
+
+        # Sign the root of the layer below (the FORS public key on layer 0).
+        offset = params.wots_offsets[i]
+        with phase(f"layer{i}-wots"):
+            wots_sign(
+                sig_view[offset : offset + params.wots_bytes],
+                root,
+                sk_seed,
+                pub_seed,
+                wots_addr,
+                chain_cache,
+                params,
+            )
+
+        offset = params.auth_offsets[i]
+        auth_path_from_levels(
+            sig_view[offset : offset + auth_bytes],
+            subtrees[i],
+            layer_idx_leaf,
+            params,
+        )
+        root[:] = subtrees[i][-1]
+
+    siglen[0] = params.bytes
+
+    return 0
+
+
+def crypto_sign_verify(sig, siglen, m, mlen, pk, params=SPX_DEFAULT_PARAMS):
+    """Verify sig over m with pk; returns 0 on success and -1 otherwise."""
+    n = params.n
+    pub_seed = pk[:n]
+    pub_root = pk[n : n + n]
+    mhash = bytearray(params.fors_msg_bytes)
+    wots_pk = bytearray(params.wots_bytes)
+    root = bytearray(n)
+    leaf = bytearray(n)
+    wots_addr = Address()
+    tree_addr = Address()
+    wots_pk_addr = Address()
+
+    if siglen != params.bytes or len(sig) < params.bytes:
+        return -1
+
+    initialize_hash_function(pub_seed, None, params)
+
+    wots_addr.set_type(AddrType.WOTS_HASH)
+    tree_addr.set_type(AddrType.TREE)
+    wots_pk_addr.set_type(AddrType.WOTS_PK)
 
-    for i in range(SPX_D):
+    # Derive the message digest and leaf index from R || PK || M.
+    tree = [0]
+    idx_leaf = [0]
+    hash_message(mhash, tree, idx_leaf, sig[:n], pk, m, mlen, params)
+
+    # Layer correctly defaults to 0, so no need to set_layer_addr
+    wots_addr.set_tree_addr(tree[0])
+    wots_addr.set_keypair_addr(idx_leaf[0])
+
+    offset = params.fors_offset
+    fors_pk_from_sig(
+        root,
+        sig[offset : offset + params.fors_bytes],
+        mhash,
+        pub_seed,
+        wots_addr,
+        params=params,
+    )
+
+    # For each subtree..
+    layers = hypertree_layers(tree[0], idx_leaf[0], params)
+    for i, layer_tree, layer_idx_leaf in layers:
         tree_addr.set_layer_addr(i)
-        tree_addr.set_tree_addr(tree[0])
+        tree_addr.set_tree_addr(layer_tree)
+
         wots_addr.copy_subtree_addr(tree_addr)
-        wots_addr.set_keypair_addr(idx_leaf[0])
+        wots_addr.set_keypair_addr(layer_idx_leaf)
 
-        wots_sign(sig, root, sk_seed, pub_seed, wots_addr)
-        sig = sig[SPX_WOTS_BYTES:]
+        wots_pk_addr.copy_keypair_addr(wots_addr)
 
-        treehash(
+        # The WOTS public key is only correct if the signature was correct.
+        # Initially, root is the FORS pk, but on subsequent iterations it is
+        # the root of the subtree below the currently processed subtree.
+        offset = params.wots_offsets[i]
+        wots_pk_from_sig(
+            wots_pk,
+            sig[offset : offset + params.wots_bytes],
             root,
-            sig,
-            sk_seed,
             pub_seed,
-            idx_leaf[0],
+            wots_addr,
+            params,
+        )
+
+        # Compute the leaf node using the WOTS public key.
+        thash(leaf, wots_pk, params.wots_len, pub_seed, wots_pk_addr)
+
+        # Compute the root node of this subtree.
+        offset = params.auth_offsets[i]
+        compute_root(
+            root,
+            leaf,
+            layer_idx_leaf,
             0,
-            SPX_TREE_HEIGHT,
-            wots_gen_leaf,
+            sig[offset : offset + params.tree_height * n],
+            params.tree_height,
+            pub_seed,
             tree_addr,
+            params,
         )
-        sig = sig[SPX_TREE_HEIGHT * SPX_N :]
 
-        idx_leaf[0] = tree[0] & ((1 << SPX_TREE_HEIGHT) - 1)
-        tree[0] >>= SPX_TREE_HEIGHT
+    # Check if the root node equals the root node in the public key.
+    if bytes(root) != bytes(pub_root):
+        return -1
+
+    return 0
+
+
+def crypto_sign(sm, smlen, m, mlen, sk, **sign_kwargs):
+    """Write the signed message sig || m into sm and its length into smlen[0]."""
+    sig = bytearray(sign_kwargs.get("params", SPX_DEFAULT_PARAMS).bytes)
+    siglen = [0]
+    crypto_sign_signature(sig, siglen, m, mlen, sk, **sign_kwargs)
+    sm[:] = sig + bytes(m[:mlen])
+    smlen[0] = siglen[0] + mlen
+    return 0
 
-    siglen[0] = SPX_BYTES
 
+def crypto_sign_open(m, mlen, sm, smlen, pk, params=SPX_DEFAULT_PARAMS):
+    """Verify the signed message sm and write its message into m.
+
+    Returns 0 on success; on failure m is emptied, mlen[0] is 0 and -1 is
+    returned.
+    """
+    sig_bytes = params.bytes
+    # The API caller does not necessarily know what size a signature should be
+    # but SPHINCS+ signatures are always exactly params.bytes.
+    if smlen < sig_bytes:
+        m[:] = b""
+        mlen[0] = 0
+        return -1
+
+    mlen[0] = smlen - sig_bytes
+
+    sm_view = memoryview(sm)
+    if crypto_sign_verify(
+        sm_view[:sig_bytes], sig_bytes, sm_view[sig_bytes:smlen], mlen[0], pk, params
+    ):
+        m[:] = b""
+        mlen[0] = 0
+        return -1
+
+    # If verification was successful, move the message to the right place.
+    m[:] = sm[sig_bytes:smlen]
     return 0
@@ -0,0 +1,114 @@
+"""Sign and verify messages that are streamed instead of held in memory.
+
+PRF_msg (the HMAC giving R) and H_msg (SHA256(R || PK || M)) both read the
+whole message, and H_msg needs R, so signing reads the message twice.
+MessageSource gives those passes over bytes-like objects and mmaps (as
+memoryview slices, no copies), seekable files (read again from the start
+position) and one-shot iterators or pipes (spooled to a temporary file on
+the first pass). Only one chunk is held in memory at a time.
+"""
+
+import tempfile
+
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.sign import crypto_sign_signature, crypto_sign_verify
+
+SPX_STREAM_CHUNK_BYTES = 1 << 20
+# Spooled one-shot streams stay in memory up to this size, then go to disk.
+SPX_STREAM_SPOOL_BYTES = 1 << 20
+
+
+class MessageSource:
+    """A message that can be read chunk by chunk, any number of times.
+
+    Args:
+        source: bytes-like object or mmap, binary file object, or an
+            iterable of bytes-like chunks
+        chunk_size (int): bytes per chunk read from files and buffers
+        spool_bytes (int): in-memory limit of the spool for one-shot sources
+    """
+
+    def __init__(
+        self,
+        source,
+        chunk_size=SPX_STREAM_CHUNK_BYTES,
+        spool_bytes=SPX_STREAM_SPOOL_BYTES,
+    ):
+        self.chunk_size = chunk_size
+        self.spool_bytes = spool_bytes
+        self.buffer = None
+        self.file = None
+        self.start = 0
+        self.iterator = None
+        self.spool = None
+
+        try:
+            self.buffer = memoryview(source).cast("B")
+        except TypeError:
+            if hasattr(source, "read"):
+                if source.seekable():
+                    self.file = source
+                    self.start = source.tell()
+                else:
+                    self.iterator = iter(lambda: source.read(chunk_size), b"")
+            else:
+                self.iterator = iter(source)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+    def chunks(self):
+        """A new pass over the message, as bytes-like chunks."""
+        if self.buffer is not None:
+            return self.buffer_chunks()
+        if self.file is not None:
+            return self.file_chunks(self.file, self.start)
+        if self.spool is None:
+            return self.spooling_chunks()
+        return self.file_chunks(self.spool, 0)
+
+    def buffer_chunks(self):
+        for offset in range(0, len(self.buffer), self.chunk_size):
+            yield self.buffer[offset : offset + self.chunk_size]
+
+    def file_chunks(self, file, start):
+        # One buffer for the whole pass; each chunk is consumed before the next.
+        buf = bytearray(self.chunk_size)
+        view = memoryview(buf)
+        file.seek(start)
+        while True:
+            n = file.readinto(buf)
+            if not n:
+                return
+            yield view[:n]
+
+    def spooling_chunks(self):
+        self.spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        for chunk in self.iterator:
+            self.spool.write(chunk)
+            yield chunk
+        self.iterator = None
+
+
+def crypto_sign_signature_stream(sig, siglen, source, sk, chunk_size=None, **kwargs):
+    """crypto_sign_signature over a streamed message; see MessageSource."""
+    message = MessageSource(source, chunk_size or SPX_STREAM_CHUNK_BYTES)
+    with message:
+        return crypto_sign_signature(sig, siglen, message, None, sk, **kwargs)
+
+
+def crypto_sign_verify_stream(
+    sig, siglen, source, pk, chunk_size=None, params=SPX_DEFAULT_PARAMS
+):
+    """crypto_sign_verify over a streamed message, read in a single pass."""
+    message = MessageSource(source, chunk_size or SPX_STREAM_CHUNK_BYTES)
+    with message:
+        return crypto_sign_verify(sig, siglen, message, None, pk, params)
@@ -0,0 +1,96 @@
+"""The full top-layer XMSS tree of a key, kept from keygen.
+
+Nodes are stored in one flat heap: the root at index 1 and the children of
+node i at 2i and 2i + 1, so leaf j sits at 2^h + j. Every level is then a
+contiguous slice and an auth path is h lookups of the path's siblings.
+
+Serialized form: SPX_TOP_TREE_MAGIC || version (1 byte) || n (1 byte) ||
+height (1 byte) || pk (2 * n bytes) || heap (2^(h + 1) * n bytes, index 0
+unused).
+"""
+
+from spx.constant import SPX_TREE_HEIGHT
+
+SPX_TOP_TREE_MAGIC = b"SPXT"
+SPX_TOP_TREE_VERSION = 1
+
+
+class TopTree:
+    """Heap-ordered nodes of the layer d - 1 tree of the key pk.
+
+    The node size n follows from the heap size, so any parameter set works.
+
+    Args:
+        pk (bytes): public key the tree belongs to
+        heap (bytes): 2^(tree_height + 1) * n bytes of heap-ordered nodes
+        tree_height (int): tree height
+    """
+
+    def __init__(self, pk: bytes, heap: bytes, tree_height: int = SPX_TREE_HEIGHT):
+        n, rest = divmod(len(heap), 2 << tree_height)
+        if rest or not n:
+            raise ValueError("heap size does not match tree height")
+        self.n = n
+        self.pk = bytes(pk[: 2 * n])
+        self.heap = memoryview(heap).toreadonly()
+        self.tree_height = tree_height
+
+    @classmethod
+    def from_levels(cls, pk: bytes, levels: list) -> "TopTree":
+        """Build the heap from treehash_levels output, leaves first."""
+        tree_height = len(levels) - 1
+        heap = bytearray(len(levels[-1]))
+        # Level k holds heap indices 2^(h - k) .. 2^(h - k + 1) - 1.
+        for level in reversed(levels):
+            heap += level
+        return cls(pk, bytes(heap), tree_height)
+
+    def node(self, height: int, index: int) -> bytes:
+        i = (1 << (self.tree_height - height)) + index
+        return bytes(self.heap[i * self.n : (i + 1) * self.n])
+
+    @property
+    def root(self) -> bytes:
+        return self.node(self.tree_height, 0)
+
+    def levels(self) -> list:
+        """The nodes of every level as memoryviews, leaves first and root last."""
+        h, n = self.tree_height, self.n
+        return [
+            self.heap[(1 << (h - k)) * n : (2 << (h - k)) * n] for k in range(h + 1)
+        ]
+
+    def auth_path(self, auth_path: bytearray, leaf_idx: int) -> None:
+        """Write the auth path of leaf_idx, one sibling lookup per height."""
+        n = self.n
+        i = (1 << self.tree_height) + leaf_idx
+        for height in range(self.tree_height):
+            sibling = i ^ 0x1
+            auth_path[height * n : (height + 1) * n] = self.heap[
+                sibling * n : (sibling + 1) * n
+            ]
+            i >>= 1
+
+    def to_bytes(self) -> bytes:
+        return (
+            SPX_TOP_TREE_MAGIC
+            + bytes([SPX_TOP_TREE_VERSION, self.n, self.tree_height])
+            + self.pk
+            + bytes(self.heap)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes, expected_n: int = None) -> "TopTree":
+        """Parse to_bytes output; expected_n, if given, is checked against n."""
+        data = memoryview(data)
+        magic_len = len(SPX_TOP_TREE_MAGIC)
+        if bytes(data[:magic_len]) != SPX_TOP_TREE_MAGIC:
+            raise ValueError("not a serialized top tree")
+        version, n, tree_height = data[magic_len : magic_len + 3]
+        if version != SPX_TOP_TREE_VERSION:
+            raise ValueError(f"unsupported top tree version {version}")
+        if expected_n is not None and n != expected_n:
+            raise ValueError(f"top tree for n={n}, expected n={expected_n}")
+        header_bytes = magic_len + 3 + 2 * n
+        pk = bytes(data[magic_len + 3 : header_bytes])
+        return cls(pk, bytes(data[header_bytes:]), tree_height)
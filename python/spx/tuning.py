@@ -0,0 +1,146 @@
+"""Worker counts tuned to this host.
+
+The signer's worker count is fitted, as utils/adaptive_thread_calculator.py
+does for CUDA launches, to the model T(t) = alpha + beta/t + gamma*t: fixed
+cost, work split over t workers and per-worker overhead. Its minimum is at
+t = sqrt(beta / gamma). The model is linear in (alpha, beta, gamma), so it
+is fitted by least squares with NumPy.
+
+Calibration (python -m spx.bench --calibrate) sweeps the pool size of
+keypair, sign and verify and writes one row per operation, e.g. "128F-sign",
+in the schema of data/parameter.csv. A worker process counts as one block of
+one thread. The file, $SPX_TUNING_FILE or data/python-parameter.csv, is read
+on the first tuned_workers call. crypto_sign_signature and verify_many still
+default to one worker; tuned_pool is the warm shared pool of the tuned size,
+to pass as their executor.
+"""
+
+import csv
+import functools
+import math
+import os
+
+import numpy as np
+
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.pool import shared_pool
+
+SPX_TUNING_FIELDS = (
+    "operation",
+    "alpha",
+    "beta",
+    "gamma",
+    "t_optimal",
+    "optimal_time",
+    "best_measured_threads",
+    "best_measured_time",
+    "best_blocks",
+    "best_threads",
+)
+# Default tuning file; the SPX_TUNING_FILE environment variable overrides it.
+SPX_TUNING_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "python-parameter.csv"
+)
+
+
+def tuning_file() -> str:
+    return os.environ.get("SPX_TUNING_FILE", SPX_TUNING_FILE)
+
+
+def model_time(t, alpha: float, beta: float, gamma: float):
+    return alpha + beta / t + gamma * t
+
+
+def fit_model(workers, times) -> tuple:
+    """Least-squares (alpha, beta, gamma) of times measured at workers."""
+    t = np.asarray(workers, dtype=np.float64)
+    design = np.stack([np.ones_like(t), 1 / t, t], axis=1)
+    coefficients, *_ = np.linalg.lstsq(
+        design, np.asarray(times, dtype=np.float64), rcond=None
+    )
+    return tuple(float(c) for c in coefficients)
+
+
+def optimal_workers(alpha: float, beta: float, gamma: float, lo: int, hi: int):
+    """The t in [lo, hi] minimising the model.
+
+    That is sqrt(beta / gamma) when both are positive and it lies in range,
+    otherwise the better end of the range.
+    """
+    candidates = [float(lo), float(hi)]
+    if beta > 0 and gamma > 0:
+        candidates.append(min(max(math.sqrt(beta / gamma), lo), hi))
+    return min(candidates, key=lambda t: model_time(t, alpha, beta, gamma))
+
+
+def tuning_row(operation: str, workers, times) -> dict:
+    """The parameter.csv row of times (ms) measured at each worker count."""
+    alpha, beta, gamma = fit_model(workers, times)
+    t_optimal = optimal_workers(alpha, beta, gamma, min(workers), max(workers))
+    best = int(np.argmin(times))
+    return {
+        "operation": operation,
+        "alpha": alpha,
+        "beta": beta,
+        "gamma": gamma,
+        "t_optimal": t_optimal,
+        "optimal_time": model_time(t_optimal, alpha, beta, gamma),
+        "best_measured_threads": workers[best],
+        "best_measured_time": times[best],
+        "best_blocks": workers[best],
+        "best_threads": 1,
+    }
+
+
+def read_tuning(path=None) -> dict:
+    """operation -> row of a parameter.csv-style file; empty if it is missing."""
+    path = path or tuning_file()
+    try:
+        with open(path, newline="") as f:
+            return {row["operation"]: row for row in csv.DictReader(f)}
+    except FileNotFoundError:
+        return {}
+
+
+def write_tuning(rows, path=None) -> None:
+    """Write rows to path, replacing the rows of the same operations."""
+    path = path or tuning_file()
+    merged = read_tuning(path)
+    for row in rows:
+        merged[row["operation"]] = row
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, SPX_TUNING_FIELDS)
+        writer.writeheader()
+        writer.writerows(merged.values())
+
+
+def load_tuned_workers(path=None) -> dict:
+    """operation -> worker count, t_optimal rounded to a whole worker."""
+    tuned = {}
+    for operation, row in read_tuning(path).items():
+        t_optimal = float(row["t_optimal"])
+        if math.isfinite(t_optimal):
+            tuned[operation] = max(1, round(t_optimal))
+    return tuned
+
+
+@functools.lru_cache(maxsize=None)
+def tuned_worker_counts() -> dict:
+    """load_tuned_workers of the tuning file, read once on first use."""
+    return load_tuned_workers()
+
+
+def tuned_workers(operation: str, params=SPX_DEFAULT_PARAMS) -> int:
+    """Worker count for operation ("keypair", "sign" or "verify") on params."""
+    return tuned_worker_counts().get(f"{params.name.upper()}-{operation}", 1)
+
+
+def tuned_pool(operation: str, params=SPX_DEFAULT_PARAMS):
+    """The shared pool of tuned_workers processes, None when that is one.
+
+    crypto_sign_signature(..., executor=tuned_pool("sign", params)) signs
+    with the calibrated worker count on a pool that stays warm.
+    """
+    workers = tuned_workers(operation, params)
+    return shared_pool(workers) if workers > 1 else None
@@ -1,8 +1,18 @@
 # from spx.wots import SPX_N
 # from Crypto.Hash import SHA256
-from spx.address import Address
-from spx.constant import *  # Import all constants from spx.constant
+import hashlib
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
 
+from spx import profiling
+from spx.address import Address, address_batch
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.sha256x import crypto_hashblocks_sha256x, sha256x_inc_finalize
+from spx.sha512x import sha512x_inc_finalize, sha512x_seeded_states
 
 state_seeded = bytearray(40)  # 32 bytes hash state + 8 bytes counter
 
@@ -194,22 +204,6 @@ def crypto_hashblocks_sha256(
     return inlen
 
 
-def seed_state(pub_seed: bytes) -> None:
-    # Initialize state with IV
-    state_seeded[0:32] = IV_256
-    # the seed_state counter is stored in the last 8 bytes of the state, now always 64
-    count = bytes([0, 0, 0, 0, 0, 0, 0, 64])
-    state_seeded[32:40] = count
-
-    # Prepare input block
-    block = bytearray(64)  # SPX_SHA256_BLOCK_BYTES
-    block[0:SPX_N] = pub_seed[0:SPX_N]
-    # Rest of block remains zero
-
-    # Update state with block
-    crypto_hashblocks_sha256(state_seeded, block, 64)
-
-
 def sha256_inc_finalize(
     out: bytearray, state: bytearray, in_data: bytes, inlen: int
 ) -> None:
@@ -254,6 +248,623 @@ def sha256_inc_finalize(
         out[i] = state[i]
 
 
+def midstate_512_from_bytes(midstates: bytes) -> np.ndarray:
+    """The SHA-512 midstate stored after the SHA-256 one by seeded_midstates."""
+    return np.frombuffer(midstates, dtype=">u8", count=8, offset=32).astype(np.uint64)
+
+
+class HashBackend:
+    """A seeded thash instantiation.
+
+    Each backend keeps its own copy of the pub_seed midstate, filled in by
+    seed_state(), so the active backend can be switched between calls. The
+    ParamSet given to seed_state() sets the output length n of later calls,
+    and for "sha512" sets also seeds a SHA-512 midstate over a 128-byte
+    block, used by the thash calls ParamSet.thash_sha512 names.
+
+    Outputs may be memoryview slices of larger buffers, and may overlap the
+    inputs: a lane's input is read before its output is written, so nodes
+    and chain values can be hashed in place.
+    """
+
+    name = ""
+    params = SPX_DEFAULT_PARAMS
+
+    def seed_state(self, pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> None:
+        raise NotImplementedError
+
+    def load_state(
+        self, pub_seed: bytes, midstates: bytes, params=SPX_DEFAULT_PARAMS
+    ) -> None:
+        """Seed from stored seeded_midstates output instead of compressing.
+
+        Backends that cannot import a midstate seed as usual.
+        """
+        self.seed_state(pub_seed, params)
+
+    def thash(
+        self, out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr
+    ) -> None:
+        raise NotImplementedError
+
+    def thash_many(
+        self, outs: bytearray, inputs: bytes, inblocks: int, pub_seed: bytes, addrs
+    ) -> None:
+        n = self.params.n
+        step = inblocks * n
+        out = bytearray(n)
+        if isinstance(addrs, np.ndarray):
+            addrs = [Address.from_bytes(row.tobytes()) for row in addrs]
+        for i, addr in enumerate(addrs):
+            self.thash(out, inputs[i * step : (i + 1) * step], inblocks, pub_seed, addr)
+            outs[i * n : (i + 1) * n] = out
+
+    def unseeded(self) -> "HashBackend":
+        """A new backend of this kind sharing no seeded state with this one."""
+        return type(self)()
+
+    def thash_lanes(
+        self,
+        outs: bytearray,
+        inputs: bytes,
+        inblocks: int,
+        pub_seeds,
+        addrs,
+        params=SPX_DEFAULT_PARAMS,
+    ) -> None:
+        # Seed a separate backend once per distinct pub_seed, so the seeded
+        # state of this one is left alone.
+        n = params.n
+        step = inblocks * n
+        rows = addr_rows(addrs)
+        lanes_by_seed = {}
+        for i, seed in enumerate(seed_rows(pub_seeds, n)):
+            lanes_by_seed.setdefault(seed, []).append(i)
+        for seed, lanes in lanes_by_seed.items():
+            backend = self.unseeded()
+            backend.seed_state(seed, params)
+            group_outs = bytearray(len(lanes) * n)
+            group_inputs = b"".join(inputs[i * step : (i + 1) * step] for i in lanes)
+            group_addrs = [Address.from_bytes(rows[i]) for i in lanes]
+            backend.thash_many(group_outs, group_inputs, inblocks, seed, group_addrs)
+            for j, i in enumerate(lanes):
+                outs[i * n : (i + 1) * n] = group_outs[j * n : (j + 1) * n]
+
+
+class ReferenceBackend(HashBackend):
+    """Pure-Python SHA256 compression on the module level state_seeded.
+
+    SHA-512 thash runs on a single lane of spx.sha512x. Backends made by
+    unseeded() keep their own state instead of state_seeded.
+    """
+
+    name = "reference"
+
+    def __init__(self, state=None):
+        self.state = state_seeded if state is None else state
+
+    def unseeded(self) -> "HashBackend":
+        return ReferenceBackend(bytearray(40))
+
+    def seed_state(self, pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> None:
+        self.params = params
+        if params.hash_name == "sha512":
+            seed = np.frombuffer(bytes(pub_seed[: params.n]), dtype=np.uint8)
+            self.midstate_512 = sha512x_seeded_states(seed[None])[0]
+        # Initialize state with IV
+        self.state[0:32] = IV_256
+        # the seed_state counter is stored in the last 8 bytes of the state, now always 64
+        count = bytes([0, 0, 0, 0, 0, 0, 0, 64])
+        self.state[32:40] = count
+
+        # Prepare input block
+        block = bytearray(64)  # SPX_SHA256_BLOCK_BYTES
+        block[0 : params.n] = pub_seed[0 : params.n]
+        # Rest of block remains zero
+
+        # Update state with block
+        crypto_hashblocks_sha256(self.state, block, 64)
+
+    def load_state(
+        self, pub_seed: bytes, midstates: bytes, params=SPX_DEFAULT_PARAMS
+    ) -> None:
+        self.params = params
+        self.state[0:32] = midstates[:32]
+        self.state[32:40] = bytes([0, 0, 0, 0, 0, 0, 0, 64])
+        if params.hash_name == "sha512":
+            self.midstate_512 = midstate_512_from_bytes(midstates)
+
+    def thash(
+        self, out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr
+    ) -> None:
+        n = self.params.n
+        buf = bytearray(SPX_SHA256_ADDR_BYTES + inblocks * n)
+        outbuf = bytearray(SPX_SHA256_OUTPUT_BYTES)
+
+        # Copy address and input to buffer
+        buf[:SPX_SHA256_ADDR_BYTES] = addr.view()
+        buf[SPX_SHA256_ADDR_BYTES : SPX_SHA256_ADDR_BYTES + inblocks * n] = input[
+            : inblocks * n
+        ]
+
+        if self.params.thash_sha512(inblocks):
+            digest = sha512x_inc_finalize(
+                self.midstate_512,
+                SPX_SHA512_BLOCK_BYTES,
+                np.frombuffer(bytes(buf), dtype=np.uint8)[None],
+            )
+            out[:] = digest[0, :n].tobytes()
+            return
+
+        # Retrieve precomputed state containing pub_seed
+        sha2_state = bytearray(40)
+        sha2_state[:] = self.state
+
+        # Incremental finalize SHA256
+        sha256_inc_finalize(
+            outbuf, sha2_state, buf, SPX_SHA256_ADDR_BYTES + inblocks * n
+        )
+        out[:] = outbuf[:n]
+
+
+def hashlib_seeded_state(pub_seed: bytes, sha512: bool = False):
+    """hashlib SHA256 (or SHA512) object that absorbed the pub_seed block."""
+    if sha512:
+        state = hashlib.sha512(pub_seed)
+        state.update(bytes(SPX_SHA512_BLOCK_BYTES - len(pub_seed)))
+    else:
+        state = hashlib.sha256(pub_seed)
+        state.update(bytes(SPX_SHA256_BLOCK_BYTES - len(pub_seed)))
+    return state
+
+
+class HashlibBackend(HashBackend):
+    """hashlib SHA256 object absorbing the pub_seed block, copied per thash."""
+
+    name = "hashlib"
+
+    def __init__(self):
+        self.state = hashlib.sha256()
+        self.state_512 = None
+
+    def seed_state(self, pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> None:
+        self.params = params
+        pub_seed = bytes(pub_seed[: params.n])
+        self.state = hashlib_seeded_state(pub_seed)
+        if params.hash_name == "sha512":
+            self.state_512 = hashlib_seeded_state(pub_seed, sha512=True)
+
+    def seeded(self, inblocks: int):
+        if self.params.thash_sha512(inblocks):
+            return self.state_512
+        return self.state
+
+    def thash(
+        self, out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr
+    ) -> None:
+        n = self.params.n
+        sha2_state = self.seeded(inblocks).copy()
+        sha2_state.update(addr.view())
+        sha2_state.update(input[: inblocks * n])
+        out[:] = sha2_state.digest()[:n]
+
+    def thash_many(
+        self, outs: bytearray, inputs: bytes, inblocks: int, pub_seed: bytes, addrs
+    ) -> None:
+        n = self.params.n
+        step = inblocks * n
+        if not isinstance(addrs, np.ndarray):
+            inputs = memoryview(inputs)
+            state = self.seeded(inblocks)
+            for i, addr_bytes in enumerate(addr_rows(addrs)):
+                sha2_state = state.copy()
+                sha2_state.update(addr_bytes)
+                sha2_state.update(inputs[i * step : (i + 1) * step])
+                outs[i * n : (i + 1) * n] = sha2_state.digest()[:n]
+            return
+
+        # Lay out address || input per lane, so each lane is a single update.
+        lanes = addrs.shape[0]
+        width = SPX_SHA256_ADDR_BYTES + step
+        buf = np.empty((lanes, width), dtype=np.uint8)
+        buf[:, :SPX_SHA256_ADDR_BYTES] = addrs[:, :SPX_SHA256_ADDR_BYTES]
+        buf[:, SPX_SHA256_ADDR_BYTES:] = np.frombuffer(
+            inputs, dtype=np.uint8, count=lanes * step
+        ).reshape(lanes, step)
+        buf = memoryview(buf).cast("B")
+
+        state = self.seeded(inblocks)
+        digests = []
+        for i in range(0, lanes * width, width):
+            sha2_state = state.copy()
+            sha2_state.update(buf[i : i + width])
+            digests.append(sha2_state.digest()[:n])
+        outs[: lanes * n] = b"".join(digests)
+
+    def thash_lanes(
+        self,
+        outs: bytearray,
+        inputs: bytes,
+        inblocks: int,
+        pub_seeds,
+        addrs,
+        params=SPX_DEFAULT_PARAMS,
+    ) -> None:
+        n = params.n
+        step = inblocks * n
+        sha512 = params.thash_sha512(inblocks)
+        inputs = memoryview(inputs)
+        states = {}
+        for i, (seed, addr_bytes) in enumerate(
+            zip(seed_rows(pub_seeds, n), addr_rows(addrs))
+        ):
+            state = states.get(seed)
+            if state is None:
+                state = states[seed] = hashlib_seeded_state(seed, sha512)
+            sha2_state = state.copy()
+            sha2_state.update(addr_bytes)
+            sha2_state.update(inputs[i * step : (i + 1) * step])
+            outs[i * n : (i + 1) * n] = sha2_state.digest()[:n]
+
+
+class NumpyBackend(HashBackend):
+    """Multi-lane NumPy compression from spx.sha256x; scalar calls use one lane."""
+
+    name = "numpy"
+
+    def __init__(self):
+        self.midstate = np.zeros(8, dtype=np.uint32)
+        self.midstate_512 = np.zeros(8, dtype=np.uint64)
+        self.bytes_count = 0
+
+    def seed_state(self, pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> None:
+        self.params = params
+        block = bytearray(SPX_SHA256_BLOCK_BYTES)
+        block[: params.n] = pub_seed[: params.n]
+        states = np.frombuffer(IV_256, dtype=">u4").astype(np.uint32).reshape(1, 8)
+        crypto_hashblocks_sha256x(
+            states, np.frombuffer(bytes(block), dtype=">u4").astype(np.uint32)[None]
+        )
+        self.midstate = states[0]
+        self.bytes_count = SPX_SHA256_BLOCK_BYTES
+        if params.hash_name == "sha512":
+            seed = np.frombuffer(bytes(pub_seed[: params.n]), dtype=np.uint8)
+            self.midstate_512 = sha512x_seeded_states(seed[None])[0]
+
+    def load_state(
+        self, pub_seed: bytes, midstates: bytes, params=SPX_DEFAULT_PARAMS
+    ) -> None:
+        self.params = params
+        self.midstate = np.frombuffer(midstates, dtype=">u4", count=8).astype(np.uint32)
+        self.bytes_count = SPX_SHA256_BLOCK_BYTES
+        if params.hash_name == "sha512":
+            self.midstate_512 = midstate_512_from_bytes(midstates)
+
+    def thash(
+        self, out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr
+    ) -> None:
+        self.thash_many(out, input, inblocks, pub_seed, [addr])
+
+    def thash_many(
+        self, outs: bytearray, inputs: bytes, inblocks: int, pub_seed: bytes, addrs
+    ) -> None:
+        n = self.params.n
+        addr_bytes = np.frombuffer(b"".join(addr_rows(addrs)), dtype=np.uint8).reshape(
+            -1, SPX_SHA256_ADDR_BYTES
+        )
+        lanes = addr_bytes.shape[0]
+        if lanes == 0:
+            return
+
+        buf = np.empty((lanes, SPX_SHA256_ADDR_BYTES + inblocks * n), dtype=np.uint8)
+        buf[:, :SPX_SHA256_ADDR_BYTES] = addr_bytes
+        buf[:, SPX_SHA256_ADDR_BYTES:] = np.frombuffer(
+            inputs, dtype=np.uint8, count=lanes * inblocks * n
+        ).reshape(lanes, inblocks * n)
+
+        # Every lane starts from the precomputed state containing pub_seed
+        padding = self.params.thash_paddings.get(inblocks)
+        if self.params.thash_sha512(inblocks):
+            digests = sha512x_inc_finalize(
+                self.midstate_512, SPX_SHA512_BLOCK_BYTES, buf, padding
+            )
+        else:
+            digests = sha256x_inc_finalize(
+                self.midstate, self.bytes_count, buf, padding
+            )
+        outs[: lanes * n] = digests[:, :n].tobytes()
+
+    def thash_lanes(
+        self,
+        outs: bytearray,
+        inputs: bytes,
+        inblocks: int,
+        pub_seeds,
+        addrs,
+        params=SPX_DEFAULT_PARAMS,
+    ) -> None:
+        n = params.n
+        seeds = np.frombuffer(
+            b"".join(seed_rows(pub_seeds, n)), dtype=np.uint8
+        ).reshape(-1, n)
+        lanes = seeds.shape[0]
+        if lanes == 0:
+            return
+
+        # One compression per distinct pub_seed gives the per-lane midstates.
+        unique_seeds, inverse = np.unique(seeds, axis=0, return_inverse=True)
+        sha512 = params.thash_sha512(inblocks)
+        if sha512:
+            midstates = sha512x_seeded_states(unique_seeds)
+        else:
+            blocks = np.zeros(
+                (len(unique_seeds), SPX_SHA256_BLOCK_BYTES), dtype=np.uint8
+            )
+            blocks[:, :n] = unique_seeds
+            midstates = np.empty((len(unique_seeds), 8), dtype=np.uint32)
+            midstates[:] = np.frombuffer(IV_256, dtype=">u4")
+            crypto_hashblocks_sha256x(midstates, blocks.view(">u4").astype(np.uint32))
+
+        buf = np.empty((lanes, SPX_SHA256_ADDR_BYTES + inblocks * n), dtype=np.uint8)
+        buf[:, :SPX_SHA256_ADDR_BYTES] = np.frombuffer(
+            b"".join(addr_rows(addrs)), dtype=np.uint8
+        ).reshape(lanes, SPX_SHA256_ADDR_BYTES)
+        buf[:, SPX_SHA256_ADDR_BYTES:] = np.frombuffer(
+            inputs, dtype=np.uint8, count=lanes * inblocks * n
+        ).reshape(lanes, inblocks * n)
+
+        finalize = sha512x_inc_finalize if sha512 else sha256x_inc_finalize
+        digests = finalize(
+            midstates[inverse.reshape(-1)],
+            SPX_SHA512_BLOCK_BYTES if sha512 else SPX_SHA256_BLOCK_BYTES,
+            buf,
+            params.thash_paddings.get(inblocks),
+        )
+        outs[: lanes * n] = digests[:, :n].tobytes()
+
+
+class ShakeBackend(HashBackend):
+    """SHAKE256 thash, thash(in) = SHAKE256(pub_seed || ADRS || in), n bytes.
+
+    hashlib.shake_256 absorbs the pub_seed once in seed_state and is copied
+    per thash. ADRS is the full SPX_ADDR_BYTES address of src/shake_offsets.h,
+    expanded from the compressed rows by full_addr_rows.
+    """
+
+    name = "shake256"
+
+    def __init__(self):
+        self.state = hashlib.shake_256()
+
+    def seed_state(self, pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> None:
+        self.params = params
+        self.state = hashlib.shake_256(bytes(pub_seed[: params.n]))
+
+    def thash(
+        self, out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr
+    ) -> None:
+        n = self.params.n
+        state = self.state.copy()
+        state.update(full_addr_rows([addr]).tobytes())
+        state.update(input[: inblocks * n])
+        out[:] = state.digest(n)
+
+    def thash_many(
+        self, outs: bytearray, inputs: bytes, inblocks: int, pub_seed: bytes, addrs
+    ) -> None:
+        self.thash_rows(outs, inputs, inblocks, [self.state], None, addrs)
+
+    def thash_lanes(
+        self,
+        outs: bytearray,
+        inputs: bytes,
+        inblocks: int,
+        pub_seeds,
+        addrs,
+        params=SPX_DEFAULT_PARAMS,
+    ) -> None:
+        states = {}
+        lane_states = []
+        for seed in seed_rows(pub_seeds, params.n):
+            state = states.get(seed)
+            if state is None:
+                state = states[seed] = hashlib.shake_256(seed)
+            lane_states.append(state)
+        self.thash_rows(outs, inputs, inblocks, lane_states, params, addrs)
+
+    def thash_rows(self, outs, inputs, inblocks, states, params, addrs) -> None:
+        # Lay out ADRS || input per lane, so each lane is a single update.
+        n = (params or self.params).n
+        step = inblocks * n
+        rows = full_addr_rows(addrs)
+        lanes = rows.shape[0]
+        width = SPX_ADDR_BYTES + step
+        buf = np.empty((lanes, width), dtype=np.uint8)
+        buf[:, :SPX_ADDR_BYTES] = rows
+        buf[:, SPX_ADDR_BYTES:] = np.frombuffer(
+            inputs, dtype=np.uint8, count=lanes * step
+        ).reshape(lanes, step)
+        buf = memoryview(buf).cast("B")
+
+        digests = []
+        for i in range(lanes):
+            state = states[i if len(states) > 1 else 0].copy()
+            state.update(buf[i * width : (i + 1) * width])
+            digests.append(state.digest(n))
+        outs[: lanes * n] = b"".join(digests)
+
+
+def full_addr_rows(addrs) -> np.ndarray:
+    """The (lanes, SPX_ADDR_BYTES) SHAKE256 address of every compressed row."""
+    if isinstance(addrs, np.ndarray):
+        rows = addrs[:, :SPX_SHA256_ADDR_BYTES]
+    else:
+        rows = np.frombuffer(b"".join(addr_rows(addrs)), dtype=np.uint8).reshape(
+            -1, SPX_SHA256_ADDR_BYTES
+        )
+    full = np.zeros((rows.shape[0], SPX_ADDR_BYTES), dtype=np.uint8)
+    full[:, SPX_SHAKE_OFFSET_LAYER] = rows[:, SPX_OFFSET_LAYER]
+    full[:, SPX_SHAKE_OFFSET_TREE : SPX_SHAKE_OFFSET_TREE + 8] = rows[
+        :, SPX_OFFSET_TREE : SPX_OFFSET_TREE + 8
+    ]
+    full[:, SPX_SHAKE_OFFSET_TYPE:] = rows[:, SPX_OFFSET_TYPE:]
+    return full
+
+
+def prf_addrs(key: bytes, addrs, params=SPX_DEFAULT_PARAMS, pub_seed=None) -> bytes:
+    """PRF(key, ADRS) of every address, n bytes each, in the family of params.
+
+    SHA-256 hashes key || compressed ADRS, SHAKE256 key || full ADRS. The
+    "sha512" sets follow round 3.1: SHA-256 of pub_seed padded to 64 bytes
+    || compressed ADRS || key, so they need the pub_seed of the key.
+    """
+    n = params.n
+    key = bytes(key[:n])
+    if params.hash_name == "shake256":
+        rows = full_addr_rows(addrs)
+        return b"".join(
+            hashlib.shake_256(key + row.tobytes()).digest(n) for row in rows
+        )
+    if params.hash_name == "sha512":
+        if pub_seed is None:
+            raise ValueError(f"PRF of {params.name} needs the pub_seed")
+        seeded = prf_seeded_state(bytes(pub_seed[:n]))
+        outs = []
+        for row in addr_rows(addrs):
+            state = seeded.copy()
+            state.update(row)
+            state.update(key)
+            outs.append(state.digest()[:n])
+        return b"".join(outs)
+    return b"".join(
+        hashlib.sha256(key + bytes(row)).digest()[:n] for row in addr_rows(addrs)
+    )
+
+
+@lru_cache(maxsize=16)
+def prf_seeded_state(pub_seed: bytes):
+    """The SHA-256 state PRF of the "sha512" sets continues; do not update it."""
+    return hashlib_seeded_state(pub_seed)
+
+
+def addr_rows(addrs) -> list:
+    """The SPX_SHA256_ADDR_BYTES compressed address of each lane, bytes-like."""
+    if isinstance(addrs, np.ndarray):
+        return [row.tobytes() for row in addrs[:, :SPX_SHA256_ADDR_BYTES]]
+    return [addr.view() for addr in addrs]
+
+
+def seed_rows(pub_seeds, n: int = SPX_N) -> list:
+    """The n byte pub_seed of each lane, as bytes."""
+    if isinstance(pub_seeds, np.ndarray):
+        return [row.tobytes() for row in pub_seeds[:, :n]]
+    return [bytes(seed[:n]) for seed in pub_seeds]
+
+
+HASH_BACKENDS = {}
+# (params, pub_seed) of the midstates currently held by the backends.
+seeded_key = None
+
+
+def register_hash_backend(backend: HashBackend) -> None:
+    global seeded_key
+    HASH_BACKENDS[backend.name] = backend
+    # The new backend has no midstate yet, so the next seed_state must run.
+    seeded_key = None
+
+
+register_hash_backend(ReferenceBackend())
+register_hash_backend(HashlibBackend())
+register_hash_backend(NumpyBackend())
+
+# The SHA-256 backend selected for this process, e.g. with set_hash_backend.
+hash_backend = HASH_BACKENDS[os.environ.get("SPX_HASH_BACKEND", "hashlib")]
+# SHAKE256 parameter sets always use this one.
+shake_backend = ShakeBackend()
+# The backend thash runs on: the one for the family of the seeded key.
+active_backend = hash_backend
+
+
+def get_hash_backend() -> HashBackend:
+    return hash_backend
+
+
+def backend_for(params) -> HashBackend:
+    """The backend running thash for keys of params' hash family."""
+    if params.hash_name == "shake256":
+        return shake_backend
+    return hash_backend
+
+
+def set_hash_backend(name: str) -> None:
+    """Select the SHA-256 thash backend for this process."""
+    global hash_backend, active_backend
+    if name not in HASH_BACKENDS:
+        raise ValueError(f"Unknown hash backend '{name}'")
+    hash_backend = HASH_BACKENDS[name]
+    if seeded_key is None or seeded_key[0].hash_name == "sha256":
+        active_backend = hash_backend
+
+
+@contextmanager
+def use_hash_backend(name: str):
+    """Select the thash backend for the enclosed calls, e.g. one key's operations."""
+    previous = hash_backend.name
+    set_hash_backend(name)
+    try:
+        yield hash_backend
+    finally:
+        set_hash_backend(previous)
+
+
+def seed_state(pub_seed: bytes, params=SPX_DEFAULT_PARAMS, midstates=None) -> None:
+    """Precompute the pub_seed midstate of every backend of params' family.
+
+    The backends also take their output length from params, and thash runs
+    on the family's backend, until the next seed_state. Re-seeding with the
+    key already in place is skipped, which keeps pool workers that serve
+    one key from recomputing the midstate per task. midstates, as stored
+    from seeded_midstates, are loaded instead of compressing pub_seed.
+    """
+    global seeded_key, active_backend
+    key = (params, bytes(pub_seed[: params.n]))
+    if key == seeded_key:
+        return
+    if params.hash_name == "shake256":
+        shake_backend.seed_state(key[1], params)
+    elif midstates is not None:
+        for backend in HASH_BACKENDS.values():
+            backend.load_state(key[1], midstates, params)
+    else:
+        for backend in HASH_BACKENDS.values():
+            backend.seed_state(key[1], params)
+    seeded_key = key
+    active_backend = backend_for(params)
+    if profiling.active_profile is not None and midstates is None:
+        profiling.active_profile.count_seed(params)
+
+
+def seeded_midstates(pub_seed: bytes, params=SPX_DEFAULT_PARAMS) -> bytes:
+    """The big-endian midstates seed_state computes for pub_seed.
+
+    32 bytes of SHA-256 state, followed for "sha512" sets by 64 bytes of
+    SHA-512 state; empty for SHAKE256, whose state is a hashlib object.
+    """
+    if params.hash_name == "shake256":
+        return b""
+    backend = NumpyBackend()
+    backend.seed_state(pub_seed, params)
+    midstates = backend.midstate.astype(">u4").tobytes()
+    if params.hash_name == "sha512":
+        midstates += backend.midstate_512.astype(">u8").tobytes()
+    return midstates
+
+
+def seeded_params():
+    """The parameter set of the last seed_state."""
+    return SPX_DEFAULT_PARAMS if seeded_key is None else seeded_key[0]
+
+
 def thash(
     out: bytearray, input: bytes, inblocks: int, pub_seed: bytes, addr: Address
 ) -> None:
@@ -266,22 +877,49 @@ def thash(
         pub_seed: public seed (not used in simple variant)
         addr: address structure
     """
-    buf = bytearray(SPX_SHA256_ADDR_BYTES + inblocks * SPX_N)
-    outbuf = bytearray(SPX_SHA256_OUTPUT_BYTES)
+    if profiling.active_profile is not None:
+        profiling.active_profile.count_thash(seeded_params(), inblocks)
+    active_backend.thash(out, input, inblocks, pub_seed, addr)
 
-    # Retrieve precomputed state containing pub_seed
-    sha2_state = bytearray(40)
-    sha2_state[:] = state_seeded
 
-    # Copy address and input to buffer
-    buf[:SPX_SHA256_ADDR_BYTES] = addr.to_bytes()[:SPX_SHA256_ADDR_BYTES]
-    buf[SPX_SHA256_ADDR_BYTES : SPX_SHA256_ADDR_BYTES + inblocks * SPX_N] = input
+def thash_many(
+    outs: bytearray, inputs: bytes, inblocks: int, pub_seed: bytes, addrs
+) -> None:
+    """Batched T-hash: one independent thash per address.
+
+    Args:
+        outs: output buffer (len(addrs) * SPX_N bytes), lane i at offset i * SPX_N
+        inputs: concatenated inputs, inblocks * SPX_N bytes per lane
+        inblocks: number of input blocks of every lane
+        pub_seed: public seed (not used in simple variant)
+        addrs: sequence of Address, or a (lanes, >= 22) uint8 array of addresses
+    """
+    if profiling.active_profile is not None:
+        profiling.active_profile.count_thash(seeded_params(), inblocks, len(addrs))
+    active_backend.thash_many(outs, inputs, inblocks, pub_seed, addrs)
 
-    # Incremental finalize SHA256
-    sha256_inc_finalize(
-        outbuf, sha2_state, buf, SPX_SHA256_ADDR_BYTES + inblocks * SPX_N
-    )
-    out[:] = outbuf[:SPX_N]
+
+def thash_lanes(
+    outs: bytearray,
+    inputs: bytes,
+    inblocks: int,
+    pub_seeds,
+    addrs,
+    params=SPX_DEFAULT_PARAMS,
+) -> None:
+    """thash_many with a pub_seed per lane, e.g. signatures of different keys.
+
+    Args:
+        outs: output buffer (lanes * n bytes), lane i at offset i * n
+        inputs: concatenated inputs, inblocks * n bytes per lane
+        inblocks: number of input blocks of every lane
+        pub_seeds: sequence of pub_seeds, or a (lanes, >= n) uint8 array
+        addrs: sequence of Address, or a (lanes, >= 22) uint8 array of addresses
+        params: parameter set of every lane
+    """
+    if profiling.active_profile is not None:
+        profiling.active_profile.count_thash(params, inblocks, len(addrs))
+    backend_for(params).thash_lanes(outs, inputs, inblocks, pub_seeds, addrs, params)
 
 
 def treehash(
@@ -294,6 +932,7 @@ def treehash(
     tree_height: int,
     gen_leaf: callable,
     tree_addr: Address,
+    params=SPX_DEFAULT_PARAMS,
 ) -> None:
     """return the XMSS tree root and the auth path, on the one specific XMSS tree, on its specific leaf node.
 
@@ -307,8 +946,12 @@ def treehash(
         tree_height (int): XMSS tree height
         gen_leaf (callable): leaf node generator
         tree_addr (Address): address structure
+        params (ParamSet): parameter set
     """
-    stack = bytearray((tree_height + 1) * SPX_N)
+    n = params.n
+    stack = bytearray((tree_height + 1) * n)
+    # Slicing a bytearray copies, so leaves and nodes are written through a view.
+    stack_view = memoryview(stack)
     heights = [0] * (tree_height + 1)
     offset = 0
     idx = 0
@@ -316,19 +959,17 @@ def treehash(
 
     while idx < (1 << tree_height):
         # Add the next leaf node to the stack.
-        gen_leaf(
-            stack[offset * SPX_N : (offset + 1) * SPX_N],
-            sk_seed,
-            pub_seed,
-            idx + idx_offset,
-            tree_addr,
-        )
+        slot = stack_view[offset * n : (offset + 1) * n]
+        leaf = gen_leaf(slot, sk_seed, pub_seed, idx + idx_offset, tree_addr)
+        # Leaf generators may also return the leaf instead of filling the buffer.
+        if leaf is not None and leaf is not slot:
+            slot[:] = leaf
         offset += 1
         heights[offset - 1] = 0
 
         # If this is a node we need for the auth path. here is the leaf level closed node.
         if (leaf_idx ^ 0x1) == idx:
-            auth_path[:] = stack[(offset - 1) * SPX_N : offset * SPX_N]
+            auth_path[:n] = stack_view[(offset - 1) * n : offset * n]
 
         # While the top-most nodes are of equal height..
         while offset >= 2 and heights[offset - 1] == heights[offset - 2]:
@@ -342,9 +983,11 @@ def treehash(
             )
 
             # Hash the top-most nodes from the stack together.
+            # Every backend reads its input before writing out, so the two
+            # nodes may be replaced in place by their parent.
             thash(
-                stack[(offset - 2) * SPX_N : (offset - 1) * SPX_N],
-                stack[(offset - 2) * SPX_N : (offset) * SPX_N],
+                stack_view[(offset - 2) * n : (offset - 1) * n],
+                stack_view[(offset - 2) * n : (offset) * n],
                 2,
                 pub_seed,
                 tree_addr,
@@ -355,10 +998,130 @@ def treehash(
 
             # If this is a node we need for the auth path.. on the interval closed node.
             if ((leaf_idx >> heights[offset - 1]) ^ 0x1) == tree_idx:
-                auth_path[
-                    heights[offset - 1] * SPX_N : (heights[offset - 1] + 1) * SPX_N
-                ] = stack[(offset - 1) * SPX_N : offset * SPX_N]
+                auth_path[heights[offset - 1] * n : (heights[offset - 1] + 1) * n] = (
+                    stack_view[(offset - 1) * n : offset * n]
+                )
 
         idx += 1
 
-    root[:] = stack[:SPX_N]
+    root[:] = stack_view[:n]
+
+
+def treehash_levels(
+    root: bytearray,
+    auth_path: bytearray,
+    sk_seed: bytes,
+    pub_seed: bytes,
+    leaf_idx: int,
+    idx_offset: int,
+    tree_height: int,
+    gen_leaves: callable,
+    tree_addr: Address,
+    params=SPX_DEFAULT_PARAMS,
+) -> list:
+    """Level-by-level treehash with the same root and auth path as treehash.
+
+    All 2^tree_height leaves come from one gen_leaves call, then every level is
+    reduced with one thash_many over all of its sibling pairs.
+
+    Args:
+        root (bytearray): root node of the XMSS tree
+        auth_path (bytearray): auth node path of the XMSS tree
+        sk_seed (bytes): security seed
+        pub_seed (bytes): public seed
+        leaf_idx (int): input leaf node index
+        idx_offset (int): on the one level, the XMSS tree index
+        tree_height (int): XMSS tree height
+        gen_leaves (callable): batched leaf generator, called as
+            gen_leaves(leaves, sk_seed, pub_seed, idx_offset, count, tree_addr)
+        tree_addr (Address): address structure
+        params (ParamSet): parameter set
+
+    Returns:
+        list: the nodes of every level as bytearrays, leaves first and root last
+    """
+    n = params.n
+    count = 1 << tree_height
+    leaves = bytearray(count * n)
+    gen_leaves(leaves, sk_seed, pub_seed, idx_offset, count, tree_addr)
+    levels = [leaves]
+
+    for height in range(1, tree_height + 1):
+        count >>= 1
+        first = idx_offset >> height
+        addrs = address_batch(
+            count,
+            tree_addr,
+            tree_height=height,
+            tree_index=range(first, first + count),
+        )
+
+        nodes = bytearray(count * n)
+        thash_many(nodes, levels[-1], 2, pub_seed, addrs)
+        levels.append(nodes)
+
+    # Leave tree_addr as treehash does, on the root node.
+    tree_addr.set_tree_height(tree_height)
+    tree_addr.set_tree_index(idx_offset >> tree_height)
+    root[:] = memoryview(levels[-1])[:n]
+    auth_path_from_levels(auth_path, levels, leaf_idx, params)
+    return levels
+
+
+def auth_path_from_levels(
+    auth_path: bytearray, levels: list, leaf_idx: int, params=SPX_DEFAULT_PARAMS
+) -> None:
+    """Read the auth path of leaf_idx from the level arrays of treehash_levels."""
+    n = params.n
+    for height in range(len(levels) - 1):
+        # The auth node on each level is the sibling of the path node.
+        sibling = (leaf_idx >> height) ^ 0x1
+        auth_path[height * n : (height + 1) * n] = levels[height][
+            sibling * n : (sibling + 1) * n
+        ]
+
+
+def compute_root(
+    root: bytearray,
+    leaf: bytes,
+    leaf_idx: int,
+    idx_offset: int,
+    auth_path: bytes,
+    tree_height: int,
+    pub_seed: bytes,
+    addr: Address,
+    params=SPX_DEFAULT_PARAMS,
+) -> None:
+    """Compute a tree root from a leaf and its auth path.
+
+    Args:
+        root (bytearray): output root node
+        leaf (bytes): leaf node
+        leaf_idx (int): leaf index within the tree
+        idx_offset (int): index of the tree's first leaf on the level
+        auth_path (bytes): tree_height auth nodes, leaf level first
+        tree_height (int): tree height
+        pub_seed (bytes): public seed
+        addr (Address): address structure, type and upper fields already set
+        params (ParamSet): parameter set
+    """
+    n = params.n
+    buffer = bytearray(2 * n)
+    node = bytearray(leaf[:n])
+
+    # If leaf_idx is odd (last bit = 1), current path element is a right child
+    # and auth_path has to go left. Otherwise it is the other way around.
+    for i in range(tree_height):
+        if leaf_idx & 1:
+            buffer[:n] = auth_path[i * n : (i + 1) * n]
+            buffer[n:] = node
+        else:
+            buffer[:n] = node
+            buffer[n:] = auth_path[i * n : (i + 1) * n]
+        leaf_idx >>= 1
+        idx_offset >>= 1
+        addr.set_tree_height(i + 1)
+        addr.set_tree_index(leaf_idx + idx_offset)
+        thash(node, buffer, 2, pub_seed, addr)
+
+    root[:n] = node
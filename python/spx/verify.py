@@ -0,0 +1,269 @@
+"""Lane-parallel verification of many SPHINCS+ signatures.
+
+verify_many runs the FORS and hypertree reconstruction of every signature
+in lockstep: each step of crypto_sign_verify becomes one thash_lanes call
+over all signatures, every signature (or FORS tree, or WOTS chain) being a
+lane with its own pub_seed. WOTS chains start at different positions, so
+chain step s only hashes the lanes whose chain has started by then.
+"""
+
+import numpy as np
+
+from spx.address import AddrType, address_batch, set_address_fields
+from spx.constant import *
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.pool import pool_workers, shared_pool
+from spx.sign import hash_message
+from spx.utils import thash_lanes
+
+
+def thash_rows(
+    inputs: np.ndarray,
+    pub_seeds: np.ndarray,
+    addrs: np.ndarray,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """thash_lanes over (lanes, inblocks * n) inputs; (lanes, n) nodes."""
+    n = params.n
+    lanes = inputs.shape[0]
+    outs = bytearray(lanes * n)
+    inblocks = inputs.shape[1] // n
+    thash_lanes(
+        outs,
+        np.ascontiguousarray(inputs).reshape(-1),
+        inblocks,
+        pub_seeds,
+        addrs,
+        params,
+    )
+    return np.frombuffer(outs, dtype=np.uint8).reshape(lanes, n)
+
+
+def compute_root_lanes(
+    nodes, leaf_idx, idx_offset, auth_paths, pub_seeds, addrs, params=SPX_DEFAULT_PARAMS
+):
+    """compute_root for every lane; auth_paths is (lanes, height, n)."""
+    for height in range(auth_paths.shape[1]):
+        right = ((leaf_idx >> height) & 1).astype(bool)[:, None]
+        auth = auth_paths[:, height]
+        buffer = np.concatenate(
+            [np.where(right, auth, nodes), np.where(right, nodes, auth)], axis=1
+        )
+        set_address_fields(
+            addrs,
+            tree_height=height + 1,
+            tree_index=(leaf_idx + idx_offset) >> (height + 1),
+        )
+        nodes = thash_rows(buffer, pub_seeds, addrs, params)
+    return nodes
+
+
+def chain_lengths_lanes(msgs: np.ndarray, params=SPX_DEFAULT_PARAMS) -> np.ndarray:
+    """chain_lengths of every row: message digits followed by checksum digits.
+
+    Both come from the lookup tables of params: base-w digits per message
+    byte, then the checksum digits of every possible checksum.
+    """
+    lanes = len(msgs)
+    digits = params.base_w_table[msgs[:, : params.n]].reshape(lanes, -1)
+    lengths = digits[:, : params.wots_len1].astype(np.int64)
+    csum = params.wots_len1 * (params.wots_w - 1) - lengths.sum(axis=1)
+    return np.concatenate([lengths, params.csum_table[csum]], axis=1)
+
+
+def fors_pk_from_sig_lanes(
+    sigs, mhashes, pub_seeds, trees, idx_leaves, params=SPX_DEFAULT_PARAMS
+):
+    """fors_pk_from_sig of every lane; returns (lanes, n) FORS public keys."""
+    n, fors_trees, fors_height = params.n, params.fors_trees, params.fors_height
+    lanes = len(sigs)
+    fors_sigs = sigs.reshape(lanes, fors_trees, fors_height + 1, n)
+
+    # message_to_indices: fors_height bits per tree, least significant first.
+    bits = np.unpackbits(mhashes, axis=1, bitorder="little")
+    bits = bits[:, : fors_trees * fors_height].reshape(lanes, fors_trees, fors_height)
+    indices = (bits.astype(np.uint32) << np.arange(fors_height, dtype=np.uint32)).sum(
+        axis=2, dtype=np.uint32
+    )
+
+    # One lane per (signature, FORS tree).
+    tree_lanes = lanes * fors_trees
+    tree_seeds = np.repeat(pub_seeds, fors_trees, axis=0)
+    idx_offset = np.tile(np.arange(fors_trees, dtype=np.uint32) << fors_height, lanes)
+    leaf_idx = indices.reshape(-1)
+    addrs = address_batch(
+        tree_lanes,
+        tree=np.repeat(trees, fors_trees),
+        type=AddrType.FORS_TREE,
+        keypair=np.repeat(idx_leaves, fors_trees),
+        tree_index=leaf_idx + idx_offset,
+    )
+
+    leaves = thash_rows(
+        fors_sigs[:, :, 0].reshape(tree_lanes, n), tree_seeds, addrs, params
+    )
+    roots = compute_root_lanes(
+        leaves,
+        leaf_idx,
+        idx_offset,
+        fors_sigs[:, :, 1:].reshape(tree_lanes, fors_height, n),
+        tree_seeds,
+        addrs,
+        params,
+    )
+
+    roots_addrs = address_batch(
+        lanes, tree=trees, type=AddrType.FORS_ROOTS, keypair=idx_leaves
+    )
+    return thash_rows(
+        roots.reshape(lanes, fors_trees * n), pub_seeds, roots_addrs, params
+    )
+
+
+def layer_addr_batch(lanes, layer, params=SPX_DEFAULT_PARAMS, **fields):
+    """address_batch of lanes rows on hypertree layer layer, from its template."""
+    addrs = np.repeat(params.layer_addr_templates[layer : layer + 1], lanes, axis=0)
+    set_address_fields(addrs, **fields)
+    return addrs
+
+
+def wots_pk_from_sig_lanes(
+    sigs, msgs, pub_seeds, layer, trees, idx_leaves, params=SPX_DEFAULT_PARAMS
+):
+    """wots_pk_from_sig of every lane; returns (lanes, wots_len, n)."""
+    n, wots_len = params.n, params.wots_len
+    lanes = len(sigs)
+    chains = sigs.reshape(lanes, wots_len, n).copy()
+    lengths = chain_lengths_lanes(msgs, params)
+
+    chain_addrs = layer_addr_batch(
+        lanes * wots_len,
+        layer,
+        params,
+        tree=np.repeat(trees, wots_len),
+        type=AddrType.WOTS_HASH,
+        keypair=np.repeat(idx_leaves, wots_len),
+        chain=np.tile(np.arange(wots_len), lanes),
+    ).reshape(lanes, wots_len, SPX_SHA256_ADDR_BYTES)
+    chain_seeds = np.repeat(pub_seeds[:, None], wots_len, axis=1)
+
+    # Chain i is at hash address lengths[i] after its signature value, so step s
+    # hashes exactly the chains with lengths <= s.
+    for step in range(params.wots_w - 1):
+        active = lengths <= step
+        if not active.any():
+            continue
+        step_addrs = chain_addrs[active]
+        set_address_fields(step_addrs, hash=step)
+        chains[active] = thash_rows(
+            chains[active], chain_seeds[active], step_addrs, params
+        )
+    return chains
+
+
+def verify_many(items, params=SPX_DEFAULT_PARAMS, workers=None, executor=None) -> list:
+    """Verify [(msg, sig, pk), ...] in lockstep; one bool per item.
+
+    Every item uses the parameter set params. Items with a malformed
+    signature or public key are False and do not take part in the hashing.
+
+    With workers > 1, or an executor given, the items are split into one
+    contiguous chunk per worker (with an executor, workers is its size;
+    shared pools know their own), each verified in lockstep on a process
+    pool. workers > 1 without an executor uses the warm
+    spx.pool.shared_pool; spx.tuning.tuned_pool("verify", params) is the
+    pool of the calibrated size.
+    """
+    if executor is None and workers is not None and workers > 1 and len(items) > 1:
+        executor = shared_pool(workers)
+    if executor is not None and items:
+        size = -(-len(items) // max(pool_workers(executor, workers), 1))
+        chunks = [list(items[i : i + size]) for i in range(0, len(items), size)]
+        results = executor.map(
+            verify_many, chunks, [params] * len(chunks), [1] * len(chunks)
+        )
+        return [result for chunk in results for result in chunk]
+
+    n, tree_height = params.n, params.tree_height
+    results = [False] * len(items)
+    valid = [
+        i
+        for i, (_, sig, pk) in enumerate(items)
+        if len(sig) == params.bytes and len(pk) == params.pk_bytes
+    ]
+    if not valid:
+        return results
+    lanes = len(valid)
+
+    sigs = np.frombuffer(
+        b"".join(bytes(items[i][1]) for i in valid), dtype=np.uint8
+    ).reshape(lanes, params.bytes)
+    pks = np.frombuffer(
+        b"".join(bytes(items[i][2]) for i in valid), dtype=np.uint8
+    ).reshape(lanes, params.pk_bytes)
+    pub_seeds = pks[:, :n]
+
+    mhashes = np.empty((lanes, params.fors_msg_bytes), dtype=np.uint8)
+    trees = np.empty(lanes, dtype=np.uint64)
+    idx_leaves = np.empty(lanes, dtype=np.uint32)
+    for lane, i in enumerate(valid):
+        msg, sig, pk = items[i]
+        mhash = bytearray(params.fors_msg_bytes)
+        tree = [0]
+        idx_leaf = [0]
+        hash_message(mhash, tree, idx_leaf, sig[:n], pk, msg, len(msg), params)
+        mhashes[lane] = np.frombuffer(mhash, dtype=np.uint8)
+        trees[lane] = tree[0]
+        idx_leaves[lane] = idx_leaf[0]
+
+    offset = params.fors_offset
+    roots = fors_pk_from_sig_lanes(
+        sigs[:, offset : offset + params.fors_bytes],
+        mhashes,
+        pub_seeds,
+        trees,
+        idx_leaves,
+        params,
+    )
+
+    for layer in range(params.d):
+        offset = params.wots_offsets[layer]
+        wots_pks = wots_pk_from_sig_lanes(
+            sigs[:, offset : offset + params.wots_bytes],
+            roots,
+            pub_seeds,
+            layer,
+            trees,
+            idx_leaves,
+            params,
+        )
+
+        pk_addrs = layer_addr_batch(
+            lanes, layer, params, tree=trees, type=AddrType.WOTS_PK, keypair=idx_leaves
+        )
+        leaves = thash_rows(
+            wots_pks.reshape(lanes, params.wots_bytes), pub_seeds, pk_addrs, params
+        )
+
+        tree_addrs = layer_addr_batch(
+            lanes, layer, params, tree=trees, type=AddrType.TREE
+        )
+        offset = params.auth_offsets[layer]
+        roots = compute_root_lanes(
+            leaves,
+            idx_leaves,
+            0,
+            sigs[:, offset : offset + tree_height * n].reshape(lanes, tree_height, n),
+            pub_seeds,
+            tree_addrs,
+            params,
+        )
+
+        # Move up to the next layer, as hypertree_layers does.
+        idx_leaves = (trees & np.uint64((1 << tree_height) - 1)).astype(np.uint32)
+        trees = trees >> np.uint64(tree_height)
+
+    matches = (roots == pks[:, n:]).all(axis=1)
+    for lane, i in enumerate(valid):
+        results[i] = bool(matches[lane])
+    return results
@@ -1,38 +1,128 @@
-import hashlib
 from typing import List, Tuple
 
-from spx.address import Address
-from spx.utils import thash
+import numpy as np
+
+from spx.address import Address, address_batch, set_address_fields
+from spx.utils import prf_addrs, thash, thash_many
 from spx.constant import *
+from spx.params import SPX_DEFAULT_PARAMS
 
 
-def prf_addr(key: bytearray, addr: Address) -> bytes:
-    """PRF function using SHA256"""
-    addr_bytes = addr.to_bytes()[:SPX_SHA256_ADDR_BYTES]
-    return hashlib.sha256(key + addr_bytes).digest()[:SPX_N]
+def prf_addr(
+    key: bytearray, addr: Address, params=SPX_DEFAULT_PARAMS, pub_seed=None
+) -> bytes:
+    """PRF function, SHA256 or SHAKE256 as params says"""
+    return prf_addrs(key, [addr], params, pub_seed)
 
 
 def gen_chain(
-    input_data: bytearray, start: int, steps: int, pub_seed: bytearray, addr: Address
+    input_data: bytearray,
+    start: int,
+    steps: int,
+    pub_seed: bytearray,
+    addr: Address,
+    params=SPX_DEFAULT_PARAMS,
 ) -> bytearray:
     """Compute the chaining function"""
-    out = input_data[:SPX_N]
+    out = bytearray(input_data[: params.n])
 
-    for i in range(start, min(start + steps, SPX_WOTS_W)):
+    for i in range(start, min(start + steps, params.wots_w)):
         addr.set_hash_addr(i)
         thash(out, out, 1, pub_seed, addr)
 
     return out
 
 
-def wots_gen_sk(sk_seed: bytearray, addr: Address) -> bytearray:
+def prf_addr_rows(
+    key: bytearray, addrs: np.ndarray, params=SPX_DEFAULT_PARAMS, pub_seed=None
+) -> np.ndarray:
+    """prf_addr for every row of a (lanes, 22) address array; (lanes, n)."""
+    out = prf_addrs(key, addrs, params, pub_seed)
+    return np.frombuffer(out, dtype=np.uint8).reshape(-1, params.n)
+
+
+def gen_chains(
+    values: np.ndarray,
+    starts,
+    steps,
+    pub_seed: bytearray,
+    addrs: np.ndarray,
+    params=SPX_DEFAULT_PARAMS,
+) -> np.ndarray:
+    """gen_chain for many chains in lockstep, one chain per lane.
+
+    Step i hashes, with a single thash_many, every lane whose chain covers
+    hash address i (start <= i < start + steps); the other lanes are masked.
+
+    Args:
+        values (np.ndarray): (lanes, n) chain inputs
+        starts: start position of every lane, or one for all
+        steps: number of steps of every lane, or one for all
+        pub_seed (bytearray): public seed
+        addrs (np.ndarray): (lanes, 22) addresses with the chain of each lane set
+        params (ParamSet): parameter set
+
+    Returns:
+        np.ndarray: (lanes, n) chain outputs
+    """
+    n = params.n
+    values = np.array(values, dtype=np.uint8).reshape(-1, n)
+    lanes = values.shape[0]
+    starts = np.broadcast_to(np.asarray(starts, dtype=np.int64), (lanes,))
+    stops = np.minimum(starts + np.asarray(steps, dtype=np.int64), params.wots_w)
+    if lanes == 0:
+        return values
+
+    step_addrs = np.array(addrs[:, :SPX_SHA256_ADDR_BYTES])
+    outs = bytearray(lanes * n)
+    # Steps covering every lane hash the values in place.
+    flat = memoryview(values).cast("B")
+    for i in range(int(starts.min()), int(stops.max())):
+        mask = (starts <= i) & (i < stops)
+        if mask.all():
+            step_addrs[:, SPX_OFFSET_HASH_ADDR] = i
+            thash_many(flat, flat, 1, pub_seed, step_addrs)
+            continue
+        active = np.flatnonzero(mask)
+        count = len(active)
+        if count == 0:
+            continue
+        addrs_i = step_addrs[active]
+        addrs_i[:, SPX_OFFSET_HASH_ADDR] = i
+        thash_many(outs, values[active].tobytes(), 1, pub_seed, addrs_i)
+        values[active] = np.frombuffer(outs, dtype=np.uint8, count=count * n).reshape(
+            count, n
+        )
+
+    return values
+
+
+def wots_chain_addrs(
+    addr: Address, keypairs=None, params=SPX_DEFAULT_PARAMS
+) -> np.ndarray:
+    """The wots_len chain addresses of addr, or of each of keypairs."""
+    wots_len = params.wots_len
+    if keypairs is None:
+        return address_batch(wots_len, addr, chain=range(wots_len))
+    keypairs = np.asarray(keypairs)
+    return address_batch(
+        len(keypairs) * wots_len,
+        addr,
+        keypair=np.repeat(keypairs, wots_len),
+        chain=np.tile(np.arange(wots_len), len(keypairs)),
+    )
+
+
+def wots_gen_sk(
+    sk_seed: bytearray, addr: Address, params=SPX_DEFAULT_PARAMS, pub_seed=None
+) -> bytearray:
     """Generate WOTS secret key element"""
     # no problem with this
     addr.set_hash_addr(0)
-    return bytearray(prf_addr(sk_seed, addr))
+    return bytearray(prf_addr(sk_seed, addr, params, pub_seed))
 
 
-def base_w(msg: bytearray, out_len: int) -> bytearray:
+def base_w(msg: bytearray, out_len: int, params=SPX_DEFAULT_PARAMS) -> bytearray:
     """Convert byte string to base w"""
     consumed = 0
     bits = 0
@@ -44,32 +134,90 @@ def base_w(msg: bytearray, out_len: int) -> bytearray:
             total = msg[consumed]
             bits = 8
             consumed += 1
-        bits -= SPX_WOTS_LOGW
-        output.append((total >> bits) & (SPX_WOTS_W - 1))
+        bits -= params.wots_logw
+        output.append((total >> bits) & (params.wots_w - 1))
 
     return output
 
 
-def wots_checksum(msg_base_w: bytearray) -> bytearray:
+def wots_checksum(msg_base_w: bytearray, params=SPX_DEFAULT_PARAMS) -> bytearray:
     """Compute the checksum of the message in base-w format and convert it to base-w."""
+    len2, logw = params.wots_len2, params.wots_logw
     csum = 0
-    csum_bytes = bytearray((SPX_WOTS_LEN2 * SPX_WOTS_LOGW + 7) // 8)
+    csum_bytes = bytearray((len2 * logw + 7) // 8)
 
     # Compute checksum.
-    for i in range(SPX_WOTS_LEN1):
-        csum += SPX_WOTS_W - 1 - msg_base_w[i]
+    for i in range(params.wots_len1):
+        csum += params.wots_w - 1 - msg_base_w[i]
 
     # Convert checksum to base_w.
     # Make sure expected empty zero bits are the least significant bits.
-    csum = csum << ((8 - ((SPX_WOTS_LEN2 * SPX_WOTS_LOGW) % 8)) % 8)
+    csum = csum << ((8 - ((len2 * logw) % 8)) % 8)
     csum_bytes = csum.to_bytes(len(csum_bytes), byteorder="big")
-    return base_w(csum_bytes, SPX_WOTS_LEN2)
+    return base_w(csum_bytes, len2, params)
 
 
-def chain_lengths(lengths: bytearray, msg: bytearray):
+def chain_lengths(lengths: bytearray, msg: bytearray, params=SPX_DEFAULT_PARAMS):
     """Compute the lengths by the msg, where spilt to base w and computer the checksum"""
-    lengths[:SPX_WOTS_LEN1] = base_w(msg, SPX_WOTS_LEN1)
-    lengths[SPX_WOTS_LEN1 : SPX_WOTS_LEN1 + SPX_WOTS_LEN2] = wots_checksum(lengths)
+    # The digit and checksum tables of params replace base_w and wots_checksum.
+    lengths[: params.wots_len] = params.chain_lengths(msg).tobytes()
+
+
+def wots_chain_checkpoints(
+    sk_seed: bytearray,
+    pub_seed: bytearray,
+    addr: Address,
+    chain_cache,
+    params=SPX_DEFAULT_PARAMS,
+) -> np.ndarray:
+    """Chain values of addr's keypair at chain_cache.positions(params), cached.
+
+    Returns:
+        tuple: (wots_len, len(positions), n) chain values, and
+            whether they came from the cache
+    """
+    key = chain_cache.entry_key(sk_seed, pub_seed, addr, params)
+    checkpoints = chain_cache.lookup(key)
+    if checkpoints is not None:
+        return checkpoints, True
+
+    addrs = wots_chain_addrs(addr, None, params)
+    set_address_fields(addrs, hash=0)
+    values = prf_addr_rows(sk_seed, addrs, params, pub_seed)
+    columns = [values]
+    position = 0
+    for next_position in chain_cache.positions(params)[1:]:
+        values = gen_chains(
+            values, position, next_position - position, pub_seed, addrs, params
+        )
+        columns.append(values)
+        position = next_position
+    checkpoints = np.stack(columns, axis=1)
+    chain_cache.fill_hash_calls += params.wots_len * (params.wots_w - 1)
+    chain_cache.store(key, checkpoints, checkpoints.nbytes)
+    return checkpoints, False
+
+
+def wots_chains_from_cache(
+    sk_seed, pub_seed, addr, lengths, chain_cache, params=SPX_DEFAULT_PARAMS
+):
+    """Every chain at position lengths[i], from its nearest checkpoint below.
+
+    Only a cache hit counts the skipped steps as saved; a miss pays for
+    filling the checkpoints instead.
+    """
+    checkpoints, hit = wots_chain_checkpoints(
+        sk_seed, pub_seed, addr, chain_cache, params
+    )
+    lengths = np.asarray(lengths, dtype=np.int64)
+    positions = chain_cache.positions(params)
+    nearest = np.searchsorted(positions, lengths, side="right") - 1
+    starts = positions[nearest]
+    if hit:
+        chain_cache.hash_calls_saved += int(starts.sum())
+    values = checkpoints[np.arange(params.wots_len), nearest]
+    addrs = wots_chain_addrs(addr, None, params)
+    return gen_chains(values, starts, lengths - starts, pub_seed, addrs, params)
 
 
 def wots_sign(
@@ -78,18 +226,25 @@ def wots_sign(
     sk_seed: bytearray,
     pub_seed: bytearray,
     addr: Address,
+    chain_cache=None,
+    params=SPX_DEFAULT_PARAMS,
 ) -> None:
-    """Generate WOTS signature"""
-    lengths = bytearray(SPX_WOTS_LEN)
+    """Generate WOTS signature; resumes from a ChainCache's checkpoints if given."""
+    lengths = params.chain_lengths(msg)
 
-    chain_lengths(lengths, msg)
+    # The chain arrays are C-contiguous, so they are copied into sig directly.
+    if chain_cache is not None:
+        memoryview(sig)[: params.wots_bytes] = wots_chains_from_cache(
+            sk_seed, pub_seed, addr, lengths, chain_cache, params
+        ).reshape(-1)
+        return
 
-    for i in range(SPX_WOTS_LEN):
-        addr.set_chain_addr(i)
-        sig[i * SPX_N : (i + 1) * SPX_N] = wots_gen_sk(sk_seed, addr)
-        sig[i * SPX_N : (i + 1) * SPX_N] = gen_chain(
-            sig[i * SPX_N : (i + 1) * SPX_N], 0, lengths[i], pub_seed, addr
-        )
+    addrs = wots_chain_addrs(addr, None, params)
+    set_address_fields(addrs, hash=0)
+    sks = prf_addr_rows(sk_seed, addrs, params, pub_seed)
+    memoryview(sig)[: params.wots_bytes] = gen_chains(
+        sks, 0, lengths, pub_seed, addrs, params
+    ).reshape(-1)
 
 
 def wots_pk_from_sig(
@@ -98,28 +253,54 @@ def wots_pk_from_sig(
     msg: bytearray,
     pub_seed: bytearray,
     addr: Address,
+    params=SPX_DEFAULT_PARAMS,
 ) -> None:
-    lengths = bytearray(SPX_WOTS_LEN)
-    chain_lengths(lengths, msg)
-    for i in range(SPX_WOTS_LEN):
-        addr.set_chain_addr(i)
-        pk[i * SPX_N : (i + 1) * SPX_N] = gen_chain(
-            sig[i * SPX_N : (i + 1) * SPX_N],
-            lengths[i],
-            SPX_WOTS_W - 1 - lengths[i],
-            pub_seed,
-            addr,
+    lengths = params.chain_lengths(msg)
+    values = np.frombuffer(bytes(sig[: params.wots_bytes]), dtype=np.uint8)
+    addrs = wots_chain_addrs(addr, None, params)
+    pk[: params.wots_bytes] = gen_chains(
+        values, lengths, params.wots_w - 1 - lengths, pub_seed, addrs, params
+    ).tobytes()
+
+
+def wots_gen_pk(
+    sk_seed: bytearray,
+    pub_seed: bytearray,
+    addr: Address,
+    chain_cache=None,
+    params=SPX_DEFAULT_PARAMS,
+) -> bytearray:
+    """Generate WOTS public key; the last checkpoint of a ChainCache if given."""
+    if chain_cache is not None:
+        lengths = np.full(params.wots_len, params.wots_w - 1)
+        return bytearray(
+            wots_chains_from_cache(
+                sk_seed, pub_seed, addr, lengths, chain_cache, params
+            ).tobytes()
         )
+    return bytearray(wots_gen_pks(sk_seed, pub_seed, addr, None, params))
 
 
-def wots_gen_pk(sk_seed: bytearray, pub_seed: bytearray, addr: Address) -> bytearray:
-    """Generate WOTS public key"""
-    pk = bytearray()
+def wots_gen_pks(
+    sk_seed: bytearray,
+    pub_seed: bytearray,
+    addr: Address,
+    keypairs,
+    params=SPX_DEFAULT_PARAMS,
+):
+    """WOTS public keys of many keypairs, all chains run by one gen_chains.
 
-    for i in range(SPX_WOTS_LEN):
-        addr.set_chain_addr(i)
-        sk = wots_gen_sk(sk_seed, addr)
-        pk_element = gen_chain(sk, 0, SPX_WOTS_W - 1, pub_seed, addr)
-        pk.extend(pk_element)
+    Args:
+        sk_seed (bytearray): security seed
+        pub_seed (bytearray): public seed
+        addr (Address): WOTS_HASH address with the subtree (and keypair) set
+        keypairs: keypair addresses to generate, or None for addr's keypair
+        params (ParamSet): parameter set
 
-    return pk
+    Returns:
+        bytes: the public keys, wots_bytes each, in keypairs order
+    """
+    addrs = wots_chain_addrs(addr, keypairs, params)
+    set_address_fields(addrs, hash=0)
+    sks = prf_addr_rows(sk_seed, addrs, params, pub_seed)
+    return gen_chains(sks, 0, params.wots_w - 1, pub_seed, addrs, params).tobytes()
@@ -1,2 +1 @@
-
-# Empty file to make the directory a Python package
\ No newline at end of file
+# Empty file to make the directory a Python package
@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# The calculator is a standalone script; utils/__init__ needs openai.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "utils"))
+
+# (alpha, beta, gamma) of the synthetic sweeps.
+MODELS = {
+    "128F-sign": (1400.0, 1.3e7, 0.0036),
+    "128F-verify": (160.0, 1.4e6, 0.00045),
+}
+
+
+@unittest.skipIf(pd is None, "the calculator needs pandas")
+class TestAdaptiveThreadCalculator(unittest.TestCase):
+    def setUp(self):
+        import adaptive_thread_calculator
+
+        self.calculator = adaptive_thread_calculator
+        out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(out_dir.cleanup)
+        self.out_dir = out_dir.name
+
+        rng = np.random.default_rng(1)
+        rows = []
+        for function, coefficients in MODELS.items():
+            for threads in (64, 128, 256):
+                for blocks in range(32, 1025, 32):
+                    t = blocks * threads
+                    time = self.calculator.performance_model(t, *coefficients)
+                    time *= 1 + 0.01 * rng.standard_normal()
+                    rows.append(f"{function},{blocks}, {threads}, {time:.4f}, 0.0")
+        self.sweep = os.path.join(self.out_dir, "sweep.csv")
+        with open(self.sweep, "w") as f:
+            f.write("function,blocks,threads,time(ms),per_op(ms)\n")
+            f.write("\n".join(rows) + "\n")
+
+    def test_fit_recovers_model(self):
+        df = self.calculator.load_sweeps([self.sweep])
+        results = self.calculator.fit_all_functions(df, n_bootstrap=100)
+        self.assertEqual(list(results["operation"]), sorted(MODELS))
+        for _, row in results.iterrows():
+            alpha, beta, gamma = MODELS[row["operation"]]
+            t_optimal = np.sqrt(beta / gamma)
+            for name, expected in zip(
+                ("alpha", "beta", "gamma", "t_optimal"),
+                (alpha, beta, gamma, t_optimal),
+            ):
+                with self.subTest(row["operation"], parameter=name):
+                    self.assertAlmostEqual(row[name] / expected, 1.0, delta=0.05)
+                    self.assertLess(row[f"{name}_ci_low"], row[name])
+                    self.assertGreater(row[f"{name}_ci_high"], row[name])
+                    self.assertLessEqual(row[f"{name}_ci_low"], expected)
+                    self.assertGreaterEqual(row[f"{name}_ci_high"], expected)
+
+    def test_write_replaces_rows(self):
+        output = os.path.join(self.out_dir, "parameter.csv")
+        existing = pd.DataFrame(
+            [["128F-sign", 1.0], ["256S-sign", 2.0]], columns=["operation", "alpha"]
+        )
+        existing.reindex(columns=self.calculator.PARAMETER_COLUMNS).to_csv(
+            output, index=False
+        )
+
+        df = self.calculator.load_sweeps([self.sweep])
+        results = self.calculator.fit_all_functions(df, n_bootstrap=0)
+        self.calculator.write_parameter_csv(results, output)
+        self.calculator.write_parameter_csv(results, output)
+
+        written = pd.read_csv(output)
+        self.assertEqual(
+            sorted(written["operation"]), ["128F-sign", "128F-verify", "256S-sign"]
+        )
+        alphas = dict(zip(written["operation"], written["alpha"]))
+        self.assertEqual(alphas["256S-sign"], 2.0)
+        self.assertAlmostEqual(alphas["128F-sign"] / 1400.0, 1.0, delta=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
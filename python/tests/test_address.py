@@ -1,5 +1,8 @@
 import unittest
-from spx.address import Address, AddrType
+
+import numpy as np
+
+from spx.address import Address, AddrType, address_batch, set_address_fields
 from spx.constant import *  # Import all constants from spx.constant
 
 
@@ -95,6 +98,50 @@ class TestAddress(unittest.TestCase):
 
         self.assertEqual(self.address.to_bytes(), bytes(expected_bytes))
 
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.address.extra = 1
+
+    def test_view(self):
+        view = self.address.view()
+        self.address.set_hash_addr(7)
+        self.assertEqual(len(view), SPX_SHA256_ADDR_BYTES)
+        self.assertEqual(view[SPX_OFFSET_HASH_ADDR], 7)
+        self.assertEqual(bytes(view), self.address.to_bytes()[:SPX_SHA256_ADDR_BYTES])
+
+
+class TestAddressBatch(unittest.TestCase):
+    def test_matches_address(self):
+        template = Address()
+        template.set_layer_addr(3)
+        template.set_tree_addr(2**40 + 5)
+        template.set_type(AddrType.WOTS_HASH)
+
+        addrs = address_batch(
+            6, template, keypair=range(2, 8), chain=5, hash=[0, 1] * 3
+        )
+        self.assertEqual(addrs.shape, (6, SPX_SHA256_ADDR_BYTES))
+        for i in range(6):
+            addr = Address.from_bytes(template.to_bytes())
+            addr.set_keypair_addr(2 + i)
+            addr.set_chain_addr(5)
+            addr.set_hash_addr(i % 2)
+            self.assertEqual(addrs[i].tobytes(), bytes(addr.view()))
+
+    def test_tree_fields(self):
+        addrs = address_batch(
+            3, layer=1, tree=np.array([1, 2, 3], dtype=np.uint64), type=AddrType.TREE
+        )
+        set_address_fields(addrs, tree_height=2, tree_index=[0, 70000, 2**32 - 1])
+        for i, tree_index in enumerate([0, 70000, 2**32 - 1]):
+            addr = Address()
+            addr.set_layer_addr(1)
+            addr.set_tree_addr(i + 1)
+            addr.set_type(AddrType.TREE)
+            addr.set_tree_height(2)
+            addr.set_tree_index(tree_index)
+            self.assertEqual(addrs[i].tobytes(), bytes(addr.view()))
+
 
 if __name__ == "__main__":
     unittest.main()
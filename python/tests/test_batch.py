@@ -0,0 +1,75 @@
+import unittest
+
+import hashlib
+
+from spx.batch import (
+    batch_digest,
+    batch_tree_height,
+    crypto_sign_batch,
+    crypto_sign_batch_verify,
+)
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import PARAM_SETS
+from spx.sign import crypto_sign_seed_keypair, mgf1
+
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+        cls.msgs = [b"record %d" % i for i in range(5)]
+        cls.batch_sig, cls.proofs = crypto_sign_batch(cls.msgs, cls.sk)
+
+    def test_batch_tree_height(self):
+        self.assertEqual(batch_tree_height(1), 0)
+        self.assertEqual(batch_tree_height(2), 1)
+        self.assertEqual(batch_tree_height(5), 3)
+        self.assertEqual(batch_tree_height(8), 3)
+
+    def test_batch_digest(self):
+        for name, params in PARAM_SETS.items():
+            with self.subTest(name):
+                self.assertEqual(len(batch_digest(b"m", params)), 2 * params.n)
+        shake = PARAM_SETS["shake256-256f"]
+        self.assertEqual(batch_digest(b"m", shake), hashlib.shake_256(b"m").digest(64))
+        expected = bytearray(48)
+        mgf1(expected, 48, hashlib.sha512(b"m").digest(), 64, hashlib.sha512)
+        self.assertEqual(batch_digest(b"m", PARAM_SETS["sha512-192f"]), expected)
+        self.assertEqual(batch_digest(b"m", PARAM_SETS["192f"]), expected)
+
+    def test_verify(self):
+        self.assertEqual(len(self.proofs), len(self.msgs))
+        self.assertEqual(
+            crypto_sign_batch_verify(self.batch_sig, self.msgs, self.proofs, self.pk),
+            [True] * len(self.msgs),
+        )
+
+    def test_wrong_message_or_proof(self):
+        msgs = list(self.msgs)
+        msgs[1] = b"forged"
+        proofs = list(self.proofs)
+        proofs[3] = self.proofs[2]
+        self.assertEqual(
+            crypto_sign_batch_verify(self.batch_sig, msgs, proofs, self.pk),
+            [True, False, True, False, True],
+        )
+
+    def test_tampered_batch_signature(self):
+        batch_sig = bytearray(self.batch_sig)
+        batch_sig[4] ^= 1
+        self.assertEqual(
+            crypto_sign_batch_verify(batch_sig, self.msgs, self.proofs, self.pk),
+            [False] * len(self.msgs),
+        )
+
+    def test_single_message(self):
+        batch_sig, proofs = crypto_sign_batch([b"only"], self.sk)
+        self.assertEqual(
+            crypto_sign_batch_verify(batch_sig, [b"only"], proofs, self.pk), [True]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from spx.bench import (
+    SPX_FUNCTION_FIELDS,
+    SPX_PERFORMANCE_FIELDS,
+    bench_case,
+    format_result,
+    run_benchmark,
+    run_benchmarks,
+    write_results,
+)
+from spx.params import PARAM_SETS
+
+
+class TestBench(unittest.TestCase):
+    def test_run_benchmark(self):
+        result = run_benchmark("gen_chain", "128f", count=5, workers=2)
+        self.assertEqual(result.label, "128F-gen_chain")
+        self.assertEqual(len(result.latencies), 5)
+        self.assertGreater(result.wall, 0)
+        self.assertLessEqual(result.percentile(50), result.percentile(99))
+        self.assertIn("ops/s", format_result(result))
+
+        with self.assertRaises(ValueError):
+            bench_case("sort", PARAM_SETS["128f"])
+
+    def test_write_results(self):
+        results = run_benchmarks(
+            [PARAM_SETS["128f"]],
+            [1],
+            ("keypair", "sign", "verify", "thash"),
+            count=1,
+            report=None,
+        )
+        with tempfile.TemporaryDirectory() as out_dir:
+            paths = write_results(results, out_dir)
+            self.assertEqual(
+                [os.path.basename(path) for path in paths],
+                ["128F-Python.csv", "python-performance.csv"],
+            )
+
+            with open(paths[0], newline="") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(tuple(rows[0]), SPX_FUNCTION_FIELDS)
+            self.assertEqual(
+                [row["function"] for row in rows],
+                ["128F-keypair", "128F-sign", "128F-verify", "128F-thash"],
+            )
+            for row in rows:
+                self.assertEqual(int(row["blocks"]) * int(row["threads"]), 1)
+                self.assertAlmostEqual(
+                    float(row["per_op(ms)"]), float(row["time(ms)"]), delta=1e-2
+                )
+
+            with open(paths[1], newline="") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(tuple(rows[0]), SPX_PERFORMANCE_FIELDS)
+            self.assertEqual([row["Configuration"] for row in rows], ["128F-Python-w1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
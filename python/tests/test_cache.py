@@ -0,0 +1,201 @@
+import io
+import unittest
+from unittest import mock
+
+from spx import profiling
+from spx.address import Address
+from spx.cache import (
+    ChainCache,
+    SignatureCache,
+    SubtreeCache,
+    clear_subtree_caches,
+    set_subtree_cache_limits,
+    subtree_cache_for,
+)
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import PARAM_SETS
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_signature, message_digest
+from spx.stream import MessageSource
+from spx.utils import seed_state
+from spx.wots import wots_gen_pk, wots_sign
+
+
+class TestSubtreeCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = SubtreeCache(max_bytes=None, max_entries=2)
+        cache.put(0, 1, [b"a" * SPX_N])
+        cache.put(0, 2, [b"b" * SPX_N])
+        self.assertEqual(cache.get(0, 1), [b"a" * SPX_N])
+        cache.put(0, 3, [b"c" * SPX_N])
+
+        self.assertIn((0, 1), cache)
+        self.assertNotIn((0, 2), cache)
+        self.assertIsNone(cache.get(0, 2))
+        self.assertEqual(
+            cache.stats(),
+            {
+                "hits": 1,
+                "misses": 1,
+                "hit_rate": 0.5,
+                "evictions": 1,
+                "entries": 2,
+                "bytes": 2 * SPX_N,
+            },
+        )
+
+    def test_max_bytes(self):
+        cache = SubtreeCache(max_bytes=3 * SPX_N)
+        cache.put(0, 0, [bytes(4 * SPX_N)])
+        self.assertEqual(len(cache), 0)
+        cache.put(0, 1, [bytes(2 * SPX_N)])
+        cache.put(0, 2, [bytes(SPX_N)])
+        cache.put(0, 1, [bytes(SPX_N)])
+        self.assertEqual(cache.stats()["bytes"], 2 * SPX_N)
+        cache.put(0, 3, [bytes(2 * SPX_N)])
+        self.assertEqual(list(cache.entries), [(0, 1), (0, 3)])
+
+    def test_per_key_registry(self):
+        clear_subtree_caches()
+        try:
+            self.assertIs(subtree_cache_for(b"1" * 32), subtree_cache_for(b"1" * 32))
+            self.assertIsNot(subtree_cache_for(b"1" * 32), subtree_cache_for(b"2" * 32))
+            # The same pk bytes under another parameter set get their own.
+            self.assertIsNot(
+                subtree_cache_for(b"1" * 32),
+                subtree_cache_for(b"1" * 32, PARAM_SETS["shake256-128f"]),
+            )
+            set_subtree_cache_limits(max_bytes=0)
+            self.assertIsNone(subtree_cache_for(b"1" * 32))
+        finally:
+            set_subtree_cache_limits()
+            clear_subtree_caches()
+
+
+class TestChainCache(unittest.TestCase):
+    def setUp(self):
+        self.sk_seed = bytes(range(SPX_N))
+        self.pub_seed = bytes(range(SPX_N, 2 * SPX_N))
+        seed_state(self.pub_seed)
+        self.addr = Address()
+        self.addr.set_layer_addr(SPX_D - 1)
+        self.addr.set_keypair_addr(5)
+
+    def test_wots_matches_uncached(self):
+        msg = bytes(range(100, 100 + SPX_N))
+        expected = bytearray(SPX_WOTS_BYTES)
+        wots_sign(expected, msg, self.sk_seed, self.pub_seed, self.addr)
+        expected_pk = wots_gen_pk(self.sk_seed, self.pub_seed, self.addr)
+
+        for interval in (1, 4, 15):
+            cache = ChainCache(interval=interval)
+            for _ in range(2):
+                sig = bytearray(SPX_WOTS_BYTES)
+                wots_sign(sig, msg, self.sk_seed, self.pub_seed, self.addr, cache)
+                self.assertEqual(sig, expected)
+            pk = wots_gen_pk(self.sk_seed, self.pub_seed, self.addr, cache)
+            self.assertEqual(pk, expected_pk)
+
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+            self.assertEqual(stats["fill_hash_calls"], SPX_WOTS_LEN * (SPX_WOTS_W - 1))
+            # gen_pk from the last checkpoint skips every chain step.
+            self.assertGreaterEqual(
+                stats["hash_calls_saved"], SPX_WOTS_LEN * (SPX_WOTS_W - 1)
+            )
+
+    def test_budget(self):
+        cache = ChainCache(interval=4)
+        entry_bytes = SPX_WOTS_LEN * len(cache.positions()) * SPX_N
+        cache = ChainCache(max_bytes=2 * entry_bytes, interval=4)
+        for keypair in range(3):
+            self.addr.set_keypair_addr(keypair)
+            wots_gen_pk(self.sk_seed, self.pub_seed, self.addr, cache)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.nbytes, 2 * entry_bytes)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        # Another key never reads this key's chains.
+        other = cache.entry_key(bytes(SPX_N), self.pub_seed, self.addr)
+        self.assertNotIn(other, cache)
+        # Nor does the same key under another parameter set.
+        params = PARAM_SETS["shake256-128f"]
+        other = cache.entry_key(self.sk_seed, self.pub_seed, self.addr, params)
+        self.assertNotIn(other, cache)
+        self.assertIn(cache.entry_key(self.sk_seed, self.pub_seed, self.addr), cache)
+
+
+class TestSignWithCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+
+    def sign(self, m, **kwargs):
+        sig = bytearray(SPX_BYTES)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(sig, [0], m, len(m), self.sk, **kwargs)
+        return sig
+
+    def test_cached_signature_matches(self):
+        cache = SubtreeCache()
+        first = self.sign(b"cached", subtree_cache=cache)
+        self.assertEqual(cache.stats()["misses"], SPX_D)
+
+        # The top layer is shared by every signature of the key.
+        self.sign(b"other message", subtree_cache=cache)
+        self.assertGreaterEqual(cache.stats()["hits"], 1)
+
+        self.assertEqual(self.sign(b"cached", subtree_cache=cache), first)
+        self.assertEqual(cache.stats()["misses"] + cache.stats()["hits"], 3 * SPX_D)
+
+        set_subtree_cache_limits(max_bytes=0)
+        try:
+            self.assertEqual(self.sign(b"cached"), first)
+        finally:
+            set_subtree_cache_limits()
+
+    def test_chain_cache_signature_matches(self):
+        chain_cache = ChainCache()
+        first = self.sign(b"chains", chain_cache=chain_cache)
+        self.assertEqual(self.sign(b"chains", chain_cache=chain_cache), first)
+        self.assertEqual(chain_cache.stats()["hits"], SPX_D)
+        self.assertGreater(chain_cache.stats()["hash_calls_saved"], 0)
+
+    def test_deterministic(self):
+        sig = bytearray(SPX_BYTES)
+        crypto_sign_signature(sig, [0], b"m", 1, self.sk, deterministic=True)
+        again = bytearray(SPX_BYTES)
+        crypto_sign_signature(again, [0], b"m", 1, self.sk, deterministic=True)
+        self.assertEqual(again, sig)
+        # optrand is pub_seed.
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(self.pk[:n])):
+            crypto_sign_signature(again, [0], b"m", 1, self.sk)
+        self.assertEqual(again, sig)
+
+    def test_signature_cache(self):
+        cache = SignatureCache(max_bytes=None, max_entries=2)
+        first = self.sign(b"blob", signature_cache=cache, deterministic=True)
+        with profiling.profiling() as profile:
+            sig = bytearray(SPX_BYTES)
+            siglen = [0]
+            crypto_sign_signature(
+                sig,
+                siglen,
+                MessageSource(io.BytesIO(b"blob")),
+                0,
+                self.sk,
+                signature_cache=cache,
+            )
+        self.assertEqual((sig, siglen[0]), (first, SPX_BYTES))
+        self.assertEqual(dict(profile.thash_calls), {})
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        self.sign(b"a", signature_cache=cache)
+        self.sign(b"b", signature_cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(self.pk, message_digest(b"blob", 4)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,40 +1,188 @@
-# import unittest
-# from spx.fors import fors_sign, fors_pk_from_sig, message_to_indices
-# from spx.constant import (
-#     SPX_FORS_BYTES,
-#     SPX_FORS_PK_BYTES,
-#     SPX_FORS_TREES,
-#     SPX_FORS_HEIGHT,
-#     SPX_N,
-# )
-# from spx.address import Address, AddrType
-# import os
-
-
-# class TestFORS(unittest.TestCase):
-#     def setUp(self):
-#         self.sk_seed = os.urandom(SPX_N)
-#         self.pub_seed = os.urandom(SPX_N)
-#         self.m = os.urandom((SPX_FORS_HEIGHT * SPX_FORS_TREES + 7) // 8)
-#         self.fors_addr = Address()
-#         self.sig = bytearray(SPX_FORS_BYTES)
-#         self.pk = bytearray(SPX_FORS_PK_BYTES)
-#         self.indices = bytearray(SPX_FORS_TREES)
-#         message_to_indices(self.indices, self.m)
-
-#     def test_fors_sign(self):
-#         fors_sign(
-#             self.sig, self.pk, self.m, self.sk_seed, self.pub_seed, self.fors_addr
-#         )
-#         # Verify that the signature is correctly generated
-#         self.assertEqual(len(self.sig), SPX_FORS_BYTES)
-#         self.assertEqual(len(self.pk), SPX_FORS_PK_BYTES)
-
-#     def test_fors_pk_from_sig(self):
-#         fors_sign(
-#             self.sig, self.pk, self.m, self.sk_seed, self.pub_seed, self.fors_addr
-#         )
-#         derived_pk = bytearray(SPX_FORS_PK_BYTES)
-#         fors_pk_from_sig(derived_pk, self.sig, self.m, self.pub_seed, self.fors_addr)
-#         # Verify that the derived public key matches the original public key
-#         self.assertEqual(derived_pk, self.pk)
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest import mock
+
+from spx.fors import (
+    fors_gen_leaf,
+    fors_gen_leaves,
+    fors_sign,
+    fors_sign_tree,
+    fors_sign_trees,
+    fors_pk_from_sig,
+    fors_tree_groups,
+    message_to_indices,
+)
+from spx.utils import seed_state, treehash, treehash_levels
+from spx.constant import (
+    SPX_FORS_BYTES,
+    SPX_FORS_PK_BYTES,
+    SPX_FORS_TREES,
+    SPX_FORS_HEIGHT,
+    SPX_N,
+)
+from spx.address import Address, AddrType
+import os
+
+
+class TestFORS(unittest.TestCase):
+    def setUp(self):
+        self.sk_seed = os.urandom(SPX_N)
+        self.pub_seed = os.urandom(SPX_N)
+        seed_state(self.pub_seed)
+        self.m = os.urandom((SPX_FORS_HEIGHT * SPX_FORS_TREES + 7) // 8)
+        self.fors_addr = Address()
+        self.sig = bytearray(SPX_FORS_BYTES)
+        self.pk = bytearray(SPX_FORS_PK_BYTES)
+        self.indices = bytearray(SPX_FORS_TREES)
+        message_to_indices(self.indices, self.m)
+
+    def test_fors_sign(self):
+        fors_sign(
+            self.sig, self.pk, self.m, self.sk_seed, self.pub_seed, self.fors_addr
+        )
+        # Verify that the signature is correctly generated
+        self.assertEqual(len(self.sig), SPX_FORS_BYTES)
+        self.assertEqual(len(self.pk), SPX_FORS_PK_BYTES)
+
+    def test_fors_pk_from_sig(self):
+        fors_sign(
+            self.sig, self.pk, self.m, self.sk_seed, self.pub_seed, self.fors_addr
+        )
+        derived_pk = bytearray(SPX_FORS_PK_BYTES)
+        fors_pk_from_sig(derived_pk, self.sig, self.m, self.pub_seed, self.fors_addr)
+        # Verify that the derived public key matches the original public key
+        self.assertEqual(derived_pk, self.pk)
+
+    def test_parallel_fors(self):
+        fors_sign(
+            self.sig, self.pk, self.m, self.sk_seed, self.pub_seed, self.fors_addr
+        )
+        for pool in (ThreadPoolExecutor(max_workers=4), ProcessPoolExecutor(2)):
+            with pool, mock.patch("spx.fors.fors_sign_tree") as sign_tree:
+                sig = bytearray(SPX_FORS_BYTES)
+                pk = bytearray(SPX_FORS_PK_BYTES)
+                fors_sign(
+                    sig,
+                    pk,
+                    self.m,
+                    self.sk_seed,
+                    self.pub_seed,
+                    self.fors_addr,
+                    executor=pool,
+                )
+                self.assertEqual(sig, self.sig)
+                self.assertEqual(pk, self.pk)
+                # Trees are signed in batched groups, not one by one.
+                sign_tree.assert_not_called()
+
+                derived_pk = bytearray(SPX_FORS_PK_BYTES)
+                fors_pk_from_sig(
+                    derived_pk,
+                    self.sig,
+                    self.m,
+                    self.pub_seed,
+                    self.fors_addr,
+                    executor=pool,
+                )
+                self.assertEqual(derived_pk, self.pk)
+
+    def test_fors_tree_groups(self):
+        self.assertEqual(fors_tree_groups(33, 1), [(0, 33)])
+        self.assertEqual(fors_tree_groups(33, 4), [(0, 9), (9, 18), (18, 27), (27, 33)])
+        self.assertEqual(fors_tree_groups(2, 4), [(0, 1), (1, 2)])
+        with mock.patch("spx.fors.SPX_FORS_BATCH_LEAVES", 3 << SPX_FORS_HEIGHT):
+            self.assertEqual(fors_tree_groups(7, 1), [(0, 3), (3, 6), (6, 7)])
+
+
+class TestFORSLeaves(unittest.TestCase):
+    def setUp(self):
+        self.sk_seed = bytes(i for i in range(SPX_N))
+        self.pub_seed = bytes(i for i in range(SPX_N, 2 * SPX_N))
+        seed_state(self.pub_seed)
+        self.fors_tree_addr = Address()
+        self.fors_tree_addr.set_tree_addr(99)
+        self.fors_tree_addr.set_keypair_addr(5)
+        self.fors_tree_addr.set_type(AddrType.FORS_TREE)
+
+    def test_fors_gen_leaves(self):
+        leaves = bytearray(8 * SPX_N)
+        fors_gen_leaves(leaves, self.sk_seed, self.pub_seed, 64, 8, self.fors_tree_addr)
+        for i in range(8):
+            leaf = bytearray(SPX_N)
+            fors_gen_leaf(
+                leaf, self.sk_seed, self.pub_seed, 64 + i, self.fors_tree_addr
+            )
+            self.assertEqual(leaves[i * SPX_N : (i + 1) * SPX_N], leaf)
+
+    def test_treehash_levels_fors(self):
+        idx_offset = 2 * (1 << SPX_FORS_HEIGHT)
+        root = bytearray(SPX_N)
+        auth_path = bytearray(SPX_FORS_HEIGHT * SPX_N)
+        treehash(
+            root,
+            auth_path,
+            self.sk_seed,
+            self.pub_seed,
+            13,
+            idx_offset,
+            SPX_FORS_HEIGHT,
+            fors_gen_leaf,
+            self.fors_tree_addr,
+        )
+
+        levels_root = bytearray(SPX_N)
+        levels_auth_path = bytearray(SPX_FORS_HEIGHT * SPX_N)
+        treehash_levels(
+            levels_root,
+            levels_auth_path,
+            self.sk_seed,
+            self.pub_seed,
+            13,
+            idx_offset,
+            SPX_FORS_HEIGHT,
+            fors_gen_leaves,
+            self.fors_tree_addr,
+        )
+        self.assertEqual(levels_root, root)
+        self.assertEqual(levels_auth_path, auth_path)
+
+    def test_fors_sign_trees(self):
+        tree_bytes = (SPX_FORS_HEIGHT + 1) * SPX_N
+        indices = [0, 13, (1 << SPX_FORS_HEIGHT) - 1]
+        sig = bytearray(3 * tree_bytes)
+        roots = bytearray(3 * SPX_N)
+        fors_sign_trees(
+            sig, roots, self.sk_seed, self.pub_seed, 4, indices, self.fors_tree_addr
+        )
+        for i, index in enumerate(indices):
+            tree_sig = bytearray(tree_bytes)
+            root = bytearray(SPX_N)
+            fors_sign_tree(
+                tree_sig,
+                root,
+                self.sk_seed,
+                self.pub_seed,
+                4 + i,
+                index,
+                self.fors_tree_addr,
+            )
+            self.assertEqual(sig[i * tree_bytes : (i + 1) * tree_bytes], tree_sig)
+            self.assertEqual(roots[i * SPX_N : (i + 1) * SPX_N], root)
+
+    def test_fors_sign_groups(self):
+        m = bytes(range(1, (SPX_FORS_HEIGHT * SPX_FORS_TREES + 7) // 8 + 1))
+        sig = bytearray(SPX_FORS_BYTES)
+        pk = bytearray(SPX_FORS_PK_BYTES)
+        fors_sign(sig, pk, m, self.sk_seed, self.pub_seed, self.fors_tree_addr)
+        # Groups of 5 trees, the last one shorter.
+        with mock.patch("spx.fors.SPX_FORS_BATCH_LEAVES", 5 << SPX_FORS_HEIGHT):
+            group_sig = bytearray(SPX_FORS_BYTES)
+            group_pk = bytearray(SPX_FORS_PK_BYTES)
+            fors_sign(
+                group_sig, group_pk, m, self.sk_seed, self.pub_seed, self.fors_tree_addr
+            )
+        self.assertEqual((group_sig, group_pk), (sig, pk))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from spx import profiling
+from spx.address import Address
+from spx.cache import SubtreeCache
+from spx.constant import *  # Import all constants from spx.constant
+from spx.keyfile import SPX_KEY_FILE_HEADER, KeyFile, write_key_file
+from spx.params import PARAM_SETS, SPX_DEFAULT_PARAMS
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_signature
+from spx.utils import HASH_BACKENDS, seed_state, seeded_midstates
+
+
+class TestKeyFile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        cls.top_tree = crypto_sign_seed_keypair(
+            cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)), keep_top_tree=True
+        )
+        cls.cache = SubtreeCache()
+        cls.sig = bytearray(SPX_BYTES)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(
+                cls.sig, [0], b"m", 1, cls.sk, subtree_cache=cls.cache
+            )
+
+    def setUp(self):
+        out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(out_dir.cleanup)
+        self.path = os.path.join(out_dir.name, "key.spx")
+
+    def test_sign_from_key_file(self):
+        write_key_file(self.path, self.sk, self.top_tree, self.cache)
+        with KeyFile(self.path) as key_file:
+            self.assertEqual(key_file.sk, self.sk)
+            self.assertEqual(key_file.pk, self.pk)
+            self.assertEqual(len(key_file.subtree_cache.pinned), len(self.cache))
+            # The nodes are read from the mapping, not copied.
+            self.assertIs(key_file.top_tree.heap.obj, key_file.mmap)
+
+            # Another key is seeded, so loading must restore the midstate.
+            seed_state(bytes(SPX_N))
+            sig = bytearray(SPX_BYTES)
+            with profiling.profiling() as profile:
+                with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+                    key_file.sign(sig, [0], b"m", 1)
+        self.assertEqual(sig, self.sig)
+        # Every subtree came from the file: nothing was built or seeded.
+        self.assertEqual(profile.counters["subtree_misses"], 0)
+        self.assertNotIn(SPX_WOTS_LEN, profile.thash_calls)
+        self.assertEqual(
+            profile.compressions["sha256"],
+            sum(
+                count * profiling.thash_compressions(SPX_DEFAULT_PARAMS, k)[1]
+                for k, count in profile.thash_calls.items()
+            ),
+        )
+
+    def test_subtree_cache_limit(self):
+        write_key_file(self.path, self.sk, self.top_tree, self.cache)
+        subtree_bytes = ((2 << SPX_TREE_HEIGHT) - 1) * SPX_N
+        with KeyFile(self.path, subtree_cache_bytes=4 * subtree_bytes) as key_file:
+            cache = key_file.subtree_cache
+            sig = bytearray(SPX_BYTES)
+            for i in range(3):
+                key_file.sign(sig, [0], bytes([i]), 1)
+            # New subtrees are evicted, the stored ones stay.
+            self.assertLessEqual(cache.nbytes, 4 * subtree_bytes)
+            self.assertGreater(cache.evictions, 0)
+            self.assertEqual(len(cache.pinned), len(self.cache))
+            self.assertEqual(cache.stats()["pinned"], len(self.cache))
+
+            # Writing it again keeps both parts.
+            copy = os.path.join(os.path.dirname(self.path), "copy.spx")
+            write_key_file(copy, self.sk, self.top_tree, cache)
+            with KeyFile(copy) as copied:
+                self.assertEqual(
+                    len(copied.subtree_cache.pinned), len(cache.subtrees())
+                )
+            # Views into the mapping must be gone before it is closed.
+            del cache
+
+    def test_without_precomputed_nodes(self):
+        write_key_file(self.path, self.sk)
+        with KeyFile(self.path) as key_file:
+            self.assertIsNone(key_file.top_tree)
+            sig = bytearray(SPX_BYTES)
+            with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+                key_file.sign(sig, [0], b"m", 1)
+        self.assertEqual(sig, self.sig)
+
+    def test_midstates_load(self):
+        params = PARAM_SETS["sha512-192f"]
+        pub_seed = bytes(range(params.n))
+        midstates = seeded_midstates(pub_seed, params)
+        self.assertEqual(len(midstates), 96)
+        seed_state(pub_seed, params)
+        expected = {
+            name: bytearray(params.n) for name in ("reference", "hashlib", "numpy")
+        }
+        addr = Address()
+        for name, out in expected.items():
+            HASH_BACKENDS[name].thash(out, bytes(2 * params.n), 2, pub_seed, addr)
+
+        seed_state(bytes(SPX_N))
+        seed_state(pub_seed, params, midstates)
+        for name, out in expected.items():
+            loaded = bytearray(params.n)
+            HASH_BACKENDS[name].thash(loaded, bytes(2 * params.n), 2, pub_seed, addr)
+            self.assertEqual(loaded, out)
+        self.assertEqual(seeded_midstates(pub_seed, PARAM_SETS["shake256-128f"]), b"")
+        seed_state(bytes(SPX_N))
+
+    def test_rejects_bad_files(self):
+        write_key_file(self.path, self.sk, self.top_tree)
+        with open(self.path, "rb") as f:
+            data = bytearray(f.read())
+
+        cases = {
+            "not a key file": b"XXXX" + data[4:],
+            "version": data[:4] + bytes([9]) + data[5:],
+            "bytes": data[:-1],
+        }
+        # The root is the second node of the top tree heap.
+        root = SPX_KEY_FILE_HEADER.size + SPX_SK_BYTES + 32 + SPX_N
+        cases["root"] = data[:root] + bytes(SPX_N) + data[root + SPX_N :]
+        for message, corrupt in cases.items():
+            with open(self.path, "wb") as f:
+                f.write(corrupt)
+            with self.assertRaisesRegex(ValueError, message):
+                KeyFile(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import pickle
+import unittest
+from unittest import mock
+
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import PARAM_SETS, SPX_DEFAULT_PARAMS, ParamSet, get_params
+from spx.sign import (
+    crypto_sign_open,
+    crypto_sign,
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+)
+from spx.address import Address
+from spx.utils import (
+    HASH_BACKENDS,
+    seed_state,
+    thash_lanes,
+    thash_many,
+    use_hash_backend,
+)
+from spx.verify import verify_many
+from spx.wots import chain_lengths
+
+
+class TestParamSet(unittest.TestCase):
+    def test_default_matches_constants(self):
+        params = SPX_DEFAULT_PARAMS
+        self.assertEqual(params.n, SPX_N)
+        self.assertEqual(params.wots_len, SPX_WOTS_LEN)
+        self.assertEqual(params.wots_bytes, SPX_WOTS_BYTES)
+        self.assertEqual(params.fors_bytes, SPX_FORS_BYTES)
+        self.assertEqual(params.bytes, SPX_BYTES)
+        self.assertEqual(params.pk_bytes, SPX_PK_BYTES)
+        self.assertEqual(params.sk_bytes, SPX_SK_BYTES)
+        self.assertEqual(params.seed_bytes, CRYPTO_SEEDBYTES)
+        self.assertEqual(params.wots_offsets[0], SPX_N + SPX_FORS_BYTES)
+        self.assertEqual(params.auth_offsets[-1] + SPX_TREE_HEIGHT * SPX_N, SPX_BYTES)
+
+    def test_sizes(self):
+        # Signature sizes of the round 3 specification.
+        expected = {
+            "128s": 7856,
+            "128f": 17088,
+            "192s": 16224,
+            "192f": 35664,
+            "256s": 29792,
+            "256f": 49856,
+        }
+        for name, size in expected.items():
+            self.assertEqual(PARAM_SETS[name].bytes, size)
+
+    def test_chain_lengths_tables(self):
+        for params in PARAM_SETS.values():
+            for _ in range(20):
+                msg = os.urandom(params.n)
+                lengths = bytearray(params.wots_len)
+                chain_lengths(lengths, msg, params)
+                self.assertEqual(bytes(params.chain_lengths(msg)), lengths)
+        # The reference base_w and wots_checksum path agrees with the tables.
+        from spx.wots import base_w, wots_checksum
+
+        msg = os.urandom(SPX_N)
+        digits = base_w(msg, SPX_WOTS_LEN1)
+        self.assertEqual(
+            bytes(SPX_DEFAULT_PARAMS.chain_lengths(msg)),
+            bytes(digits + wots_checksum(digits)),
+        )
+
+    def test_layer_addr_templates(self):
+        templates = SPX_DEFAULT_PARAMS.layer_addr_templates
+        self.assertEqual(templates.shape, (SPX_D, SPX_SHA256_ADDR_BYTES))
+        self.assertEqual(list(templates[:, SPX_OFFSET_LAYER]), list(range(SPX_D)))
+        with self.assertRaises(ValueError):
+            templates[0, 0] = 1
+
+    def test_get_params(self):
+        self.assertIs(get_params("192F"), PARAM_SETS["192f"])
+        self.assertIs(get_params(SPX_DEFAULT_PARAMS), SPX_DEFAULT_PARAMS)
+        with self.assertRaises(ValueError):
+            get_params("512f")
+        with self.assertRaises(ValueError):
+            ParamSet(
+                "bad",
+                n=16,
+                full_height=66,
+                d=22,
+                fors_height=6,
+                fors_trees=33,
+                wots_w=4,
+            )
+
+    def test_pickle(self):
+        params = PARAM_SETS["256s"]
+        self.assertIs(pickle.loads(pickle.dumps(params)), params)
+        custom = ParamSet("x", n=16, full_height=20, d=5, fors_height=4, fors_trees=8)
+        self.assertEqual(pickle.loads(pickle.dumps(custom)).bytes, custom.bytes)
+
+
+class TestOtherParamSet(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.params = PARAM_SETS["192f"]
+        cls.pk = bytearray(cls.params.pk_bytes)
+        cls.sk = bytearray(cls.params.sk_bytes)
+        crypto_sign_seed_keypair(
+            cls.pk, cls.sk, bytes(range(cls.params.seed_bytes)), params=cls.params
+        )
+        cls.m = b"192f message"
+
+    def sign(self, m):
+        sig = bytearray(self.params.bytes)
+        siglen = [0]
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(sig, siglen, m, len(m), self.sk, params=self.params)
+        self.assertEqual(siglen[0], self.params.bytes)
+        return sig
+
+    def test_sign_verify(self):
+        params = self.params
+        self.assertEqual((len(self.pk), len(self.sk)), (48, 96))
+        sig = self.sign(self.m)
+        self.assertEqual(
+            crypto_sign_verify(sig, params.bytes, self.m, len(self.m), self.pk, params),
+            0,
+        )
+        # The default parameter set rejects it.
+        self.assertEqual(
+            crypto_sign_verify(sig, params.bytes, self.m, len(self.m), self.pk), -1
+        )
+        sig[params.wots_offsets[3]] ^= 1
+        self.assertEqual(
+            crypto_sign_verify(sig, params.bytes, self.m, len(self.m), self.pk, params),
+            -1,
+        )
+
+    def test_backends_agree(self):
+        params = self.params
+        pub_seed = self.pk[: params.n]
+        addrs = [Address() for _ in range(3)]
+        for i, addr in enumerate(addrs):
+            addr.set_keypair_addr(300 + i)
+        for inblocks in params.thash_paddings:
+            inputs = os.urandom(len(addrs) * inblocks * params.n)
+            outputs = set()
+            for name in HASH_BACKENDS:
+                with use_hash_backend(name):
+                    seed_state(pub_seed, params)
+                    outs = bytearray(len(addrs) * params.n)
+                    thash_many(outs, inputs, inblocks, pub_seed, addrs)
+                    outputs.add(bytes(outs))
+                    lanes = bytearray(len(addrs) * params.n)
+                    thash_lanes(lanes, inputs, inblocks, [pub_seed] * 3, addrs, params)
+                    outputs.add(bytes(lanes))
+            self.assertEqual(len(outputs), 1)
+
+    def test_sign_open_and_verify_many(self):
+        sm = bytearray()
+        smlen = [0]
+        crypto_sign(sm, smlen, self.m, len(self.m), self.sk, params=self.params)
+        m = bytearray()
+        mlen = [0]
+        self.assertEqual(
+            crypto_sign_open(m, mlen, sm, smlen[0], self.pk, self.params), 0
+        )
+        self.assertEqual(m, self.m)
+
+        sig = bytes(sm[: self.params.bytes])
+        items = [(self.m, sig, self.pk), (b"other", sig, self.pk)]
+        self.assertEqual(verify_many(items, self.params), [True, False])
+        self.assertEqual(verify_many(items), [False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from spx import profiling
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import PARAM_SETS, SPX_DEFAULT_PARAMS
+from spx.profiling import Profile, phase, thash_compressions
+from spx.cache import SubtreeCache
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_signature
+from spx.utils import seed_state
+
+
+class TestProfiling(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+
+    def test_thash_compressions(self):
+        self.assertEqual(thash_compressions(SPX_DEFAULT_PARAMS, 1), ("sha256", 1))
+        self.assertEqual(thash_compressions(SPX_DEFAULT_PARAMS, 2), ("sha256", 1))
+        self.assertEqual(
+            thash_compressions(SPX_DEFAULT_PARAMS, SPX_WOTS_LEN), ("sha256", 10)
+        )
+        self.assertEqual(thash_compressions(PARAM_SETS["sha512-192f"], 1)[0], "sha256")
+        self.assertEqual(
+            thash_compressions(PARAM_SETS["sha512-192f"], 2), ("sha512", 1)
+        )
+        self.assertEqual(
+            thash_compressions(PARAM_SETS["shake256-128f"], 1), ("shake256", 1)
+        )
+
+    def test_sign_counts(self):
+        sig = bytearray(SPX_BYTES)
+        # Another key is seeded, so signing compresses the pub_seed block again.
+        seed_state(bytes(SPX_N))
+        with profiling.profiling() as profile:
+            crypto_sign_signature(
+                sig, [0], b"m", 1, self.sk, subtree_cache=SubtreeCache()
+            )
+        self.assertIsNone(profiling.active_profile)
+
+        # Every FORS tree and hypertree subtree is built in this process.
+        calls = profile.as_dict()["thash_calls"]
+        self.assertEqual(calls[SPX_FORS_TREES], 1)
+        self.assertEqual(calls[SPX_WOTS_LEN], SPX_D << SPX_TREE_HEIGHT)
+        self.assertEqual(
+            calls[2],
+            SPX_FORS_TREES * ((1 << SPX_FORS_HEIGHT) - 1)
+            + SPX_D * ((1 << SPX_TREE_HEIGHT) - 1),
+        )
+        self.assertEqual(
+            profile.compressions["sha256"],
+            sum(
+                count * thash_compressions(SPX_DEFAULT_PARAMS, inblocks)[1]
+                for inblocks, count in calls.items()
+            )
+            + 1,
+        )
+
+        phases = profile.as_dict()["phases"]
+        for name in ("PRF_msg", "H_msg", "FORS", "layer0-wots", "layer0-treehash"):
+            self.assertEqual(phases[name]["calls"], 1)
+        self.assertIn(f"layer{SPX_D - 1}-treehash", phases)
+        self.assertEqual(profile.counters["subtree_misses"], SPX_D)
+
+    def test_allocations(self):
+        peaks = []
+        # The first signature also fills lazy imports and caches.
+        for m in (b"warm-up", b"m", bytes(1 << 20)):
+            sig = bytearray(SPX_BYTES)
+            with profiling.profiling(allocations=True) as profile:
+                crypto_sign_signature(
+                    sig, [0], m, len(m), self.sk, subtree_cache=SubtreeCache()
+                )
+            peaks.append(profile.phase_peak_bytes)
+        peaks = peaks[1:]
+        self.assertIn(("phase_peak_bytes", "FORS", peaks[1]["FORS"]), profile.rows())
+
+        # A 1 MiB message is hashed without being copied.
+        for name in ("PRF_msg", "H_msg"):
+            self.assertLess(peaks[1][name], 1 << 16)
+        # Everything else allocates about the same whatever is signed.
+        for name in ("FORS", "layer0-treehash", "layer0-wots"):
+            self.assertLess(abs(peaks[0][name] - peaks[1][name]), peaks[0][name] / 4)
+
+    def test_disabled(self):
+        self.assertIs(phase("FORS"), profiling.NO_PHASE)
+        sig = bytearray(SPX_BYTES)
+        crypto_sign_signature(sig, [0], b"m", 1, self.sk)
+        self.assertIsNone(profiling.active_profile)
+
+    def test_export(self):
+        profile = Profile()
+        with profiling.profiling(profile) as inner:
+            self.assertIs(inner, profile)
+            with phase("FORS"):
+                pass
+            profile.count_thash(SPX_DEFAULT_PARAMS, 1, 3)
+            profile.count("subtree_hits")
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "profile.csv")
+            profile.to_csv(path)
+            with open(path, newline="") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], list(profiling.SPX_PROFILE_FIELDS))
+        self.assertIn(["thash_calls", "1", "3"], rows)
+        self.assertIn(["compressions", "sha256", "3"], rows)
+        self.assertIn(["counter", "subtree_hits", "1"], rows)
+        self.assertIn(["phase_calls", "FORS", "1"], rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from spx.cache import SubtreeCache
+from spx.constant import *  # Import all constants from spx.constant
+from spx.keyfile import write_key_file
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.service import (
+    SPX_OP_SIGN,
+    ServiceClient,
+    ServiceError,
+    SigningService,
+    generate_load,
+)
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_verify
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        top_tree = crypto_sign_seed_keypair(
+            cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)), keep_top_tree=True
+        )
+        cls.out_dir = tempfile.TemporaryDirectory()
+        cls.key_path = os.path.join(cls.out_dir.name, "key.spx")
+        write_key_file(cls.key_path, cls.sk, top_tree, SubtreeCache())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.out_dir.cleanup()
+
+    async def asyncSetUp(self):
+        self.path = os.path.join(self.out_dir.name, "spx.sock")
+        self.cache_bytes = 4 * ((2 << SPX_TREE_HEIGHT) - 1) * SPX_N
+        self.service = SigningService(
+            {"main": self.key_path},
+            workers=1,
+            max_delay=0.05,
+            max_queue=2,
+            subtree_cache_bytes=self.cache_bytes,
+        )
+        await self.service.start(self.path)
+        self.client = await ServiceClient.connect(self.path)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        if not self.service.draining:
+            await self.service.drain()
+
+    async def test_sign_and_verify(self):
+        params, pk = await self.client.public_key("main")
+        self.assertIs(params, SPX_DEFAULT_PARAMS)
+        self.assertEqual(pk, self.pk)
+
+        messages = [bytes([i]) * 8 for i in range(6)]
+        sigs = await asyncio.gather(
+            *(self.client.sign("main", message) for message in messages)
+        )
+        for message, sig in zip(messages, sigs):
+            self.assertEqual(crypto_sign_verify(sig, SPX_BYTES, message, 8, pk), 0)
+
+        valid = await asyncio.gather(
+            self.client.verify(messages[0], sigs[0], pk, params),
+            self.client.verify(messages[1], sigs[0], pk, params),
+        )
+        self.assertEqual(valid, [True, False])
+
+        stats = await self.client.stats()
+        self.assertEqual(stats["requests"], 10)
+        # Requests were batched, and the queue never held more than max_queue.
+        self.assertLess(stats["batches"], 8)
+        self.assertLessEqual(stats["max_queue_depth"], 2)
+        # The worker's subtree cache stays within its limit.
+        self.assertLessEqual(stats["subtree_cache_bytes"], self.cache_bytes)
+        self.assertGreater(stats["subtree_cache_evictions"], 0)
+
+    async def test_errors(self):
+        with self.assertRaisesRegex(ServiceError, "unknown key"):
+            await self.client.sign("other", b"m")
+        with self.assertRaisesRegex(ServiceError, "unknown op"):
+            await self.client.request(9)
+        with self.assertRaisesRegex(ServiceError, "truncated"):
+            await self.client.request(SPX_OP_SIGN, b"\x09main")
+        self.assertEqual((await self.client.stats())["errors"], 3)
+
+    async def test_failed_request_keeps_batch(self):
+        # The workers never opened "ghost", so signing with it fails there.
+        self.service.keys["ghost"] = self.service.keys["main"]
+        failed, sig = await asyncio.gather(
+            self.client.sign("ghost", b"m"),
+            self.client.sign("main", b"m"),
+            return_exceptions=True,
+        )
+        self.assertIsInstance(failed, ServiceError)
+        self.assertIn("sign failed", str(failed))
+        self.assertEqual(crypto_sign_verify(sig, SPX_BYTES, b"m", 1, self.pk), 0)
+        stats = await self.client.stats()
+        self.assertEqual((stats["batches"], stats["errors"]), (1, 1))
+
+    async def test_drain(self):
+        pending = [
+            asyncio.ensure_future(self.client.sign("main", bytes([i])))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        await self.service.drain()
+        for sig in await asyncio.gather(*pending):
+            self.assertEqual(len(sig), SPX_BYTES)
+        self.assertEqual(self.service.stats()["queue_depth"], 0)
+        # Every task of the service finished before the pool was shut down.
+        self.assertTrue(self.service.batcher.done())
+        self.assertEqual((self.service.handlers, self.service.batches), (set(), set()))
+        with self.assertRaises((ServiceError, ConnectionError)):
+            await ServiceClient.connect(self.path)
+
+    async def test_generate_load(self):
+        result = await generate_load(self.client, "main", 4, concurrency=2)
+        self.assertEqual(result.label, "128F-service-sign")
+        self.assertEqual(len(result.latencies), 4)
+        self.assertTrue((result.latencies > 0).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import hashlib
+import os
+import unittest
+
+import numpy as np
+
+from spx.address import Address
+from spx.sha256x import sha256x_inc_finalize
+from spx.utils import IV_256, seed_state, thash, thash_many, SPX_N
+
+
+class TestSHA256x(unittest.TestCase):
+    def test_sha256x_matches_hashlib(self):
+        iv = np.frombuffer(IV_256, dtype=">u4").astype(np.uint32)
+        for inlen in (0, 3, 55, 56, 64, 119, 150):
+            msgs = [os.urandom(inlen) for _ in range(5)]
+            in_data = np.frombuffer(b"".join(msgs), dtype=np.uint8).reshape(5, inlen)
+            digests = sha256x_inc_finalize(iv, 0, in_data)
+            for lane, msg in enumerate(msgs):
+                self.assertEqual(digests[lane].tobytes(), hashlib.sha256(msg).digest())
+
+    def test_thash_many(self):
+        pub_seed = bytes(i for i in range(16))
+        seed_state(pub_seed)
+
+        for inblocks in (1, 2, 35):
+            addrs = []
+            for i in range(7):
+                addr = Address()
+                addr.set_tree_addr(i * 1000)
+                addr.set_chain_addr(i)
+                addr.set_hash_addr(3)
+                addrs.append(addr)
+            inputs = os.urandom(len(addrs) * inblocks * SPX_N)
+
+            outs = bytearray(len(addrs) * SPX_N)
+            thash_many(outs, inputs, inblocks, pub_seed, addrs)
+
+            for i, addr in enumerate(addrs):
+                expected = bytearray(SPX_N)
+                thash(
+                    expected,
+                    inputs[i * inblocks * SPX_N : (i + 1) * inblocks * SPX_N],
+                    inblocks,
+                    pub_seed,
+                    addr,
+                )
+                self.assertEqual(outs[i * SPX_N : (i + 1) * SPX_N], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from spx.address import Address
+from spx.params import PARAM_SETS
+from spx.sha512x import IV_512, sha512x_inc_finalize
+from spx.sign import (
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+    hash_message,
+    mgf1,
+)
+from spx.utils import (
+    HASH_BACKENDS,
+    prf_addrs,
+    seed_state,
+    thash,
+    thash_lanes,
+    thash_many,
+    use_hash_backend,
+)
+from spx.verify import verify_many
+
+PARAMS = PARAM_SETS["sha512-192f"]
+
+
+class TestSHA512x(unittest.TestCase):
+    def test_sha512x_matches_hashlib(self):
+        for inlen in (0, 3, 111, 112, 128, 239, 300):
+            msgs = [os.urandom(inlen) for _ in range(5)]
+            in_data = np.frombuffer(b"".join(msgs), dtype=np.uint8).reshape(5, inlen)
+            digests = sha512x_inc_finalize(IV_512, 0, in_data)
+            for lane, msg in enumerate(msgs):
+                self.assertEqual(digests[lane].tobytes(), hashlib.sha512(msg).digest())
+
+
+class TestSHA512Thash(unittest.TestCase):
+    def setUp(self):
+        self.pub_seed = os.urandom(PARAMS.n)
+        self.addrs = [Address() for _ in range(3)]
+        for i, addr in enumerate(self.addrs):
+            addr.set_keypair_addr(300 + i)
+            addr.set_tree_index(5 * i)
+
+    def test_thash(self):
+        n = PARAMS.n
+        seed_state(self.pub_seed, PARAMS)
+        for inblocks, hash_fn, block in (
+            (1, hashlib.sha256, 64),
+            (2, hashlib.sha512, 128),
+        ):
+            inputs = os.urandom(inblocks * n)
+            out = bytearray(n)
+            thash(out, inputs, inblocks, self.pub_seed, self.addrs[0])
+            expected = hash_fn(
+                self.pub_seed + bytes(block - n) + bytes(self.addrs[0].view()) + inputs
+            ).digest()[:n]
+            self.assertEqual(bytes(out), expected)
+
+    def test_round_3_1_prf_and_h_msg(self):
+        n = PARAMS.n
+        sk_seed = os.urandom(n)
+        addr = bytes(self.addrs[0].view())
+        expected = hashlib.sha256(self.pub_seed + bytes(64 - n) + addr + sk_seed)
+        # The PRF takes its pub_seed as an argument, whatever key is seeded.
+        seed_state(os.urandom(n), PARAMS)
+        self.assertEqual(
+            prf_addrs(sk_seed, self.addrs[:1], PARAMS, self.pub_seed),
+            expected.digest()[:n],
+        )
+        with self.assertRaisesRegex(ValueError, "pub_seed"):
+            prf_addrs(sk_seed, self.addrs[:1], PARAMS)
+        seed_state(self.pub_seed, PARAMS)
+
+        R = os.urandom(n)
+        pk = self.pub_seed + os.urandom(n)
+        seed = R + self.pub_seed + hashlib.sha512(R + pk + b"m").digest()
+        expected = bytearray(PARAMS.dgst_bytes)
+        mgf1(expected, len(expected), seed, len(seed), hashlib.sha512)
+        digest = bytearray(PARAMS.fors_msg_bytes)
+        hash_message(digest, [0], [0], R, pk, b"m", 1, PARAMS)
+        self.assertEqual(digest, expected[: PARAMS.fors_msg_bytes])
+
+    def test_backends_agree(self):
+        n = PARAMS.n
+        for inblocks in PARAMS.thash_paddings:
+            inputs = os.urandom(len(self.addrs) * inblocks * n)
+            outputs = set()
+            for name in HASH_BACKENDS:
+                with use_hash_backend(name):
+                    seed_state(self.pub_seed, PARAMS)
+                    outs = bytearray(len(self.addrs) * n)
+                    thash_many(outs, inputs, inblocks, self.pub_seed, self.addrs)
+                    outputs.add(bytes(outs))
+                    lanes = bytearray(len(self.addrs) * n)
+                    seeds = [self.pub_seed] * len(self.addrs)
+                    thash_lanes(lanes, inputs, inblocks, seeds, self.addrs, PARAMS)
+                    outputs.add(bytes(lanes))
+            self.assertEqual(len(outputs), 1)
+
+
+class TestSHA512Sign(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(PARAMS.pk_bytes)
+        cls.sk = bytearray(PARAMS.sk_bytes)
+        crypto_sign_seed_keypair(
+            cls.pk, cls.sk, bytes(range(PARAMS.seed_bytes)), params=PARAMS
+        )
+        cls.m = b"sha512 message"
+        cls.sig = bytearray(PARAMS.bytes)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(
+                cls.sig, [0], cls.m, len(cls.m), cls.sk, params=PARAMS
+            )
+
+    def test_sign_verify(self):
+        sig = bytearray(self.sig)
+        self.assertEqual(
+            crypto_sign_verify(sig, PARAMS.bytes, self.m, len(self.m), self.pk, PARAMS),
+            0,
+        )
+        # The SHA-256 set of the same shape rejects it.
+        sha256 = PARAM_SETS["192f"]
+        self.assertEqual(
+            crypto_sign_verify(sig, sha256.bytes, self.m, len(self.m), self.pk, sha256),
+            -1,
+        )
+        sig[PARAMS.auth_offsets[2]] ^= 1
+        self.assertEqual(
+            crypto_sign_verify(sig, PARAMS.bytes, self.m, len(self.m), self.pk, PARAMS),
+            -1,
+        )
+
+    def test_verify_many(self):
+        sig = bytes(self.sig)
+        items = [(self.m, sig, self.pk), (b"other", sig, self.pk)]
+        self.assertEqual(verify_many(items, PARAMS), [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import unittest
+from unittest import mock
+
+from spx.address import Address, AddrType, address_batch
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import PARAM_SETS, SPX_DEFAULT_PARAMS
+from spx.sign import (
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+)
+from spx.utils import (
+    full_addr_rows,
+    get_hash_backend,
+    prf_addrs,
+    seed_state,
+    thash,
+    thash_lanes,
+    thash_many,
+    use_hash_backend,
+)
+from spx.verify import verify_many
+
+PARAMS = PARAM_SETS["shake256-128f"]
+
+
+class TestShakeAddress(unittest.TestCase):
+    def test_full_addr_rows(self):
+        addr = Address()
+        addr.set_layer_addr(0x12)
+        addr.set_tree_addr(0x0102030405060708)
+        addr.set_type(AddrType.WOTS_HASH)
+        addr.set_keypair_addr(0x0A0B)
+        addr.set_chain_addr(0x33)
+        addr.set_hash_addr(0x44)
+
+        full = full_addr_rows([addr])[0]
+        expected = bytearray(SPX_ADDR_BYTES)
+        expected[3] = 0x12
+        expected[8:16] = (0x0102030405060708).to_bytes(8, "big")
+        expected[19] = AddrType.WOTS_HASH
+        expected[22:24] = b"\x0a\x0b"
+        expected[27] = 0x33
+        expected[31] = 0x44
+        self.assertEqual(full.tobytes(), bytes(expected))
+
+        # Address batches expand the same way.
+        batch = address_batch(1, addr)
+        self.assertEqual(full_addr_rows(batch)[0].tobytes(), bytes(expected))
+
+
+class TestShakeBackend(unittest.TestCase):
+    def setUp(self):
+        self.pub_seed = os.urandom(PARAMS.n)
+        seed_state(self.pub_seed, PARAMS)
+        self.addrs = [Address() for _ in range(3)]
+        for i, addr in enumerate(self.addrs):
+            addr.set_keypair_addr(i)
+            addr.set_tree_index(7 * i)
+
+    def expected(self, inputs, inblocks):
+        step = inblocks * PARAMS.n
+        full = full_addr_rows(self.addrs)
+        return b"".join(
+            hashlib.shake_256(
+                self.pub_seed + full[i].tobytes() + inputs[i * step : (i + 1) * step]
+            ).digest(PARAMS.n)
+            for i in range(len(self.addrs))
+        )
+
+    def test_thash(self):
+        for inblocks in (1, 2, PARAMS.wots_len):
+            inputs = os.urandom(len(self.addrs) * inblocks * PARAMS.n)
+            expected = self.expected(inputs, inblocks)
+
+            out = bytearray(PARAMS.n)
+            thash(out, inputs, inblocks, self.pub_seed, self.addrs[0])
+            self.assertEqual(bytes(out), expected[: PARAMS.n])
+
+            outs = bytearray(len(expected))
+            thash_many(outs, inputs, inblocks, self.pub_seed, self.addrs)
+            self.assertEqual(bytes(outs), expected)
+
+            lanes = bytearray(len(expected))
+            seeds = [self.pub_seed] * len(self.addrs)
+            thash_lanes(lanes, inputs, inblocks, seeds, self.addrs, PARAMS)
+            self.assertEqual(bytes(lanes), expected)
+
+    def test_selected_per_key(self):
+        inputs = os.urandom(PARAMS.n)
+        with use_hash_backend("reference"):
+            # The SHA-256 selection is kept for SHA-256 keys.
+            self.assertEqual(get_hash_backend().name, "reference")
+            out = bytearray(PARAMS.n)
+            thash(out, inputs, 1, self.pub_seed, self.addrs[0])
+            full = full_addr_rows(self.addrs[:1])[0].tobytes()
+            expected = hashlib.shake_256(self.pub_seed + full + inputs)
+            self.assertEqual(bytes(out), expected.digest(PARAMS.n))
+
+        seed_state(self.pub_seed, SPX_DEFAULT_PARAMS)
+        sha_out = bytearray(PARAMS.n)
+        thash(sha_out, inputs, 1, self.pub_seed, self.addrs[0])
+        self.assertNotEqual(sha_out, out)
+
+    def test_prf_addrs(self):
+        key = os.urandom(PARAMS.n)
+        full = full_addr_rows(self.addrs)
+        expected = b"".join(
+            hashlib.shake_256(key + row.tobytes()).digest(PARAMS.n) for row in full
+        )
+        self.assertEqual(prf_addrs(key, self.addrs, PARAMS), expected)
+        batch = address_batch(len(self.addrs), keypair=range(3), tree_index=[0, 7, 14])
+        self.assertEqual(prf_addrs(key, batch, PARAMS), expected)
+
+
+class TestShakeSign(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(PARAMS.pk_bytes)
+        cls.sk = bytearray(PARAMS.sk_bytes)
+        crypto_sign_seed_keypair(
+            cls.pk, cls.sk, bytes(range(PARAMS.seed_bytes)), params=PARAMS
+        )
+        cls.m = b"shake message"
+        cls.sig = bytearray(PARAMS.bytes)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(
+                cls.sig, [0], cls.m, len(cls.m), cls.sk, params=PARAMS
+            )
+
+    def test_sign_verify(self):
+        sig = bytearray(self.sig)
+        self.assertEqual(
+            crypto_sign_verify(sig, PARAMS.bytes, self.m, len(self.m), self.pk, PARAMS),
+            0,
+        )
+        # The SHA-256 set of the same shape rejects it.
+        sha = PARAM_SETS["128f"]
+        self.assertEqual(
+            crypto_sign_verify(sig, sha.bytes, self.m, len(self.m), self.pk, sha), -1
+        )
+        sig[PARAMS.wots_offsets[5]] ^= 1
+        self.assertEqual(
+            crypto_sign_verify(sig, PARAMS.bytes, self.m, len(self.m), self.pk, PARAMS),
+            -1,
+        )
+
+    def test_verify_many(self):
+        sig = bytes(self.sig)
+        items = [(self.m, sig, self.pk), (b"other", sig, self.pk)]
+        self.assertEqual(verify_many(items, PARAMS), [True, False])
+        self.assertEqual(verify_many(items, PARAM_SETS["128f"]), [False, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
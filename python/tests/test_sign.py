@@ -0,0 +1,132 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from spx.address import Address, AddrType
+from spx.constant import *  # Import all constants from spx.constant
+from spx.pool import pool_workers, shared_pool, shutdown_pools
+from spx.sign import (
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+    hypertree_layers,
+    wots_gen_leaf,
+    wots_gen_leaves,
+)
+from spx.utils import seed_state, treehash, treehash_levels
+
+
+class TestSign(unittest.TestCase):
+    def setUp(self):
+        self.sk_seed = bytearray(i for i in range(SPX_N))
+        self.pub_seed = bytearray(i for i in range(SPX_N, 2 * SPX_N))
+        seed_state(self.pub_seed)
+
+    def test_wots_gen_leaves(self):
+        tree_addr = Address()
+        tree_addr.set_layer_addr(3)
+        tree_addr.set_tree_addr(42)
+        tree_addr.set_type(AddrType.TREE)
+
+        leaves = bytearray(4 * SPX_N)
+        wots_gen_leaves(leaves, self.sk_seed, self.pub_seed, 2, 4, tree_addr)
+
+        for i in range(4):
+            leaf = bytearray(SPX_N)
+            wots_gen_leaf(leaf, self.sk_seed, self.pub_seed, 2 + i, tree_addr)
+            self.assertEqual(leaves[i * SPX_N : (i + 1) * SPX_N], leaf)
+
+    def test_treehash_levels_xmss(self):
+        for leaf_idx in range(1 << SPX_TREE_HEIGHT):
+            tree_addr = Address()
+            tree_addr.set_layer_addr(1)
+            tree_addr.set_tree_addr(7)
+            tree_addr.set_type(AddrType.TREE)
+            root = bytearray(SPX_N)
+            auth_path = bytearray(SPX_TREE_HEIGHT * SPX_N)
+            treehash(
+                root,
+                auth_path,
+                self.sk_seed,
+                self.pub_seed,
+                leaf_idx,
+                0,
+                SPX_TREE_HEIGHT,
+                wots_gen_leaf,
+                tree_addr,
+            )
+
+            levels_root = bytearray(SPX_N)
+            levels_auth_path = bytearray(SPX_TREE_HEIGHT * SPX_N)
+            treehash_levels(
+                levels_root,
+                levels_auth_path,
+                self.sk_seed,
+                self.pub_seed,
+                leaf_idx,
+                0,
+                SPX_TREE_HEIGHT,
+                wots_gen_leaves,
+                tree_addr,
+            )
+            self.assertEqual(levels_root, root)
+            self.assertEqual(levels_auth_path, auth_path)
+
+
+class TestParallelSign(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+        cls.m = b"parallel hypertree"
+
+    def sign(self, **kwargs):
+        sig = bytearray(SPX_BYTES)
+        siglen = [0]
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(sig, siglen, self.m, len(self.m), self.sk, **kwargs)
+        self.assertEqual(siglen[0], SPX_BYTES)
+        return sig
+
+    def test_hypertree_layers(self):
+        layers = hypertree_layers(0b101110, 3)
+        self.assertEqual(len(layers), SPX_D)
+        self.assertEqual(layers[0], (0, 0b101110, 3))
+        self.assertEqual(layers[1], (1, 0b101, 0b110))
+        self.assertEqual(layers[2], (2, 0, 0b101))
+
+    def test_verify(self):
+        sig = self.sign()
+        self.assertEqual(
+            crypto_sign_verify(sig, SPX_BYTES, self.m, len(self.m), self.pk), 0
+        )
+        self.assertEqual(
+            crypto_sign_verify(sig, SPX_BYTES, b"other", len(b"other"), self.pk), -1
+        )
+        sig[SPX_N + SPX_FORS_BYTES] ^= 1
+        self.assertEqual(
+            crypto_sign_verify(sig, SPX_BYTES, self.m, len(self.m), self.pk), -1
+        )
+
+    def test_parallel_matches_sequential(self):
+        sequential = self.sign()
+        self.assertEqual(self.sign(workers=2), sequential)
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(self.sign(executor=pool), sequential)
+
+    def test_shared_pool(self):
+        self.addCleanup(shutdown_pools)
+        pool = shared_pool(2)
+        self.assertIs(shared_pool(2), pool)
+        self.assertEqual(pool_workers(pool), 2)
+        self.assertEqual(pool_workers(pool, 3), 3)
+        self.assertEqual(pool_workers(object()), 1)
+        # Later parallel signatures reuse the warm pool instead of starting one.
+        with mock.patch("spx.pool.ProcessPoolExecutor") as start:
+            self.assertEqual(self.sign(workers=2), self.sign())
+        start.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import mmap
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from spx.constant import *  # Import all constants from spx.constant
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_signature
+from spx.stream import (
+    MessageSource,
+    crypto_sign_signature_stream,
+    crypto_sign_verify_stream,
+)
+
+
+class TestMessageSource(unittest.TestCase):
+    def setUp(self):
+        self.m = os.urandom(1000)
+
+    def passes(self, source, **kwargs):
+        with MessageSource(source, chunk_size=64, **kwargs) as message:
+            return [b"".join(bytes(c) for c in message.chunks()) for _ in range(3)]
+
+    def test_sources(self):
+        expected = [self.m] * 3
+        self.assertEqual(self.passes(self.m), expected)
+        self.assertEqual(self.passes(bytearray(self.m)), expected)
+
+        f = io.BytesIO(b"header" + self.m)
+        f.seek(6)
+        self.assertEqual(self.passes(f), expected)
+
+        chunks = (self.m[i : i + 100] for i in range(0, len(self.m), 100))
+        self.assertEqual(self.passes(chunks, spool_bytes=128), expected)
+
+    def test_buffer_chunks_do_not_copy(self):
+        buf = bytearray(self.m)
+        message = MessageSource(buf, chunk_size=64)
+        chunk = next(message.chunks())
+        buf[0] ^= 0xFF
+        self.assertEqual(chunk[0], buf[0])
+
+
+class TestStreamSign(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+        cls.m = os.urandom(5000)
+        cls.sig = bytearray(SPX_BYTES)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(cls.sig, [0], cls.m, len(cls.m), cls.sk)
+
+    def sign_stream(self, source):
+        sig = bytearray(SPX_BYTES)
+        siglen = [0]
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature_stream(sig, siglen, source, self.sk, chunk_size=512)
+        self.assertEqual(siglen[0], SPX_BYTES)
+        return sig
+
+    def test_sign_stream(self):
+        self.assertEqual(self.sign_stream(io.BytesIO(self.m)), self.sig)
+        chunks = iter([self.m[:1], self.m[1:4000], self.m[4000:]])
+        self.assertEqual(self.sign_stream(chunks), self.sig)
+
+        with tempfile.TemporaryFile() as f:
+            f.write(self.m)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                self.assertEqual(self.sign_stream(mm), self.sig)
+
+    def test_verify_stream(self):
+        source = io.BytesIO(self.m)
+        self.assertEqual(
+            crypto_sign_verify_stream(self.sig, SPX_BYTES, source, self.pk), 0
+        )
+        other = io.BytesIO(self.m[:-1])
+        self.assertEqual(
+            crypto_sign_verify_stream(self.sig, SPX_BYTES, other, self.pk), -1
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+from spx.address import Address, AddrType
+from spx.cache import SubtreeCache
+from spx.constant import *  # Import all constants from spx.constant
+from spx.sign import (
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+    crypto_sign_verify,
+    wots_gen_leaf,
+)
+from spx.toptree import TopTree
+from spx.utils import seed_state, treehash
+
+
+class TestTopTree(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.seed = bytes(range(CRYPTO_SEEDBYTES))
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        cls.top_tree = crypto_sign_seed_keypair(
+            cls.pk, cls.sk, cls.seed, keep_top_tree=True
+        )
+
+    def test_keypair_unchanged(self):
+        pk = bytearray(SPX_PK_BYTES)
+        sk = bytearray(SPX_SK_BYTES)
+        self.assertIsNone(crypto_sign_seed_keypair(pk, sk, self.seed))
+        self.assertEqual((pk, sk), (self.pk, self.sk))
+        self.assertEqual(self.top_tree.root, self.pk[SPX_N:])
+
+    def test_auth_path_matches_treehash(self):
+        pub_seed = self.pk[:SPX_N]
+        seed_state(pub_seed)
+        for leaf_idx in range(1 << SPX_TREE_HEIGHT):
+            tree_addr = Address()
+            tree_addr.set_layer_addr(SPX_D - 1)
+            tree_addr.set_type(AddrType.TREE)
+            root = bytearray(SPX_N)
+            auth_path = bytearray(SPX_TREE_HEIGHT * SPX_N)
+            treehash(
+                root,
+                auth_path,
+                self.sk,
+                pub_seed,
+                leaf_idx,
+                0,
+                SPX_TREE_HEIGHT,
+                wots_gen_leaf,
+                tree_addr,
+            )
+            top_auth_path = bytearray(SPX_TREE_HEIGHT * SPX_N)
+            self.top_tree.auth_path(top_auth_path, leaf_idx)
+            self.assertEqual(top_auth_path, auth_path)
+
+    def test_serialize(self):
+        data = self.top_tree.to_bytes()
+        restored = TopTree.from_bytes(data)
+        self.assertEqual(restored.pk, self.top_tree.pk)
+        self.assertEqual(restored.tree_height, SPX_TREE_HEIGHT)
+        self.assertEqual(bytes(restored.heap), bytes(self.top_tree.heap))
+        with self.assertRaises(ValueError):
+            TopTree.from_bytes(b"XXXX" + data[4:])
+
+    def test_sign_with_top_tree(self):
+        m = b"top tree"
+
+        def sign(**kwargs):
+            sig = bytearray(SPX_BYTES)
+            with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+                crypto_sign_signature(
+                    sig, [0], m, len(m), self.sk, subtree_cache=SubtreeCache(), **kwargs
+                )
+            return sig
+
+        sig = sign(top_tree=self.top_tree)
+        self.assertEqual(sig, sign())
+        self.assertEqual(crypto_sign_verify(sig, SPX_BYTES, m, len(m), self.pk), 0)
+
+        other = TopTree(bytes(SPX_PK_BYTES), bytes(self.top_tree.heap))
+        with self.assertRaises(ValueError):
+            sign(top_tree=other)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from spx import tuning
+from spx.bench import calibrate, default_worker_sweep
+from spx.constant import *  # Import all constants from spx.constant
+from spx.params import SPX_DEFAULT_PARAMS
+from spx.pool import shared_pool, shutdown_pools
+from spx.sign import crypto_sign_seed_keypair, crypto_sign_signature
+from spx.tuning import (
+    fit_model,
+    load_tuned_workers,
+    model_time,
+    optimal_workers,
+    read_tuning,
+    tuned_pool,
+    tuned_workers,
+    tuning_row,
+    write_tuning,
+)
+from spx.verify import verify_many
+
+
+class TestModel(unittest.TestCase):
+    def test_fit_recovers_model(self):
+        workers = [1, 2, 4, 8, 16]
+        times = [model_time(t, 5.0, 64.0, 0.25) for t in workers]
+        for fitted, expected in zip(fit_model(workers, times), (5.0, 64.0, 0.25)):
+            self.assertAlmostEqual(fitted, expected)
+
+        row = tuning_row("128F-sign", workers, times)
+        self.assertAlmostEqual(row["t_optimal"], 16.0)
+        self.assertEqual(row["best_measured_threads"], 16)
+        self.assertEqual(row["best_threads"], 1)
+
+    def test_optimal_workers(self):
+        self.assertAlmostEqual(optimal_workers(1.0, 4.0, 1.0, 1, 8), 2.0)
+        self.assertEqual(optimal_workers(1.0, 400.0, 1.0, 1, 8), 8.0)
+        # No parallel part: one worker; no overhead: as many as were swept.
+        self.assertEqual(optimal_workers(1.0, -1.0, 1.0, 1, 8), 1.0)
+        self.assertEqual(optimal_workers(1.0, 4.0, -0.1, 1, 8), 8.0)
+
+    def test_default_worker_sweep(self):
+        self.assertEqual(default_worker_sweep(1), [1, 2, 4])
+        self.assertEqual(default_worker_sweep(6), [1, 2, 4, 6, 8])
+
+
+class TestTuningFile(unittest.TestCase):
+    def test_write_and_load(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "parameter.csv")
+            self.assertEqual(load_tuned_workers(path), {})
+
+            workers = [1, 2, 4]
+            write_tuning(
+                [
+                    tuning_row("128F-sign", workers, [9.0, 5.0, 4.0]),
+                    tuning_row("128F-verify", workers, [3.0, 4.0, 6.0]),
+                ],
+                path,
+            )
+            write_tuning([tuning_row("128F-sign", workers, [4.0, 5.0, 9.0])], path)
+            self.assertEqual(list(read_tuning(path)), ["128F-sign", "128F-verify"])
+            self.assertEqual(
+                load_tuned_workers(path), {"128F-sign": 1, "128F-verify": 1}
+            )
+
+    def test_calibrate(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "parameter.csv")
+            rows = calibrate(
+                workers_list=[1, 2, 3],
+                operations=("verify",),
+                count=2,
+                path=path,
+                report=None,
+            )
+            self.assertEqual([row["operation"] for row in rows], ["128F-verify"])
+            tuned = load_tuned_workers(path)
+            self.assertIn(tuned["128F-verify"], (1, 2, 3))
+
+
+class TestTunedDefaults(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pk = bytearray(SPX_PK_BYTES)
+        cls.sk = bytearray(SPX_SK_BYTES)
+        crypto_sign_seed_keypair(cls.pk, cls.sk, bytes(range(CRYPTO_SEEDBYTES)))
+
+    def setUp(self):
+        tuning.tuned_worker_counts.cache_clear()
+        self.addCleanup(tuning.tuned_worker_counts.cache_clear)
+        self.addCleanup(shutdown_pools)
+        out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(out_dir.cleanup)
+        self.path = os.path.join(out_dir.name, "parameter.csv")
+        row = tuning_row("128F-verify", [1, 2, 3, 4], [9.0, 5.0, 4.0, 5.0])
+        write_tuning([row], self.path)
+
+    def test_tuned_workers(self):
+        # The file is read on first use, not at import.
+        with mock.patch.dict(os.environ, {"SPX_TUNING_FILE": self.path}):
+            self.assertEqual(tuned_workers("verify"), 3)
+            self.assertEqual(tuned_workers("sign", SPX_DEFAULT_PARAMS), 1)
+            self.assertIs(tuned_pool("verify"), shared_pool(3))
+            self.assertIsNone(tuned_pool("sign"))
+
+    def test_parallel_paths_match(self):
+        sig = bytearray(SPX_BYTES)
+        with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+            crypto_sign_signature(sig, [0], b"m", 1, self.sk, workers=1)
+        items = [(b"m", bytes(sig), self.pk), (b"x", bytes(sig), self.pk)] * 2
+        with mock.patch.dict(os.environ, {"SPX_TUNING_FILE": self.path}):
+            # A calibration file does not make the defaults start a pool.
+            with mock.patch("spx.pool.ProcessPoolExecutor") as start:
+                tuned_sig = bytearray(SPX_BYTES)
+                with mock.patch("spx.sign.os.urandom", lambda n: bytes(n)):
+                    crypto_sign_signature(tuned_sig, [0], b"m", 1, self.sk)
+                self.assertEqual(verify_many(items), [True, False, True, False])
+            start.assert_not_called()
+            self.assertEqual(tuned_sig, sig)
+            pool = tuned_pool("verify")
+            self.assertEqual(
+                verify_many(items, executor=pool), [True, False, True, False]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
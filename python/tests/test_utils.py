@@ -1,14 +1,22 @@
 import hashlib
+import os
 import unittest
 from spx.address import Address
 from spx.utils import (
+    HASH_BACKENDS,
+    ReferenceBackend,
+    get_hash_backend,
     seed_state,
+    set_hash_backend,
     IV_256,
     state_seeded,
     thash,
+    thash_many,
     SPX_N,
     SPX_SHA256_ADDR_BYTES,
     treehash,
+    treehash_levels,
+    use_hash_backend,
 )
 
 
@@ -162,5 +170,145 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(auth_path, except_auth_path)
 
 
+class TestHashBackends(unittest.TestCase):
+    def setUp(self):
+        self.pub_seed = bytes(i for i in range(16))
+        seed_state(self.pub_seed)
+
+    def gen_leaf(self, leaf, sk_seed, pub_seed, idx, tree_addr):
+        leaf_addr = Address()
+        leaf_addr.copy_keypair_addr(tree_addr)
+        leaf_addr.set_tree_index(idx)
+        thash(leaf, sk_seed, 1, pub_seed, leaf_addr)
+
+    def test_thash_parity(self):
+        addr = Address()
+        addr.set_layer_addr(3)
+        addr.set_tree_addr(0x1234)
+        for inblocks in (1, 2, 35):
+            input_data = os.urandom(inblocks * SPX_N)
+            outputs = []
+            for name in HASH_BACKENDS:
+                with use_hash_backend(name):
+                    out = bytearray(SPX_N)
+                    thash(out, input_data, inblocks, self.pub_seed, addr)
+                    outputs.append(out)
+            self.assertEqual(len(set(map(bytes, outputs))), 1)
+
+    def test_thash_many_parity(self):
+        addrs = []
+        for i in range(5):
+            addr = Address()
+            addr.set_hash_addr(i)
+            addrs.append(addr)
+        inputs = os.urandom(len(addrs) * 2 * SPX_N)
+        outputs = []
+        for name in HASH_BACKENDS:
+            with use_hash_backend(name):
+                outs = bytearray(len(addrs) * SPX_N)
+                thash_many(outs, inputs, 2, self.pub_seed, addrs)
+                outputs.append(outs)
+        self.assertEqual(len(set(map(bytes, outputs))), 1)
+
+    def test_treehash_parity(self):
+        results = []
+        for name in HASH_BACKENDS:
+            with use_hash_backend(name):
+                tree_addr = Address()
+                tree_addr.set_type(2)
+                root = bytearray(SPX_N)
+                auth_path = bytearray(3 * SPX_N)
+                treehash(
+                    root,
+                    auth_path,
+                    bytes(SPX_N),
+                    self.pub_seed,
+                    5,
+                    0,
+                    3,
+                    self.gen_leaf,
+                    tree_addr,
+                )
+                results.append(bytes(root + auth_path))
+        self.assertNotEqual(results[0][:SPX_N], bytes(SPX_N))
+        self.assertEqual(len(set(results)), 1)
+
+    def test_treehash_levels(self):
+        def gen_leaves(leaves, sk_seed, pub_seed, idx_offset, count, tree_addr):
+            for i in range(count):
+                self.gen_leaf(
+                    memoryview(leaves)[i * SPX_N : (i + 1) * SPX_N],
+                    sk_seed,
+                    pub_seed,
+                    idx_offset + i,
+                    tree_addr,
+                )
+
+        for leaf_idx, idx_offset in ((0, 0), (5, 0), (7, 0), (2, 24)):
+            tree_addr = Address()
+            tree_addr.set_type(2)
+            root = bytearray(SPX_N)
+            auth_path = bytearray(3 * SPX_N)
+            treehash(
+                root,
+                auth_path,
+                bytes(SPX_N),
+                self.pub_seed,
+                leaf_idx,
+                idx_offset,
+                3,
+                self.gen_leaf,
+                tree_addr,
+            )
+
+            levels_addr = Address()
+            levels_addr.set_type(2)
+            levels_root = bytearray(SPX_N)
+            levels_auth_path = bytearray(3 * SPX_N)
+            levels = treehash_levels(
+                levels_root,
+                levels_auth_path,
+                bytes(SPX_N),
+                self.pub_seed,
+                leaf_idx,
+                idx_offset,
+                3,
+                gen_leaves,
+                levels_addr,
+            )
+            self.assertEqual(levels_root, root)
+            self.assertEqual(levels_auth_path, auth_path)
+            self.assertEqual(levels_addr.to_bytes(), tree_addr.to_bytes())
+            self.assertEqual([len(level) for level in levels], [128, 64, 32, 16])
+
+    def test_thash_lanes_keeps_seeded_state(self):
+        addr = Address()
+        addr.set_hash_addr(7)
+        inputs = os.urandom(SPX_N)
+        backend = ReferenceBackend(bytearray(40))
+        backend.seed_state(self.pub_seed)
+        expected = bytearray(SPX_N)
+        backend.thash(expected, inputs, 1, self.pub_seed, addr)
+
+        # Lanes of other keys do not reseed the backend.
+        seeds = [os.urandom(SPX_N), os.urandom(SPX_N)]
+        outs = bytearray(2 * SPX_N)
+        backend.thash_lanes(outs, inputs * 2, 1, seeds, [addr, addr])
+        out = bytearray(SPX_N)
+        backend.thash(out, inputs, 1, self.pub_seed, addr)
+        self.assertEqual(out, expected)
+
+    def test_use_hash_backend_restores(self):
+        previous = get_hash_backend()
+        with use_hash_backend("reference") as backend:
+            self.assertEqual(backend.name, "reference")
+            self.assertIs(get_hash_backend(), backend)
+        self.assertIs(get_hash_backend(), previous)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            set_hash_backend("md5")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+import os
+import unittest
+
+from spx.constant import *  # Import all constants from spx.constant
+from spx.sign import (
+    crypto_sign,
+    crypto_sign_open,
+    crypto_sign_seed_keypair,
+    crypto_sign_signature,
+)
+from spx.utils import use_hash_backend
+from spx.verify import verify_many
+
+
+class TestVerify(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.keys = []
+        for seed in (bytes(CRYPTO_SEEDBYTES), bytes(range(CRYPTO_SEEDBYTES))):
+            pk = bytearray(SPX_PK_BYTES)
+            sk = bytearray(SPX_SK_BYTES)
+            crypto_sign_seed_keypair(pk, sk, seed)
+            cls.keys.append((pk, sk))
+
+        cls.items = []
+        for i in range(3):
+            pk, sk = cls.keys[i % 2]
+            m = b"message %d" % i
+            sig = bytearray(SPX_BYTES)
+            crypto_sign_signature(sig, [0], m, len(m), sk)
+            cls.items.append((m, bytes(sig), bytes(pk)))
+
+    def test_sign_open(self):
+        pk, sk = self.keys[0]
+        m = b"signed message"
+        sm = bytearray()
+        smlen = [0]
+        crypto_sign(sm, smlen, m, len(m), sk)
+        self.assertEqual(smlen[0], SPX_BYTES + len(m))
+
+        opened = bytearray()
+        mlen = [0]
+        self.assertEqual(crypto_sign_open(opened, mlen, sm, smlen[0], pk), 0)
+        self.assertEqual((opened, mlen[0]), (m, len(m)))
+
+        sm[-1] ^= 1
+        self.assertEqual(crypto_sign_open(opened, mlen, sm, smlen[0], pk), -1)
+        self.assertEqual((opened, mlen[0]), (b"", 0))
+        self.assertEqual(crypto_sign_open(opened, mlen, sm[:10], 10, pk), -1)
+
+    def test_verify_many(self):
+        m, sig, pk = self.items[1]
+        bad_sig = bytearray(sig)
+        bad_sig[SPX_BYTES - 1] ^= 1
+        items = self.items + [
+            (b"other message", sig, pk),
+            (m, bytes(bad_sig), pk),
+            (m, sig, self.items[0][2]),
+            (m, sig[:-1], pk),
+        ]
+        expected = [True, True, True, False, False, False, False]
+        for backend in ("hashlib", "numpy"):
+            with use_hash_backend(backend):
+                self.assertEqual(verify_many(items), expected)
+        self.assertEqual(verify_many([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
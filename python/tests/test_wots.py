@@ -1,9 +1,11 @@
 import unittest
 from spx.utils import seed_state
 from spx.wots import *
-from spx.address import Address
+from spx.address import Address, address_batch
 import os
 
+import numpy as np
+
 
 class TestWOTS(unittest.TestCase):
     def setUp(self):
@@ -63,6 +65,32 @@ class TestWOTS(unittest.TestCase):
         # Verify that the public key generated from the signature matches the original public key
         self.assertEqual(pk_from_sig.hex(), original_pk.hex())
 
+    def test_gen_chains_matches_gen_chain(self):
+        starts = [0, 3, 15, 7, 0]
+        steps = [15, 2, 0, 20, 1]
+        values = os.urandom(len(starts) * SPX_N)
+        addrs = address_batch(len(starts), self.addr, chain=range(len(starts)))
+
+        outs = gen_chains(
+            np.frombuffer(values, dtype=np.uint8), starts, steps, self.pub_seed, addrs
+        )
+        for i, (start, step) in enumerate(zip(starts, steps)):
+            addr = Address()
+            addr.set_chain_addr(i)
+            expected = gen_chain(
+                values[i * SPX_N : (i + 1) * SPX_N], start, step, self.pub_seed, addr
+            )
+            self.assertEqual(outs[i].tobytes(), bytes(expected))
+
+    def test_wots_gen_pks(self):
+        self.addr.set_layer_addr(2)
+        self.addr.set_tree_addr(9)
+        pks = wots_gen_pks(self.sk_seed, self.pub_seed, self.addr, [4, 0, 7])
+        for i, keypair in enumerate([4, 0, 7]):
+            self.addr.set_keypair_addr(keypair)
+            pk = wots_gen_pk(self.sk_seed, self.pub_seed, self.addr)
+            self.assertEqual(pks[i * SPX_WOTS_BYTES : (i + 1) * SPX_WOTS_BYTES], pk)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,11 +13,39 @@ Where:
 - beta/t: parallel speedup component
 - gamma*t: thread management overhead
 - t: thread count
+
+The model is linear in (alpha, beta, gamma), so it is fitted in closed form:
+the least-squares normal equations of every function in every sweep file are
+accumulated and solved together in one batched solve. Confidence intervals
+come from a Poisson bootstrap, which resamples by giving each measurement a
+Poisson(1) weight and refits all functions at once per replicate.
 """
 
+import os
+from argparse import ArgumentParser
+from glob import glob
+
 import numpy as np
 import pandas as pd
-from scipy.optimize import curve_fit
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+PARAMETER_CSV = os.path.join(DATA_DIR, "parameter.csv")
+PARAMETER_COLUMNS = [
+    "operation",
+    "alpha",
+    "beta",
+    "gamma",
+    "t_optimal",
+    "optimal_time",
+    "best_measured_threads",
+    "best_measured_time",
+    "best_blocks",
+    "best_threads",
+]
+CI_PARAMETERS = ["alpha", "beta", "gamma", "t_optimal"]
+
+# Products of the features (1, 1/t, t) making up X^T X, as (row, column).
+GRAM_ENTRIES = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
 
 
 def performance_model(t, alpha, beta, gamma):
@@ -36,6 +64,149 @@ def performance_model(t, alpha, beta, gamma):
     return alpha + beta / t + gamma * t
 
 
+def load_sweeps(csv_files):
+    """
+    Load benchmark sweeps into one DataFrame, sorted by function.
+
+    Args:
+        csv_files: Paths of CSV files with columns
+                   "function", "blocks", "threads", "time(ms)", "per_op(ms)"
+
+    Returns:
+        DataFrame with an added "total_threads" column
+    """
+    frames = []
+    for csv_file in csv_files:
+        df = pd.read_csv(csv_file, skipinitialspace=True)
+        df.columns = df.columns.str.strip()
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df["function"] = df["function"].str.strip()
+    df["total_threads"] = df["blocks"] * df["threads"]
+    return df.sort_values("function", kind="stable").reset_index(drop=True)
+
+
+def group_starts(codes):
+    """Start row of every group of sorted group codes."""
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def solve_batched(features, times, starts, weights=None):
+    """
+    Weighted least-squares (alpha, beta, gamma) of every group at once.
+
+    Args:
+        features: (rows, 3) array of (1, 1/t, t), rows sorted by group
+        times: (rows,) measured times
+        starts: start row of every group
+        weights: (replicates, rows) row weights, or None for one unweighted fit
+
+    Returns:
+        (replicates, groups, 3) coefficients; NaN for groups with a
+        singular system, e.g. fewer than three distinct thread counts
+    """
+    if weights is None:
+        weights = np.ones((1, len(times)))
+
+    # X^T W X and X^T W y of every (replicate, group), by segment sums.
+    gram = np.empty(weights.shape[:1] + (len(starts), 3, 3))
+    for j, k in GRAM_ENTRIES:
+        sums = np.add.reduceat(weights * (features[:, j] * features[:, k]), starts, 1)
+        gram[..., j, k] = gram[..., k, j] = sums
+    rhs = np.stack(
+        [
+            np.add.reduceat(weights * (features[:, j] * times), starts, 1)
+            for j in range(3)
+        ],
+        axis=-1,
+    )
+
+    # Scale to a unit diagonal: 1/t and t differ by orders of magnitude.
+    scale = np.sqrt(np.diagonal(gram, axis1=-2, axis2=-1))
+    scale[scale == 0] = 1
+    gram /= scale[..., :, None] * scale[..., None, :]
+    rhs /= scale
+
+    coefficients = np.full(rhs.shape, np.nan)
+    solvable = np.linalg.cond(gram) < 1 / np.finfo(float).eps
+    coefficients[solvable] = np.linalg.solve(gram[solvable], rhs[solvable][..., None])[
+        ..., 0
+    ]
+    return coefficients / scale
+
+
+def optimal_threads(coefficients):
+    """sqrt(beta / gamma), NaN where the model has no interior minimum."""
+    beta, gamma = coefficients[..., 1], coefficients[..., 2]
+    valid = (beta > 0) & (gamma > 0)
+    return np.where(valid, np.sqrt(np.where(valid, beta / gamma, 1)), np.nan)
+
+
+def fit_all_functions(df, n_bootstrap=200, confidence=0.95, seed=0, chunk=16):
+    """
+    Fit the performance model to every function of df in one vectorized pass.
+
+    Args:
+        df: DataFrame from load_sweeps
+        n_bootstrap: Number of bootstrap replicates (0 for no intervals)
+        confidence: Confidence level of the intervals
+        seed: Seed of the bootstrap weights
+        chunk: Replicates fitted per batch, bounding memory to chunk × rows
+
+    Returns:
+        DataFrame with the columns of parameter.csv, plus
+        "<parameter>_ci_low" and "<parameter>_ci_high" for alpha, beta,
+        gamma and t_optimal
+    """
+    codes, functions = pd.factorize(df["function"], sort=True)
+    starts = group_starts(codes)
+    t = df["total_threads"].to_numpy(dtype=float)
+    times = df["time(ms)"].to_numpy(dtype=float)
+    features = np.stack([np.ones_like(t), 1 / t, t], axis=1)
+
+    coefficients = solve_batched(features, times, starts)[0]
+    alpha, beta, gamma = coefficients.T
+    t_optimal = optimal_threads(coefficients)
+
+    best = df.loc[df.groupby(codes)["time(ms)"].idxmin()]
+    results = pd.DataFrame(
+        {
+            "operation": functions,
+            "alpha": alpha,
+            "beta": beta,
+            "gamma": gamma,
+            "t_optimal": t_optimal,
+            "optimal_time": performance_model(t_optimal, alpha, beta, gamma),
+            "best_measured_threads": best["total_threads"].to_numpy(),
+            "best_measured_time": best["time(ms)"].to_numpy(),
+            "best_blocks": best["blocks"].to_numpy(),
+            "best_threads": best["threads"].to_numpy(),
+        }
+    )
+
+    if n_bootstrap:
+        rng = np.random.default_rng(seed)
+        replicates = []
+        for done in range(0, n_bootstrap, chunk):
+            size = min(chunk, n_bootstrap - done)
+            weights = rng.poisson(1.0, (size, len(times))).astype(float)
+            replicates.append(solve_batched(features, times, starts, weights))
+        replicates = np.concatenate(replicates)
+        samples = {
+            "alpha": replicates[..., 0],
+            "beta": replicates[..., 1],
+            "gamma": replicates[..., 2],
+            "t_optimal": optimal_threads(replicates),
+        }
+        tail = (1 - confidence) / 2 * 100
+        for name in CI_PARAMETERS:
+            low, high = np.nanpercentile(samples[name], [tail, 100 - tail], axis=0)
+            results[f"{name}_ci_low"] = low
+            results[f"{name}_ci_high"] = high
+
+    return results
+
+
 def calculate_optimal_threads_by_function(csv_file, function_name):
     """
     Calculate optimal thread configurations from benchmark data for a specific function.
@@ -52,58 +223,36 @@ def calculate_optimal_threads_by_function(csv_file, function_name):
         - best_config: Best measured configuration from data
         - optimal_configs: Dictionary of optimal block counts for each thread size
     """
-    # Load the dataset
-    df = pd.read_csv(csv_file, skipinitialspace=True)
-
-    # Clean column names by removing whitespace
-    df.columns = df.columns.str.strip()
-
-    # Filter data for the specified function
+    df = load_sweeps([csv_file])
     function_df = df[df["function"] == function_name]
 
     if function_df.empty:
         raise ValueError(f"No data found for function '{function_name}'")
 
-    # Calculate total threads
-    function_df["total_threads"] = function_df["blocks"] * function_df["threads"]
+    row = fit_all_functions(function_df, n_bootstrap=0).iloc[0]
+    params = (row["alpha"], row["beta"], row["gamma"])
+    if np.isnan(row["t_optimal"]):
+        print(f"Error fitting model for {function_name}: no interior optimum")
+        return None
 
-    # Find the best measured configuration
     best_config = function_df.loc[function_df["time(ms)"].idxmin()]
+    return (params, row["t_optimal"], best_config, optimal_configs(row, function_df))
 
-    # Extract data for model fitting
-    t_values = function_df["total_threads"].values
-    times = function_df["time(ms)"].values
-
-    # Initial parameter guesses
-    p0 = [50, 5000, 0.0001]
 
-    # Fit the model parameters
-    try:
-        params, covariance = curve_fit(performance_model, t_values, times, p0=p0)
-        alpha, beta, gamma = params
-
-        # Calculate theoretical optimal thread count
-        t_optimal = np.sqrt(beta / gamma)
-
-        # Calculate optimal block count for each thread size
-        thread_sizes = sorted(function_df["threads"].unique())
-        optimal_configs = {}
-
-        for thread_size in thread_sizes:
-            optimal_blocks = max(1, round(t_optimal / thread_size))
-            total_threads = optimal_blocks * thread_size
-            expected_time = performance_model(total_threads, alpha, beta, gamma)
-            optimal_configs[thread_size] = {
-                "blocks": optimal_blocks,
-                "total_threads": total_threads,
-                "estimated_time": expected_time,
-            }
-
-        return (params, t_optimal, best_config, optimal_configs)
-
-    except RuntimeError as e:
-        print(f"Error fitting model for {function_name}: {e}")
-        return None
+def optimal_configs(row, function_df):
+    """Block count closest to t_optimal for every thread size in function_df."""
+    configs = {}
+    for thread_size in sorted(function_df["threads"].unique()):
+        optimal_blocks = max(1, round(row["t_optimal"] / thread_size))
+        total_threads = optimal_blocks * thread_size
+        configs[thread_size] = {
+            "blocks": optimal_blocks,
+            "total_threads": total_threads,
+            "estimated_time": performance_model(
+                total_threads, row["alpha"], row["beta"], row["gamma"]
+            ),
+        }
+    return configs
 
 
 def print_results_by_function(results, function_name):
@@ -142,51 +291,26 @@ def print_results_by_function(results, function_name):
         print(f"    Estimated time: {config['estimated_time']:.2f}ms")
     print("=" * 50)
 
-    # Calculate optimal time using the performance model
-    optimal_time = performance_model(t_optimal, alpha, beta, gamma)
-
-    # Prepare the result row
-    result_row = {
-        "operation": function_name,
-        "alpha": alpha,
-        "beta": beta,
-        "gamma": gamma,
-        "t_optimal": t_optimal,
-        "optimal_time": optimal_time,
-        "best_measured_threads": best_config["total_threads"],
-        "best_measured_time": best_config["time(ms)"],
-        "best_blocks": best_config["blocks"],
-        "best_threads": best_config["threads"],
-    }
-
-    # Path to parameter.csv
-    parameter_csv = "../data/parameter.csv"
 
+def write_parameter_csv(results, parameter_csv=PARAMETER_CSV):
+    """
+    Write fitted results to parameter.csv, replacing rows of the same operation.
+
+    Args:
+        results: DataFrame returned by fit_all_functions
+        parameter_csv: Path of the parameter file
+    """
     try:
-        # Try to read existing data
-        df = pd.read_csv(parameter_csv)
-
-        # Check if operation already exists
-        if function_name in df["operation"].values:
-            # Replace existing row
-            df.loc[df["operation"] == function_name] = pd.Series(result_row)
-        else:
-            # Append new row
-            df = pd.concat([df, pd.DataFrame([result_row])], ignore_index=True)
+        existing = pd.read_csv(parameter_csv)
+        existing = existing[~existing["operation"].isin(results["operation"])]
+        df = pd.concat([existing, results], ignore_index=True)
     except (FileNotFoundError, pd.errors.EmptyDataError):
-        # Create new dataframe if file doesn't exist or is empty
-        df = pd.DataFrame([result_row])
+        df = results
 
-    # Write updated dataframe to CSV
-    df.to_csv(parameter_csv, index=False)
+    columns = PARAMETER_COLUMNS + [c for c in df.columns if c not in PARAMETER_COLUMNS]
+    df[columns].to_csv(parameter_csv, index=False)
     print(f"Results saved to {parameter_csv}")
 
-    # Generate CSV output string for display
-    csv_output = "operation,alpha,beta,gamma,t_optimal,optimal_time,best_measured_threads,best_measured_time,best_blocks,best_threads\n"
-    csv_output += f"{function_name},{alpha},{beta},{gamma},{t_optimal},{optimal_time},{best_config['total_threads']},{best_config['time(ms)']},{best_config['blocks']},{best_config['threads']}"
-    print("\nCSV Output:")
-    print(csv_output)
-
 
 def get_unique_functions(csv_file):
     """
@@ -208,41 +332,37 @@ def get_unique_functions(csv_file):
 
 def main():
     """
-    Main function to demonstrate usage of the calculator.
+    Fit every function of the given sweep files and update parameter.csv.
     """
-    # Path to the input CSV file
-    input_file = "../data/192S-SLH-DSA-32768.csv"
-
-    try:
-        # Get unique functions from the CSV
-        functions = get_unique_functions(input_file)
-
-        if not functions:
-            print(f"No function data found in {input_file}")
-            return
-
-        print(
-            f"Found {len(functions)} functions in the input file: {', '.join(functions)}\n"
+    parser = ArgumentParser(description="Fit T(t) = alpha + beta/t + gamma*t")
+    parser.add_argument(
+        "csv_files",
+        nargs="*",
+        default=sorted(glob(os.path.join(DATA_DIR, "*-SLH-DSA-32768.csv"))),
+        help="Sweep CSV files (default: data/*-SLH-DSA-32768.csv)",
+    )
+    parser.add_argument("--output", default=PARAMETER_CSV)
+    parser.add_argument("--bootstrap", type=int, default=200)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_sweeps(args.csv_files)
+    results = fit_all_functions(df, args.bootstrap, args.confidence, args.seed)
+
+    for _, row in results.iterrows():
+        line = (
+            f"{row['operation']}: t_optimal = {row['t_optimal']:.2f}, "
+            f"optimal_time = {row['optimal_time']:.2f}ms"
         )
-
-        # Process each function
-        for function_name in functions:
-            try:
-                print(f"Processing {function_name}...")
-                results = calculate_optimal_threads_by_function(
-                    input_file, function_name
-                )
-                print_results_by_function(results, function_name)
-                print("\n")
-            except Exception as e:
-                print(f"Error processing {function_name}: {e}")
-
-        print("All functions processed successfully!")
-
-    except FileNotFoundError:
-        print(f"Input file not found: {input_file}")
-    except Exception as e:
-        print(f"Error: {e}")
+        if "t_optimal_ci_low" in row:
+            line += (
+                f", {args.confidence:.0%} CI "
+                f"[{row['t_optimal_ci_low']:.2f}, {row['t_optimal_ci_high']:.2f}]"
+            )
+        print(line)
+
+    write_parameter_csv(results, args.output)
 
 
 if __name__ == "__main__":